@@ -0,0 +1,132 @@
+"""
+Content-addressed store for uploaded files.
+
+Every upload is kept once per distinct content, at
+uploads/blobs/<sha256[:2]>/<sha256>, with a row in upload_blobs counting
+the uploaded_files rows that point at it.  Re-uploading a transcript (or
+two students uploading the same one) only bumps the count; deleting a
+file drops it, and the blob goes when the count reaches zero.
+
+parse_cache holds the parse result of a blob per file type and
+PARSER_VERSION, so the parse queue can skip parsing duplicate uploads.
+Its rows go with the blob (ON DELETE CASCADE).
+
+add_blob() and release_blob() run inside the caller's transaction.  A
+blob file is only ever removed by drop_blob_file(), after that
+transaction has ended without leaving a row for it (the last reference
+was deleted, or the upload that created it failed).  It takes the same
+per-hash lock as add_blob() and re-checks the row under it, so a file an
+upload has meanwhile put back for a new row is left alone.
+"""
+
+import logging
+import os
+from pathlib import Path
+
+from database.connection import get_conn
+from database.execute import execute
+
+log = logging.getLogger(__name__)
+
+BLOBS_DIR = Path(__file__).parent.parent / "uploads" / "blobs"
+
+# Tables added after the original schema (see init_DB/db.sql)
+ENSURE_SQL = """
+CREATE TABLE IF NOT EXISTS upload_blobs (
+    content_hash  CHAR(64)  PRIMARY KEY,
+    storage_path  TEXT      NOT NULL,
+    file_size     BIGINT,
+    ref_count     INT       NOT NULL DEFAULT 1,
+    created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS parse_cache (
+    content_hash   CHAR(64)    NOT NULL REFERENCES upload_blobs(content_hash) ON DELETE CASCADE,
+    file_type      VARCHAR(20) NOT NULL,
+    parser_version INT         NOT NULL,
+    raw_text       TEXT,
+    grades         JSONB       NOT NULL,
+    snippets       JSONB       NOT NULL,
+    created_at     TIMESTAMP   DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (content_hash, file_type, parser_version)
+);
+"""
+
+ADD_REF_SQL = """
+INSERT INTO upload_blobs (content_hash, storage_path, file_size)
+VALUES (%s, %s, %s)
+ON CONFLICT (content_hash) DO UPDATE SET ref_count = upload_blobs.ref_count + 1
+RETURNING storage_path, ref_count
+"""
+
+# Serialises add_blob() against drop_blob_file() for one hash until commit
+LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))"
+
+RELEASE_SQL = """
+UPDATE upload_blobs SET ref_count = ref_count - 1
+WHERE  content_hash = %s AND storage_path = %s
+RETURNING storage_path, ref_count
+"""
+
+
+async def ensure_blob_schema() -> None:
+    try:
+        await execute(ENSURE_SQL)
+    except Exception as exc:
+        log.warning("Could not ensure upload blob store tables (%s)", exc)
+
+
+def blob_path(content_hash: str) -> Path:
+    return BLOBS_DIR / content_hash[:2] / content_hash
+
+
+async def add_blob(cur, content_hash: str, part: Path, size: int) -> tuple[Path, bool]:
+    """
+    Take a reference to the blob holding `part`'s content; returns its path
+    and whether this call created it.  A new blob gets `part` renamed into
+    place; for a known one `part` is just dropped.  If the transaction then
+    fails, a created blob's file must go via drop_blob_file().
+    """
+    await cur.execute(LOCK_SQL, (content_hash,))
+    await cur.execute(ADD_REF_SQL, (content_hash, str(blob_path(content_hash)), size))
+    row     = await cur.fetchone()
+    path    = Path(row["storage_path"])
+    created = row["ref_count"] == 1
+    if created or not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(part, path)
+    else:
+        part.unlink(missing_ok=True)
+    return path, created
+
+
+async def release_blob(cur, content_hash: str, storage_path: str) -> bool:
+    """
+    Drop one reference; the last one deletes the blob row and its cached
+    parse results.  True in that case: once the transaction has committed
+    the caller removes the file with drop_blob_file().
+    """
+    await cur.execute(RELEASE_SQL, (content_hash, storage_path))
+    row = await cur.fetchone()
+    if row is None or row["ref_count"] > 0:
+        return False
+    await cur.execute("DELETE FROM upload_blobs WHERE content_hash = %s", (content_hash,))
+    return True
+
+
+async def drop_blob_file(content_hash: str, storage_path: Path | str) -> None:
+    """
+    Remove the file of a blob whose row is gone, unless an upload has
+    recreated the blob since (its file then lives at the same path).
+    """
+    try:
+        async with await get_conn() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(LOCK_SQL, (content_hash,))
+                await cur.execute(
+                    "SELECT 1 FROM upload_blobs WHERE content_hash = %s FOR UPDATE", (content_hash,),
+                )
+                if await cur.fetchone() is None:
+                    Path(storage_path).unlink(missing_ok=True)
+            await conn.commit()
+    except Exception as exc:
+        log.warning("Could not remove blob file %s (%s)", storage_path, exc)
@@ -1,6 +1,11 @@
 """
-Cohort student table — DDL, sync CRUD (used by seed script), and async
-fetch (used by ml_engine at FastAPI startup).
+Cohort student table — DDL, sync CRUD (used by seed script), a columnar
+bulk loader (used by the ml_training worker, optionally for one segment),
+and async fetch (used by ml_engine at FastAPI startup).
+
+Rows may carry the segment labels student_profiles uses (major,
+university_name, year_of_study); ml_segments trains per-segment models on
+the rows that share one.
 
 DB column names use snake_case; Python feature names are camelCase.
 The module handles the mapping transparently.
@@ -9,6 +14,7 @@ The module handles the mapping transparently.
 import logging
 import os
 
+import numpy as np
 import pandas as pd
 import psycopg
 from psycopg.rows import dict_row
@@ -34,6 +40,9 @@ ALL_COLS = FEATURES + [TARGET]
 
 DB_COLS  = [PY_TO_DB[c] for c in ALL_COLS]
 
+# Nullable labels shared with student_profiles, matched case-insensitively
+SEGMENT_COLUMNS = ("major", "university_name", "year_of_study")
+
 # DDL 
 
 CREATE_SQL = """
@@ -45,14 +54,24 @@ CREATE TABLE IF NOT EXISTS cohort_students (
     sleep_hours    REAL     NOT NULL,
     break_freq     REAL     NOT NULL,
     current_grade  REAL     NOT NULL,
+    major          VARCHAR(100),
+    university_name VARCHAR(255),
+    year_of_study  VARCHAR(50),
     seeded_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
-"""
+ALTER TABLE cohort_students ADD COLUMN IF NOT EXISTS major           VARCHAR(100);
+ALTER TABLE cohort_students ADD COLUMN IF NOT EXISTS university_name VARCHAR(255);
+ALTER TABLE cohort_students ADD COLUMN IF NOT EXISTS year_of_study   VARCHAR(50);
+""" + "".join(
+    f"CREATE INDEX IF NOT EXISTS idx_cohort_students_{col} ON cohort_students (lower(trim({col})));\n"
+    for col in SEGMENT_COLUMNS
+)
 
 INSERT_SQL = (
     "INSERT INTO cohort_students "
-    "(study_hours, attention_span, focus_ratio, sleep_hours, break_freq, current_grade) "
-    "VALUES (%s, %s, %s, %s, %s, %s)"
+    "(study_hours, attention_span, focus_ratio, sleep_hours, break_freq, current_grade, "
+    "major, university_name, year_of_study) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"
 )
 
 SELECT_SQL = (
@@ -61,6 +80,20 @@ SELECT_SQL = (
     "FROM cohort_students ORDER BY id"
 )
 
+# Binary COPY for the columnar loader.  Every column is NOT NULL, so each tuple
+# is fixed width: int16 field count, then (int32 length, float8 value) per
+# column.  REAL goes through numeric so 35.6 arrives as 35.6, not 35.599998.
+COPY_BINARY_SQL = (
+    "COPY (SELECT "
+    + ", ".join(f"{col}::numeric::float8" for col in DB_COLS)
+    + " FROM cohort_students{where}) TO STDOUT (FORMAT BINARY)"
+)
+
+_BINARY_ROW = np.dtype(
+    [("n_fields", ">i2")]
+    + [field for col in ALL_COLS for field in ((f"{col}_len", ">i4"), (col, ">f8"))]
+)
+
 # Connection helpers 
 
 def _sync_dsn() -> str:
@@ -88,6 +121,11 @@ def sync_count() -> int:
 
 
 def sync_bulk_insert(df: pd.DataFrame) -> int:
+    """Insert cohort rows; segment columns are optional in df."""
+    segments = [
+        df[col].where(df[col].notna(), None) if col in df else pd.Series(None, index=df.index)
+        for col in SEGMENT_COLUMNS
+    ]
     rows = [
         (
             float(row.studyHours),
@@ -96,8 +134,9 @@ def sync_bulk_insert(df: pd.DataFrame) -> int:
             float(row.sleepHours),
             float(row.breakFreq),
             float(row.currentGrade),
+            *labels,
         )
-        for row in df[ALL_COLS].itertuples(index=False)
+        for row, *labels in zip(df[ALL_COLS].itertuples(index=False), *segments)
     ]
     with psycopg.connect(_sync_dsn()) as conn:
         with conn.cursor() as cur:
@@ -112,6 +151,53 @@ def sync_truncate() -> None:
         conn.commit()
 
 
+def _segment_column(column: str) -> str:
+    if column not in SEGMENT_COLUMNS:
+        raise ValueError(f"Unknown segment column {column!r}")
+    return column
+
+
+def sync_fetch_cohort_columns(segment: tuple[str, str] | None = None) -> pd.DataFrame:
+    """
+    Read the cohort through COPY … (FORMAT BINARY) and decode it in one
+    np.frombuffer call — no per-row Python objects, so it scales to the
+    institution-sized cohorts the retraining job pulls.
+
+    segment=(column, value) restricts it to rows whose label matches value
+    (trimmed, case-insensitive).
+    """
+    where, params = "", None
+    if segment is not None:
+        column, value = segment
+        where  = f" WHERE lower(trim({_segment_column(column)})) = lower(trim(%s))"
+        params = (value,)
+
+    buf = bytearray()
+    with psycopg.connect(_sync_dsn()) as conn:
+        with conn.cursor() as cur:
+            with cur.copy(COPY_BINARY_SQL.format(where=where), params) as copy:
+                for block in copy:
+                    buf += block
+
+    # Header: 11-byte signature, int32 flags, int32 extension length (+ extension).
+    # Trailer: int16 -1.
+    ext  = int.from_bytes(buf[15:19], "big")
+    body = memoryview(buf)[19 + ext : len(buf) - 2]
+    rows = np.frombuffer(body, dtype=_BINARY_ROW)
+    return pd.DataFrame({col: rows[col].astype(np.float64) for col in ALL_COLS})
+
+
+def sync_segment_counts(column: str) -> dict[str, int]:
+    """Cohort rows per (normalised) label of one segment column."""
+    col = _segment_column(column)
+    with psycopg.connect(_sync_dsn()) as conn:
+        rows = conn.execute(
+            f"SELECT lower(trim({col})), COUNT(*) FROM cohort_students "
+            f"WHERE {col} IS NOT NULL GROUP BY 1"
+        ).fetchall()
+    return {label: count for label, count in rows}
+
+
 # Async API (used by ml_engine, called from FastAPI lifespan) 
 
 async def async_fetch_cohort_df() -> pd.DataFrame | None:
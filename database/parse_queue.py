@@ -0,0 +1,327 @@
+"""
+Postgres-backed queue of uploaded files waiting to be parsed.
+
+POST /api/files/upload only stores the file and its uploaded_files row with
+parse_status = 'pending', then calls ParseQueue.notify().  The queue *is*
+that table: PARSE_WORKERS consumer tasks claim the oldest pending row with
+SELECT … FOR UPDATE SKIP LOCKED (so any number of API instances can share
+it), parse the file in a process pool — PDF/DOCX extraction holds the GIL
+for seconds — then write grades, snippets and raw_text and flip the status
+in one transaction.
+
+  pending → parsing → done | failed
+
+A row left in 'parsing' by a crashed worker is claimed again once it is
+PARSE_STALE_MINUTES old; after PARSE_MAX_ATTEMPTS claims it is failed.
+
+Successful results are also kept in parse_cache under (content_hash,
+file_type, PARSER_VERSION), so a file whose content has been parsed
+before is stored from the cache without touching the process pool.
+Clients poll GET /api/files/{id}/status, optionally long-polling with
+?wait= (woken as soon as this instance finishes a job).
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from pathlib import Path
+
+import psycopg
+from psycopg.types.json import Jsonb
+
+from database.connection import get_conn
+from database.execute import execute, fetch_one
+from parsers.file_parser import PARSER_VERSION, RAW_TEXT_MAX, ParsedGrade, ParseResult, TextSnippet, parse_file
+
+log = logging.getLogger(__name__)
+
+PARSE_WORKERS       = int(os.getenv("PARSE_WORKERS") or 2)
+PARSE_POLL_SECONDS  = float(os.getenv("PARSE_POLL_SECONDS") or 5)
+PARSE_STALE_MINUTES = int(os.getenv("PARSE_STALE_MINUTES") or 10)
+PARSE_MAX_ATTEMPTS  = int(os.getenv("PARSE_MAX_ATTEMPTS") or 3)
+
+SNIPPET_MAX = 2_000
+
+# Columns / index added after the original uploaded_files schema (see init_DB/db.sql)
+ENSURE_SQL = """
+ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS parse_attempts   INT DEFAULT 0;
+ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS parse_started_at TIMESTAMP;
+ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS parsed_at        TIMESTAMP;
+ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS parse_error      TEXT;
+ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS content_hash     CHAR(64);
+CREATE INDEX IF NOT EXISTS idx_uploaded_files_parse_queue
+    ON uploaded_files (uploaded_at) WHERE parse_status IN ('pending', 'parsing');
+"""
+
+CLAIM_SQL = """
+UPDATE uploaded_files f
+SET    parse_status     = 'parsing',
+       parse_started_at = CURRENT_TIMESTAMP,
+       parse_attempts   = COALESCE(f.parse_attempts, 0) + 1
+WHERE  f.file_id = (
+    SELECT file_id
+    FROM   uploaded_files
+    WHERE  parse_status = 'pending'
+       OR (parse_status = 'parsing'
+           AND parse_started_at < CURRENT_TIMESTAMP - make_interval(mins => %(stale)s))
+    ORDER  BY uploaded_at
+    LIMIT  1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING f.file_id, f.file_type, f.storage_path, f.content_hash, f.parse_attempts
+"""
+
+FINISH_SQL = """
+UPDATE uploaded_files
+SET    parse_status = %s, raw_text = %s, parse_error = %s, parsed_at = CURRENT_TIMESTAMP
+WHERE  file_id = %s
+"""
+
+INSERT_GRADE_SQL = """
+INSERT INTO parsed_grades
+    (file_id, course_name, course_code, grade_letter,
+     score, max_score, percentage, semester, source_row)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+INSERT_SNIPPET_SQL = """
+INSERT INTO parsed_text_snippets
+    (file_id, snippet_type, content, page_number)
+VALUES (%s, %s, %s, %s)
+"""
+
+CACHE_GET_SQL = """
+SELECT raw_text, grades, snippets
+FROM   parse_cache
+WHERE  content_hash = %s AND file_type = %s AND parser_version = %s
+"""
+
+# Only for content held in the blob store (parse_cache rows go with the blob)
+CACHE_PUT_SQL = """
+INSERT INTO parse_cache (content_hash, file_type, parser_version, raw_text, grades, snippets)
+SELECT content_hash, %s, %s, %s, %s, %s
+FROM   upload_blobs
+WHERE  content_hash = %s
+ON CONFLICT DO NOTHING
+"""
+
+TERMINAL_STATUSES = {"done", "failed"}
+
+
+# Worker process
+
+def parse_stored_file(file_type: str, storage_path: str) -> ParseResult:
+    """Runs in the pool: read the stored upload and parse it."""
+    return parse_file(file_type, Path(storage_path).read_bytes())
+
+
+def _lower_priority() -> None:
+    """Worker initializer — let the API process win any CPU contention."""
+    try:
+        os.nice(10)
+    except OSError:
+        pass
+
+
+# Queue
+
+class ParseQueue:
+    def __init__(self, workers: int = PARSE_WORKERS):
+        self.workers = workers
+        self._pool:    ProcessPoolExecutor | None = None
+        self._tasks:   list[asyncio.Task] = []
+        self._wakeup   = asyncio.Event()
+        self._finished = asyncio.Event()
+        # Counters
+        self.parsed     = 0
+        self.failed     = 0
+        self.retried    = 0
+        self.cache_hits = 0
+
+    # Lifecycle
+    async def start(self) -> None:
+        try:
+            await execute(ENSURE_SQL)
+        except Exception as exc:
+            log.warning("Could not ensure uploaded_files queue columns (%s)", exc)
+        self._wakeup   = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._tasks    = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=max(1, self.workers),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority,
+            )
+        return self._pool
+
+    # Producer side (request path)
+    def notify(self) -> None:
+        """A file was queued — wake the consumers instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def wait_for_change(self, timeout: float) -> None:
+        """Block until this instance finishes a job, or `timeout` seconds pass."""
+        try:
+            await asyncio.wait_for(self._finished.wait(), timeout)
+        except TimeoutError:
+            pass
+
+    # Consumer side
+    async def _consume(self) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as exc:
+                log.warning("Parse queue claim failed: %s", exc)
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), PARSE_POLL_SECONDS)
+                except TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            try:
+                await self._process(job)
+            except Exception:
+                log.exception("Parse job %s could not be stored", job["file_id"])
+            self._job_finished()
+
+    async def _claim(self) -> dict | None:
+        async with await get_conn() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(CLAIM_SQL, {"stale": PARSE_STALE_MINUTES})
+                job = await cur.fetchone()
+            await conn.commit()
+        return job
+
+    async def _process(self, job: dict) -> None:
+        file_id = job["file_id"]
+        if job["parse_attempts"] > PARSE_MAX_ATTEMPTS:
+            await self._fail(file_id, f"Gave up after {PARSE_MAX_ATTEMPTS} attempts")
+            return
+
+        cached = await self._cached(job)
+        if cached is not None:
+            self.cache_hits += 1
+            await self._store(file_id, cached)
+            return
+
+        loop = asyncio.get_running_loop()
+        pool = self._ensure_pool()
+        try:
+            result = await loop.run_in_executor(
+                pool, parse_stored_file, job["file_type"], job["storage_path"],
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a hostile file): new pool, job back in line.
+            # Every in-flight job sees this — only the first retires the pool, so a
+            # replacement another consumer already started is left alone.
+            if self._pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            self.retried += 1
+            await execute(
+                "UPDATE uploaded_files SET parse_status = 'pending' WHERE file_id = %s AND parse_status = 'parsing'",
+                (file_id,),
+            )
+            return
+        except Exception as exc:
+            await self._fail(file_id, f"{type(exc).__name__}: {exc}")
+            return
+        await self._store(file_id, result)
+        if not result.error:
+            await self._remember(job, result)
+
+    # Parse cache
+    async def _cached(self, job: dict) -> ParseResult | None:
+        if not job["content_hash"]:
+            return None
+        try:
+            row = await fetch_one(CACHE_GET_SQL, (job["content_hash"], job["file_type"], PARSER_VERSION))
+        except Exception as exc:
+            log.warning("Parse cache lookup failed: %s", exc)
+            return None
+        if row is None:
+            return None
+        return ParseResult(
+            raw_text = row["raw_text"] or "",
+            grades   = [ParsedGrade(**g) for g in row["grades"]],
+            snippets = [TextSnippet(**s) for s in row["snippets"]],
+        )
+
+    async def _remember(self, job: dict, result: ParseResult) -> None:
+        if not job["content_hash"]:
+            return
+        try:
+            await execute(CACHE_PUT_SQL, (
+                job["file_type"], PARSER_VERSION, result.raw_text[:RAW_TEXT_MAX],
+                Jsonb([asdict(g) for g in result.grades]),
+                Jsonb([asdict(s) for s in result.snippets]),
+                job["content_hash"],
+            ))
+        except Exception as exc:   # e.g. NaN scores, which JSON cannot hold
+            log.warning("Could not cache parse result of %s: %s", job["file_id"], exc)
+
+    async def _store(self, file_id, result: ParseResult) -> None:
+        status = "failed" if result.error else "done"
+        try:
+            async with await get_conn() as conn:
+                async with conn.cursor() as cur:
+                    # A re-claimed job may have been half-written before
+                    await cur.execute("DELETE FROM parsed_grades        WHERE file_id = %s", (file_id,))
+                    await cur.execute("DELETE FROM parsed_text_snippets WHERE file_id = %s", (file_id,))
+                    await cur.executemany(INSERT_GRADE_SQL, [
+                        (file_id, g.course_name, g.course_code, g.grade_letter,
+                         g.score, g.max_score, g.percentage, g.semester, g.source_row)
+                        for g in result.grades
+                    ])
+                    await cur.executemany(INSERT_SNIPPET_SQL, [
+                        (file_id, s.snippet_type, s.content[:SNIPPET_MAX], s.page_number)
+                        for s in result.snippets
+                    ])
+                    await cur.execute(FINISH_SQL, (status, result.raw_text[:RAW_TEXT_MAX], result.error, file_id))
+                await conn.commit()
+        except psycopg.errors.ForeignKeyViolation:
+            return   # file deleted while it was being parsed
+        if status == "done":
+            self.parsed += 1
+        else:
+            self.failed += 1
+
+    async def _fail(self, file_id, error: str) -> None:
+        self.failed += 1
+        await execute(FINISH_SQL, ("failed", None, error, file_id))
+
+    def _job_finished(self) -> None:
+        finished, self._finished = self._finished, asyncio.Event()
+        finished.set()
+
+    def stats(self) -> dict:
+        return {
+            "workers":    self.workers,
+            "parsed":     self.parsed,
+            "failed":     self.failed,
+            "retried":    self.retried,
+            "cache_hits": self.cache_hits,
+        }
+
+
+# Singleton
+parse_queue = ParseQueue()
@@ -0,0 +1,221 @@
+"""
+Write-behind log of served predictions → ml_predictions + xai_explanations.
+
+/api/predictions/analyze only calls PredictionLog.record(), which appends to
+a bounded in-process queue and returns immediately.  A background task
+drains the queue in batches and writes each batch in one transaction:
+prediction ids are reserved from the table's sequence in one round trip,
+then both tables are filled with COPY.
+
+When the database lags the queue fills up; further predictions are dropped
+(and counted) rather than slowing requests down.  A batch that fails on a
+connection / operational error is retried a few times with backoff, then
+dropped and counted.  One the database rejects (e.g. a prediction for a
+user deleted before the flush) is split in halves until the bad rows are
+isolated; only those are dropped, logged and counted as rejected.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import psycopg
+
+from database.connection import get_conn
+from database.execute import execute
+
+log = logging.getLogger(__name__)
+
+PREDICTION_LOG_QUEUE = int(os.getenv("PREDICTION_LOG_QUEUE") or 10_000)
+FLUSH_BATCH          = 500
+FLUSH_INTERVAL_S     = 1.0
+FLUSH_RETRIES        = 3
+
+# Columns added after the original ml_predictions schema (see init_DB/db.sql)
+ENSURE_SQL = """
+ALTER TABLE ml_predictions ADD COLUMN IF NOT EXISTS analysis_mode   VARCHAR(20);
+ALTER TABLE ml_predictions ADD COLUMN IF NOT EXISTS predicted_score FLOAT;
+"""
+
+RESERVE_IDS_SQL = (
+    "SELECT nextval(pg_get_serial_sequence('ml_predictions', 'prediction_id')) AS id "
+    "FROM generate_series(1, %s)"
+)
+
+COPY_PREDICTIONS_SQL = (
+    "COPY ml_predictions (prediction_id, user_id, model_version, model_type, analysis_mode, "
+    "predicted_score, predicted_label, predicted_at) FROM STDIN"
+)
+
+COPY_EXPLANATIONS_SQL = (
+    "COPY xai_explanations (prediction_id, feature_name, shap_value, importance_rank, direction) "
+    "FROM STDIN"
+)
+
+MODEL_TYPES = {
+    "strict": "decision_tree",
+    "peer":   "random_forest",
+    "deep":   "random_forest",
+}
+
+
+@dataclass
+class PredictionRecord:
+    user_id:         str
+    analysis_mode:   str
+    model_version:   str
+    predicted_score: float
+    predicted_label: str
+    # (feature_key, impact_score), most influential first — deep mode only
+    shap:            list[tuple[str, float]] = field(default_factory=list)
+    predicted_at:    datetime                = field(default_factory=datetime.now)
+
+
+class PredictionLog:
+    def __init__(self, capacity: int = PREDICTION_LOG_QUEUE):
+        self.capacity = capacity
+        self._queue: asyncio.Queue[PredictionRecord] | None = None
+        self._task:  asyncio.Task | None = None
+        # Batch taken off the queue but not yet written
+        self._inflight: list[PredictionRecord] = []
+        # Counters
+        self.enqueued       = 0
+        self.written        = 0
+        self.dropped        = 0   # queue full
+        self.failed         = 0   # lost after FLUSH_RETRIES failed writes
+        self.rejected       = 0   # single rows the database refused
+        self.flush_errors   = 0
+        self.last_flush_ms: float | None = None
+
+    # Lifecycle
+    async def start(self) -> None:
+        try:
+            await execute(ENSURE_SQL)
+        except Exception as exc:
+            log.warning("Could not ensure ml_predictions columns (%s)", exc)
+        self._queue = asyncio.Queue(maxsize=self.capacity)
+        self._task  = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task, then write whatever is still queued (one try each)."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        batch, self._inflight = self._inflight, []
+        while batch:
+            await self._flush(batch, retries=1)
+            batch = self._take(FLUSH_BATCH)
+
+    # Producer side (request path)
+    def record(self, rec: PredictionRecord) -> bool:
+        """Queue a prediction without waiting.  False if it had to be dropped."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(rec)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    # Consumer side
+    def _take(self, limit: int) -> list[PredictionRecord]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            self._inflight = [await self._queue.get()]
+            # Give the batch a moment to fill unless it is already full
+            if self._queue.qsize() < FLUSH_BATCH - 1:
+                await asyncio.sleep(FLUSH_INTERVAL_S)
+            self._inflight += self._take(FLUSH_BATCH - 1)
+            await self._flush(self._inflight)
+            self._inflight = []
+
+    async def _flush(self, batch: list[PredictionRecord], retries: int = FLUSH_RETRIES) -> None:
+        for attempt in range(retries):
+            try:
+                started = time.perf_counter()
+                await self._write(batch)
+                self.last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+                self.written      += len(batch)
+                return
+            except (psycopg.IntegrityError, psycopg.DataError) as exc:
+                # Retrying the same rows cannot help: split out the bad ones
+                self.flush_errors += 1
+                await self._split(batch, exc, retries)
+                return
+            except psycopg.OperationalError as exc:
+                self.flush_errors += 1
+                log.warning("Prediction log flush failed (attempt %d): %s", attempt + 1, exc)
+                if attempt + 1 < retries:
+                    await asyncio.sleep(2 ** attempt)
+            except Exception as exc:
+                self.flush_errors += 1
+                log.warning("Prediction log flush failed: %s", exc)
+                break
+        self.failed += len(batch)
+
+    async def _split(self, batch: list[PredictionRecord], exc: Exception, retries: int) -> None:
+        if len(batch) == 1:
+            self.rejected += 1
+            log.warning(
+                "Prediction log rejected a %s prediction for user %s: %s",
+                batch[0].analysis_mode, batch[0].user_id, exc,
+            )
+            return
+        mid = len(batch) // 2
+        await self._flush(batch[:mid], retries)
+        await self._flush(batch[mid:], retries)
+
+    async def _write(self, batch: list[PredictionRecord]) -> None:
+        async with await get_conn() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(RESERVE_IDS_SQL, (len(batch),))
+                ids = [row["id"] for row in await cur.fetchall()]
+
+                async with cur.copy(COPY_PREDICTIONS_SQL) as copy:
+                    for pid, rec in zip(ids, batch):
+                        await copy.write_row((
+                            pid, rec.user_id, rec.model_version,
+                            MODEL_TYPES.get(rec.analysis_mode), rec.analysis_mode,
+                            rec.predicted_score, rec.predicted_label, rec.predicted_at,
+                        ))
+
+                async with cur.copy(COPY_EXPLANATIONS_SQL) as copy:
+                    for pid, rec in zip(ids, batch):
+                        for rank, (feature, value) in enumerate(rec.shap, 1):
+                            await copy.write_row((
+                                pid, feature, value, rank,
+                                "positive" if value >= 0 else "negative",
+                            ))
+            await conn.commit()
+
+    def stats(self) -> dict:
+        return {
+            "queued":        self._queue.qsize() if self._queue is not None else 0,
+            "capacity":      self.capacity,
+            "enqueued":      self.enqueued,
+            "written":       self.written,
+            "dropped":       self.dropped,
+            "failed":        self.failed,
+            "rejected":      self.rejected,
+            "flush_errors":  self.flush_errors,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+# Singleton
+prediction_log = PredictionLog()
@@ -44,6 +44,7 @@ export default function FileImport() {
   const [detail,        setDetail]        = useState(null)
   const [detailLoading, setDetailLoading] = useState(false)
   const inputRef = useRef()
+  const polling  = useRef(new Set())
 
   useEffect(() => { fetchFiles() }, []) // eslint-disable-line react-hooks/exhaustive-deps
 
@@ -53,9 +54,38 @@ export default function FileImport() {
       if (!res.ok) return
       const data = await res.json()
       setFiles(data.files || [])
+      for (const f of data.files || []) {
+        if (f.parse_status === 'pending' || f.parse_status === 'parsing') waitForParse(f.file_id)
+      }
     } catch { /* backend offline */ }
   }
 
+  // Files are parsed in the background — long-poll each one until it settles
+  async function waitForParse(fileId) {
+    if (polling.current.has(fileId)) return
+    polling.current.add(fileId)
+    try {
+      for (;;) {
+        const res = await apiFetch(`/api/files/${fileId}/status?wait=25`)
+        if (!res.ok) return
+        const data = await res.json()
+        setFiles(prev => prev.map(f => f.file_id === fileId ? { ...f, parse_status: data.parse_status } : f))
+        if (data.parse_status === 'done' || data.parse_status === 'failed') {
+          setParseResults(prev => ({
+            ...prev,
+            [fileId]: {
+              grades_count:   data.grades_count   ?? 0,
+              snippets_count: data.snippets_count ?? 0,
+            },
+          }))
+          return
+        }
+      }
+    } catch { /* backend offline */ } finally {
+      polling.current.delete(fileId)
+    }
+  }
+
   async function uploadFile(f, category = 'Other', notes = '') {
     const form = new FormData()
     form.append('file',     f)
@@ -88,16 +118,7 @@ export default function FileImport() {
     setLoading(true)
     try {
       for (const f of fs) {
-        const data = await uploadFile(f)
-        if (data?.file?.file_id != null) {
-          setParseResults(prev => ({
-            ...prev,
-            [data.file.file_id]: {
-              grades_count:   data.grades_count   ?? 0,
-              snippets_count: data.snippets_count ?? 0,
-            },
-          }))
-        }
+        await uploadFile(f)
       }
       await fetchFiles()
     } catch (e) {
@@ -165,7 +186,7 @@ export default function FileImport() {
       <div className="panel-title">&gt; ACADEMIC FILE IMPORT</div>
       <p className="muted-text" style={{ fontSize: '0.8rem', marginBottom: '1rem' }}>
         Upload grade sheets, feedback reports, assignments, and exam results.
-        Files are parsed and stored for analysis.
+        Files are stored straight away and parsed in the background for analysis.
       </p>
 
       {/* Drop zone */}
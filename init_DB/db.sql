@@ -235,6 +235,8 @@ CREATE TABLE ml_predictions (
     feature_snapshot_id INT      REFERENCES student_features(feature_id),
     predicted_label VARCHAR(100),               -- output class
     confidence      FLOAT,                      -- 0.0–1.0
+    analysis_mode   VARCHAR(20),                -- 'strict', 'peer', 'deep'
+    predicted_score FLOAT,                      -- 0–100
     predicted_at    TIMESTAMP   DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -248,6 +250,21 @@ CREATE TABLE xai_explanations (
     direction       VARCHAR(10) -- 'positive' | 'negative'
 );
 
+-- 8.3  Nightly batch scores (ml_batch.py) — read by the Overview dashboard
+CREATE TABLE user_predicted_grades (
+    session_id      VARCHAR(64) PRIMARY KEY,        -- users.user_id as text
+    study_hours     FLOAT       NOT NULL,           -- baseline vector that was scored
+    attention_span  FLOAT       NOT NULL,
+    focus_ratio     FLOAT       NOT NULL,
+    sleep_hours     FLOAT       NOT NULL,
+    break_freq      FLOAT       NOT NULL,
+    dt_score        FLOAT       NOT NULL,           -- 0–100, strict mode
+    rf_score        FLOAT       NOT NULL,           -- 0–100, deep mode
+    predicted_grade VARCHAR(5)  NOT NULL,           -- from dt_score
+    model_version   VARCHAR(50) NOT NULL,
+    scored_at       TIMESTAMP   DEFAULT CURRENT_TIMESTAMP
+);
+
 --  SECTION 9 — FILE IMPORT & PARSING
 
 -- 9.1  Uploaded file registry
@@ -256,17 +273,26 @@ CREATE TABLE uploaded_files (
     user_id       UUID         REFERENCES users(user_id) ON DELETE SET NULL,
     session_id    VARCHAR(64),                 -- anonymous browser session UUID
     original_name VARCHAR(255) NOT NULL,
-    stored_name   VARCHAR(255) NOT NULL,       -- UUID-based filename on disk
+    stored_name   VARCHAR(255) NOT NULL,       -- file name on disk (blob store: the content hash)
     file_type     VARCHAR(20)  NOT NULL,       -- pdf, docx, csv, xlsx, txt, png, jpg
     file_size     BIGINT,
+    content_hash  CHAR(64),                    -- SHA-256 of the file, computed while uploading
     category      VARCHAR(50)  DEFAULT 'Other',
     notes         TEXT,
     storage_path  TEXT         NOT NULL,
-    parse_status  VARCHAR(20)  DEFAULT 'pending',  -- pending | done | failed
+    parse_status  VARCHAR(20)  DEFAULT 'pending',  -- pending | parsing | done | failed
+    parse_attempts   INT       DEFAULT 0,      -- times claimed by a parse worker
+    parse_started_at TIMESTAMP,
+    parsed_at        TIMESTAMP,
+    parse_error      TEXT,
     raw_text      TEXT,                        -- full extracted text for search/NLP
     uploaded_at   TIMESTAMP    DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Parse queue: workers claim the oldest pending row (FOR UPDATE SKIP LOCKED)
+CREATE INDEX idx_uploaded_files_parse_queue
+    ON uploaded_files (uploaded_at) WHERE parse_status IN ('pending', 'parsing');
+
 -- 9.2  Structured grades/scores extracted from uploaded files
 CREATE TABLE parsed_grades (
     grade_id      SERIAL       PRIMARY KEY,
@@ -293,6 +319,28 @@ CREATE TABLE parsed_text_snippets (
     extracted_at  TIMESTAMP    DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 9.4  Content-addressed upload store: one file per distinct SHA-256,
+--      shared by every uploaded_files row with that content
+CREATE TABLE upload_blobs (
+    content_hash  CHAR(64)     PRIMARY KEY,
+    storage_path  TEXT         NOT NULL,       -- uploads/blobs/<hash[:2]>/<hash>
+    file_size     BIGINT,
+    ref_count     INT          NOT NULL DEFAULT 1,  -- uploaded_files rows using it
+    created_at    TIMESTAMP    DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 9.5  Parse results per blob, reused for duplicate uploads
+CREATE TABLE parse_cache (
+    content_hash   CHAR(64)    NOT NULL REFERENCES upload_blobs(content_hash) ON DELETE CASCADE,
+    file_type      VARCHAR(20) NOT NULL,
+    parser_version INT         NOT NULL,      -- parsers/file_parser.PARSER_VERSION
+    raw_text       TEXT,
+    grades         JSONB       NOT NULL,
+    snippets       JSONB       NOT NULL,
+    created_at     TIMESTAMP   DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (content_hash, file_type, parser_version)
+);
+
 --  SECTION 10 — APPLE HEALTH IMPORT
 
 -- 10.1  One record per JSON payload received
@@ -312,6 +360,7 @@ CREATE TABLE health_metrics (
     metric_id        SERIAL      PRIMARY KEY,
     import_id        UUID        NOT NULL REFERENCES health_imports(import_id) ON DELETE CASCADE,
     user_id          UUID        REFERENCES users(user_id) ON DELETE SET NULL,
+    session_id       VARCHAR(64),             -- owner, copied from health_imports (dedup key)
     type             VARCHAR(100) NOT NULL,   -- step_count, heart_rate, sleep_analysis, …
     data_class       VARCHAR(50),             -- 'quantity' | 'category'
     value_num        FLOAT,                   -- numeric value (quantity metrics)
@@ -326,6 +375,17 @@ CREATE TABLE health_metrics (
 
 CREATE INDEX idx_health_metrics_import ON health_metrics(import_id);
 CREATE INDEX idx_health_metrics_type   ON health_metrics(type);
+-- One row per sample: re-sent samples are skipped (ON CONFLICT DO NOTHING)
+CREATE UNIQUE INDEX uq_health_metrics_sample
+    ON health_metrics (session_id, type, start_time, end_time, source_device) NULLS NOT DISTINCT;
+
+-- 10.3  Delta-sync high-water mark per user
+CREATE TABLE health_sync_state (
+    session_id          VARCHAR(64) PRIMARY KEY,
+    last_metric_time    TIMESTAMP,            -- latest start_time stored
+    last_sync_timestamp TIMESTAMP,            -- latest client sync_timestamp seen
+    updated_at          TIMESTAMP   DEFAULT CURRENT_TIMESTAMP
+);
 
 -- ============================================================
 --  SECTION 11 — APP USAGE IMPORT
@@ -337,9 +397,14 @@ CREATE TABLE app_usage_imports (
     sync_timestamp TIMESTAMP,
     client_version VARCHAR(20),
     log_count      INT         DEFAULT 0,
+    payload_hash   CHAR(64),                  -- SHA-256 of Idempotency-Key or body
     imported_at    TIMESTAMP   DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Re-submitting the same payload returns the original import
+CREATE UNIQUE INDEX uq_app_usage_imports_payload
+    ON app_usage_imports (session_id, payload_hash) WHERE payload_hash IS NOT NULL;
+
 CREATE TABLE app_usage_entries (
     entry_id      SERIAL      PRIMARY KEY,
     import_id     UUID        NOT NULL REFERENCES app_usage_imports(import_id) ON DELETE CASCADE,
@@ -361,9 +426,13 @@ CREATE TABLE study_imports (
     sync_timestamp TIMESTAMP,
     client_version VARCHAR(20),
     session_count  INT         DEFAULT 0,
+    payload_hash   CHAR(64),                  -- SHA-256 of Idempotency-Key or body
     imported_at    TIMESTAMP   DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE UNIQUE INDEX uq_study_imports_payload
+    ON study_imports (session_id, payload_hash) WHERE payload_hash IS NOT NULL;
+
 CREATE TABLE study_entries (
     entry_id      SERIAL      PRIMARY KEY,
     import_id     UUID        NOT NULL REFERENCES study_imports(import_id) ON DELETE CASCADE,
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
@@ -8,13 +9,18 @@ from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 from routers.auth import router as auth_router
-from routers.activity import router as activity_router
+from routers.activity import ensure_activity_schema, router as activity_router
 from routers.files import router as files_router
-from routers.health import router as health_router
+from routers.health import ensure_health_schema, router as health_router
 from routers.peers import router as peers_router
-from routers.predictions import router as predictions_router
+from routers.predictions import router as predictions_router, warm_global_importance
 from routers.profile import router as profile_router
+from database.blob_store import ensure_blob_schema
+from database.parse_queue import parse_queue
+from database.prediction_log import prediction_log
 from ml_engine import engine as ml_engine
+from ml_sql import install_sql_scorer
+from ml_training import retrain_worker
 
 
 @asynccontextmanager
@@ -24,7 +30,25 @@ async def lifespan(app: FastAPI):
     # Train / load ML models at startup (blocking but runs once)
     ml_engine.ensure_ready()                  # train / load models (sync, runs once)
     await ml_engine.load_cohort_from_db()    # refresh peer data from DB (async)
+    await ensure_health_schema()             # health_metrics dedup key (one-off backfill)
+    await ensure_activity_schema()           # activity import idempotency keys
+    # Global SHAP summary takes seconds — build it in the background
+    app.state.global_importance_task = asyncio.create_task(warm_global_importance())
+    # Retraining runs in a worker process; new releases are hot-swapped in
+    retrain_worker.on_reload.append(warm_global_importance)
+    # Strict-mode tree compiled into Postgres functions, kept on the serving release
+    await install_sql_scorer()
+    retrain_worker.on_reload.append(install_sql_scorer)
+    retrain_worker.start()
+    # Served predictions are persisted in batches off the request path
+    await prediction_log.start()
+    # Uploaded files are parsed by a DB-backed queue in worker processes
+    await ensure_blob_schema()               # content-addressed uploads + parse cache
+    await parse_queue.start()
     yield
+    await parse_queue.stop()
+    await prediction_log.stop()
+    await retrain_worker.stop()
 
 
 app = FastAPI(title="AI Student Assistant", lifespan=lifespan)
@@ -0,0 +1,242 @@
+"""
+Nightly batch scoring of every user → user_predicted_grades.
+
+The Overview dashboard used to run a live Decision Tree prediction on every
+load.  This job precomputes it for all users at once:
+  1. one set-based SQL pass builds every user's baseline vector (the same
+     averages and defaults GET /api/profile/overview uses)
+  2. a server-side cursor streams the vectors in chunks to a process pool,
+     where each worker scores a whole chunk with the DT and RF in one
+     vectorised call
+  3. each scored chunk is COPYed into a temp table and upserted
+
+Every stage is a single pass over the users, so the job scales linearly.
+Run it from cron (see scripts/score_users.py); dashboards fall back to
+live scoring for users it has not reached yet.
+"""
+
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import psycopg
+
+from database.connection import get_dsn
+from ml_engine import BOOTSTRAP_VERSION, MODELS_DIR, MLEngine
+
+log = logging.getLogger(__name__)
+
+BATCH_CHUNK_ROWS = 10_000
+BATCH_WORKERS    = int(os.getenv("BATCH_WORKERS") or os.cpu_count() or 1)
+
+# Used when a user has no data for a metric (mirrors the dashboard's defaults)
+BASELINE_DEFAULTS = {
+    "studyHours":    5.0,
+    "attentionSpan": 40.0,
+    "focusRatio":    70.0,
+    "sleepHours":    7.0,
+    "breakFreq":     2.0,
+}
+
+# Letter grade cut-offs of MLEngine._score_to_grade, lowest first
+GRADE_EDGES  = [25, 40, 55, 70, 90]
+GRADE_LABELS = np.array(["F", "D", "C", "B", "A", "A+"])
+
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS user_predicted_grades (
+    session_id      VARCHAR(64) PRIMARY KEY,
+    study_hours     FLOAT       NOT NULL,
+    attention_span  FLOAT       NOT NULL,
+    focus_ratio     FLOAT       NOT NULL,
+    sleep_hours     FLOAT       NOT NULL,
+    break_freq      FLOAT       NOT NULL,
+    dt_score        FLOAT       NOT NULL,
+    rf_score        FLOAT       NOT NULL,
+    predicted_grade VARCHAR(5)  NOT NULL,
+    model_version   VARCHAR(50) NOT NULL,
+    scored_at       TIMESTAMP   DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# One pass per source table, joined onto every user
+BASELINE_SQL = f"""
+WITH sleep AS (
+    SELECT hi.session_id, ROUND(CAST(AVG(hm.value_num) AS numeric), 1) AS sleep_hours
+    FROM   health_metrics hm
+    JOIN   health_imports hi ON hi.import_id = hm.import_id
+    WHERE  hm.type = 'sleep_analysis'
+      AND  hm.value_num IS NOT NULL
+    GROUP  BY hi.session_id
+),
+focus AS (
+    SELECT ai.session_id, ROUND(
+        SUM(CASE WHEN ae.category='Productive' THEN ae.duration_mins ELSE 0 END) * 100.0
+        / NULLIF(SUM(ae.duration_mins), 0), 1) AS focus_ratio
+    FROM   app_usage_entries ae
+    JOIN   app_usage_imports ai ON ai.import_id = ae.import_id
+    GROUP  BY ai.session_id
+),
+sessions AS (
+    SELECT si.session_id,
+           ROUND(CAST(AVG(se.breaks_taken) AS numeric), 1) AS break_freq,
+           ROUND(CAST(AVG(se.duration_mins::float / (se.breaks_taken + 1)) AS numeric), 0) AS attention_span
+    FROM   study_entries se
+    JOIN   study_imports si ON si.import_id = se.import_id
+    GROUP  BY si.session_id
+),
+daily AS (
+    SELECT si.session_id, SUM(se.duration_mins) AS daily_mins
+    FROM   study_entries se
+    JOIN   study_imports si ON si.import_id = se.import_id
+    GROUP  BY si.session_id, se.started_at::date
+),
+study AS (
+    SELECT session_id, ROUND(CAST(AVG(daily_mins) / 60.0 AS numeric), 1) AS study_hours
+    FROM   daily
+    GROUP  BY session_id
+)
+SELECT u.user_id::text AS session_id,
+       COALESCE(st.study_hours,    {BASELINE_DEFAULTS["studyHours"]})::float8,
+       COALESCE(se.attention_span, {BASELINE_DEFAULTS["attentionSpan"]})::float8,
+       COALESCE(fo.focus_ratio,    {BASELINE_DEFAULTS["focusRatio"]})::float8,
+       COALESCE(sl.sleep_hours,    {BASELINE_DEFAULTS["sleepHours"]})::float8,
+       COALESCE(se.break_freq,     {BASELINE_DEFAULTS["breakFreq"]})::float8
+FROM   users u
+LEFT   JOIN study    st ON st.session_id = u.user_id::text
+LEFT   JOIN sessions se ON se.session_id = u.user_id::text
+LEFT   JOIN focus    fo ON fo.session_id = u.user_id::text
+LEFT   JOIN sleep    sl ON sl.session_id = u.user_id::text
+"""
+
+SCORED_COLUMNS = (
+    "session_id, study_hours, attention_span, focus_ratio, sleep_hours, break_freq, "
+    "dt_score, rf_score, predicted_grade, model_version"
+)
+
+# Per-connection staging table each chunk is COPYed into before the upsert
+STAGING_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS scored (
+    session_id VARCHAR(64), study_hours FLOAT, attention_span FLOAT, focus_ratio FLOAT,
+    sleep_hours FLOAT, break_freq FLOAT, dt_score FLOAT, rf_score FLOAT,
+    predicted_grade VARCHAR(5), model_version VARCHAR(50)
+) ON COMMIT DELETE ROWS
+"""
+
+UPSERT_SQL = f"""
+INSERT INTO user_predicted_grades ({SCORED_COLUMNS})
+SELECT {SCORED_COLUMNS} FROM scored
+ON CONFLICT (session_id) DO UPDATE SET
+    study_hours     = EXCLUDED.study_hours,
+    attention_span  = EXCLUDED.attention_span,
+    focus_ratio     = EXCLUDED.focus_ratio,
+    sleep_hours     = EXCLUDED.sleep_hours,
+    break_freq      = EXCLUDED.break_freq,
+    dt_score        = EXCLUDED.dt_score,
+    rf_score        = EXCLUDED.rf_score,
+    predicted_grade = EXCLUDED.predicted_grade,
+    model_version   = EXCLUDED.model_version,
+    scored_at       = CURRENT_TIMESTAMP
+"""
+
+
+# Helpers
+
+def serving_models(models_dir: Path = MODELS_DIR) -> tuple[Path, str]:
+    """Directory and version of the models the API is serving."""
+    release = MLEngine(models_dir).current_release()
+    if release is not None:
+        return models_dir / "releases" / release, release
+    if (models_dir / "rf.joblib").exists():
+        return models_dir, BOOTSTRAP_VERSION
+    raise FileNotFoundError(f"No trained models under {models_dir} — start the API or run scripts/retrain.py")
+
+
+def score_to_grade(scores: np.ndarray) -> np.ndarray:
+    """Vectorised MLEngine._score_to_grade."""
+    return GRADE_LABELS[np.digitize(np.round(scores), GRADE_EDGES)]
+
+
+# Worker process
+
+_models: dict = {}
+
+
+def _load_models(directory: Path) -> None:
+    """Pool initializer — each worker loads the DT and RF once."""
+    _models["dt"] = joblib.load(directory / "dt.joblib")
+    _models["rf"] = joblib.load(directory / "rf.joblib")
+    _models["rf"].n_jobs = 1   # parallelism comes from the pool
+
+
+def score_chunk(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(DT scores, RF scores) for every row of X, clipped to 0–100."""
+    return (
+        np.clip(_models["dt"].predict(X), 0, 100),
+        np.clip(_models["rf"].predict(X), 0, 100),
+    )
+
+
+# Job
+
+def _read_chunks(conn: psycopg.Connection, chunk_rows: int):
+    """Stream (session_ids, baseline matrix) chunks through a server-side cursor."""
+    with conn.cursor(name="baselines") as cur:
+        cur.itersize = chunk_rows
+        cur.execute(BASELINE_SQL)
+        while rows := cur.fetchmany(chunk_rows):
+            ids, *cols = zip(*rows)
+            yield list(ids), np.column_stack(cols)
+
+
+def _write_chunk(conn: psycopg.Connection, ids: list[str], X: np.ndarray,
+                 dt: np.ndarray, rf: np.ndarray, version: str) -> None:
+    grades = score_to_grade(dt)
+    with conn.cursor() as cur:
+        cur.execute(STAGING_SQL)
+        with cur.copy("COPY scored FROM STDIN") as copy:
+            for row in zip(ids, *X.T.tolist(), dt.tolist(), rf.tolist(), grades.tolist()):
+                copy.write_row((*row, version))
+        cur.execute(UPSERT_SQL)
+    conn.commit()
+
+
+def run_batch_scoring(models_dir: Path = MODELS_DIR, workers: int = BATCH_WORKERS,
+                      chunk_rows: int = BATCH_CHUNK_ROWS) -> dict:
+    """Score every user and upsert user_predicted_grades.  Returns a report."""
+    directory, version = serving_models(models_dir)
+    started = time.perf_counter()
+    scored  = 0
+
+    with psycopg.connect(get_dsn()) as reader, psycopg.connect(get_dsn()) as writer, \
+            ProcessPoolExecutor(workers, initializer=_load_models, initargs=(directory,)) as pool:
+        writer.execute(CREATE_SQL)
+        writer.commit()
+
+        # Keep up to `workers` chunks in flight; write results in order
+        pending: deque = deque()
+
+        def _drain_one() -> int:
+            ids, X, job = pending.popleft()
+            _write_chunk(writer, ids, X, *job.result(), version)
+            return len(ids)
+
+        for ids, X in _read_chunks(reader, chunk_rows):
+            pending.append((ids, X, pool.submit(score_chunk, X)))
+            if len(pending) > workers:
+                scored += _drain_one()
+        while pending:
+            scored += _drain_one()
+
+    seconds = time.perf_counter() - started
+    log.info("Batch scoring: %d users in %.1fs (model %s)", scored, seconds, version)
+    return {
+        "users":         scored,
+        "model_version": version,
+        "seconds":       round(seconds, 2),
+        "users_per_s":   round(scored / seconds, 1) if seconds else None,
+    }
@@ -0,0 +1,197 @@
+"""
+Feature-distribution drift between prediction requests and the training data.
+
+Every /api/predictions/analyze request feeds its five metrics to
+DriftMonitor.observe(), which keeps per feature, in constant memory:
+  - count / running mean / variance (Welford)
+  - min / max
+  - counts over DRIFT_BINS bins whose edges are the training deciles
+
+Against the training distribution (the serving engine's cohort, binned the
+same way) each feature gets
+  - PSI  Σ (obs − ref) · ln(obs / ref) over the bins
+  - KS   largest gap between the binned CDFs
+and is flagged once PSI reaches DRIFT_PSI_ALERT (0.25 is the usual "major
+shift" line).  Statistics restart whenever the engine's cohort or release
+changes, since the reference changed with it.
+
+With DRIFT_AUTO_RETRAIN=1, detected drift starts a retraining job, at most
+once per DRIFT_RETRAIN_COOLDOWN_HOURS.
+"""
+
+import logging
+import math
+import os
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+from ml_engine import FEATURES, MLEngine, engine
+from ml_training import RetrainWorker, retrain_worker
+
+log = logging.getLogger(__name__)
+
+DRIFT_BINS                   = 10
+DRIFT_MIN_SAMPLES            = int(os.getenv("DRIFT_MIN_SAMPLES") or 200)
+DRIFT_CHECK_EVERY            = 100   # observations between automatic checks
+DRIFT_PSI_ALERT              = float(os.getenv("DRIFT_PSI_ALERT") or 0.25)
+DRIFT_AUTO_RETRAIN           = os.getenv("DRIFT_AUTO_RETRAIN", "0") == "1"
+DRIFT_RETRAIN_COOLDOWN_HOURS = float(os.getenv("DRIFT_RETRAIN_COOLDOWN_HOURS") or 24)
+
+# Floor for empty bins so PSI stays finite
+PSI_EPSILON = 1e-4
+
+
+# Helpers
+
+def psi(observed: np.ndarray, expected: np.ndarray) -> float:
+    """Population stability index between two bin-proportion vectors."""
+    o = np.maximum(observed, PSI_EPSILON)
+    e = np.maximum(expected, PSI_EPSILON)
+    return float(((o - e) * np.log(o / e)).sum())
+
+
+def binned_ks(observed: np.ndarray, expected: np.ndarray) -> float:
+    """Kolmogorov–Smirnov statistic on binned CDFs."""
+    return float(np.abs(np.cumsum(observed) - np.cumsum(expected)).max())
+
+
+class FeatureStats:
+    """Streaming moments and histogram of one feature."""
+
+    __slots__ = ("edges", "counts", "count", "mean", "m2", "min", "max")
+
+    def __init__(self, edges: list[float]):
+        self.edges  = edges                       # interior bin edges, ascending
+        self.counts = [0] * (len(edges) + 1)
+        self.count  = 0
+        self.mean   = 0.0
+        self.m2     = 0.0
+        self.min    = math.inf
+        self.max    = -math.inf
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta       = x - self.mean
+        self.mean  += delta / self.count
+        self.m2    += delta * (x - self.mean)
+        self.min    = min(self.min, x)
+        self.max    = max(self.max, x)
+        self.counts[bisect_right(self.edges, x)] += 1
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def proportions(self) -> np.ndarray:
+        return np.asarray(self.counts, dtype=float) / max(self.count, 1)
+
+
+# Monitor
+
+class DriftMonitor:
+    def __init__(self, engine: MLEngine, worker: RetrainWorker):
+        self.engine = engine
+        self.worker = worker
+        self._cohort: np.ndarray | None = None    # reference the stats belong to
+        self._version: str | None = None
+        self._reference: dict[str, dict] = {}
+        self._stats: dict[str, FeatureStats] = {}
+        self._since_check = 0
+        self.last_report: dict | None = None
+        self.last_retrain_at: float | None = None
+
+    def _ensure_reference(self) -> bool:
+        """(Re)bin the training distribution when the engine's cohort changed."""
+        cohort = self.engine._cohort_values
+        if cohort is None:
+            return False
+        if cohort is self._cohort and self._version == self.engine.model_version:
+            return True
+
+        self._reference, self._stats = {}, {}
+        for j, feat in enumerate(FEATURES):
+            col   = cohort[:, j]
+            edges = np.unique(np.quantile(col, np.linspace(0, 1, DRIFT_BINS + 1)[1:-1])).tolist()
+            ref   = np.bincount(np.searchsorted(edges, col, side="right"), minlength=len(edges) + 1)
+            self._reference[feat] = {
+                "proportions": ref / len(col),
+                "mean":        float(col.mean()),
+                "std":         float(col.std(ddof=1)),
+            }
+            self._stats[feat] = FeatureStats(edges)
+        self._cohort, self._version = cohort, self.engine.model_version
+        self._since_check = 0
+        self.last_report  = None
+        return True
+
+    def observe(self, values: dict) -> None:
+        """Add one request's metrics.  Constant time; never raises."""
+        try:
+            if not self._ensure_reference():
+                return
+            for feat in FEATURES:
+                self._stats[feat].add(float(values[feat]))
+            self._since_check += 1
+            if self._since_check >= DRIFT_CHECK_EVERY:
+                self._since_check = 0
+                self.check()
+        except Exception:
+            log.exception("Drift monitor failed to observe a request")
+
+    def report(self) -> dict:
+        """Per-feature statistics and drift scores against the training data."""
+        if not self._ensure_reference():
+            return {"status": "no_reference", "observations": 0}
+
+        n        = self._stats[FEATURES[0]].count
+        features = {}
+        for feat in FEATURES:
+            st, ref = self._stats[feat], self._reference[feat]
+            obs     = st.proportions()
+            features[feat] = {
+                "mean":           round(st.mean, 3),
+                "std":            round(st.std, 3),
+                "min":            st.min if st.count else None,
+                "max":            st.max if st.count else None,
+                "reference_mean": round(ref["mean"], 3),
+                "reference_std":  round(ref["std"], 3),
+                "psi":            round(psi(obs, ref["proportions"]), 4) if st.count else None,
+                "ks":             round(binned_ks(obs, ref["proportions"]), 4) if st.count else None,
+            }
+
+        drifted = [f for f, s in features.items() if s["psi"] is not None and s["psi"] >= DRIFT_PSI_ALERT]
+        if n < DRIFT_MIN_SAMPLES:
+            status = "insufficient_data"
+        else:
+            status = "drift" if drifted else "ok"
+        return {
+            "status":          status,
+            "observations":    n,
+            "model_version":   self._version,
+            "psi_alert":       DRIFT_PSI_ALERT,
+            "psi_max":         max((s["psi"] or 0.0) for s in features.values()),
+            "drifted":         drifted if status == "drift" else [],
+            "auto_retrain":    DRIFT_AUTO_RETRAIN,
+            "last_retrain_at": self.last_retrain_at,
+            "features":        features,
+        }
+
+    def check(self) -> dict:
+        """Recompute the report; start a retraining job on drift if enabled."""
+        report = self.report()
+        if report["status"] == "drift" and (self.last_report or {}).get("status") != "drift":
+            log.warning("Feature drift detected (%s, PSI max %.3f)", ", ".join(report["drifted"]), report["psi_max"])
+        self.last_report = report
+        if report["status"] == "drift" and DRIFT_AUTO_RETRAIN:
+            cooldown = DRIFT_RETRAIN_COOLDOWN_HOURS * 3600
+            if self.last_retrain_at is None or time.time() - self.last_retrain_at >= cooldown:
+                if self.worker.trigger():
+                    self.last_retrain_at = time.time()
+                    log.info("Drift triggered a retraining job")
+        return report
+
+
+# Singleton
+drift_monitor = DriftMonitor(engine, retrain_worker)
@@ -5,12 +5,25 @@ Trains three models on a synthetic student cohort and exposes helper
 functions for three analysis modes:
   - strict : Decision Tree path → IF/THEN rule explanation
   - peer   : K-Nearest Neighbours → comparison with similar students
+             (exact or approximate index over the cohort, see ml_neighbours)
   - deep   : Random Forest + SHAP → feature attribution breakdown
 
-Models are trained once and persisted to /models via joblib.
+Each mode returns a structured explanation (see ml_explain); the text advice
+is rendered from it only when a client asks for text.
+
+Every mode can also place the user within the cohort: each feature column
+and the grade column are kept sorted, so a percentile is one binary search.
+
+Models are trained once and persisted to /models via joblib.  Releases
+retrained by ml_training (in a separate process) are published under
+/models/releases and picked up through /models/CURRENT.  A global SHAP
+summary over the cohort is precomputed after loading (in that same worker
+process) and cached.
 """
 
+import asyncio
 import logging
+import os
 from pathlib import Path
 
 import joblib
@@ -22,29 +35,53 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.ensemble import RandomForestRegressor
 
+from ml_explain import (
+    FEATURE_LABELS, FEATURE_UNITS, DeepExplanation, PathStep, PeerDelta, PeerExplanation,
+    ShapAttribution, StrictExplanation, peer_gaps, strict_tips,
+)
+from ml_neighbours import IVFIndex, build_peer_index, resolve_kind
+
 log = logging.getLogger(__name__)
 
 FEATURES = ["studyHours", "attentionSpan", "focusRatio", "sleepHours", "breakFreq"]
 TARGET   = "currentGrade"
 
-FEATURE_LABELS = {
-    "studyHours":    "Daily study hours",
-    "attentionSpan": "Attention span",
-    "focusRatio":    "Focus ratio",
-    "sleepHours":    "Sleep hours",
-    "breakFreq":     "Breaks / day",
-}
-FEATURE_UNITS = {
-    "studyHours":    "h",
-    "attentionSpan": "min",
-    "focusRatio":    "%",
-    "sleepHours":    "h",
-    "breakFreq":     "",
-}
-
 MODELS_DIR = Path("models")
 CSV_PATH   = Path("mock_cohort_data.csv")
 
+# Lower / upper quantiles of the per-tree Random Forest predictions that
+# bound the reported score interval (an 80% band).
+INTERVAL_QUANTILES = (0.10, 0.90)
+INTERVAL_COVERAGE  = round(INTERVAL_QUANTILES[1] - INTERVAL_QUANTILES[0], 2)
+
+# Global SHAP summary: cohort rows sampled (exact TreeSHAP costs ~20 ms/row
+# on the 150-tree forest) and quantile bins per dependence curve.
+GLOBAL_SHAP_ROWS       = 300
+GLOBAL_DEPENDENCE_BINS = 8
+
+# Up to this many rows the forest is walked tree by tree on the calling
+# thread; rf.apply() hands each call to joblib, which costs ~10 ms per call.
+SMALL_BATCH_ROWS = 256
+
+# model_version reported for models trained at startup (outside ml_training)
+BOOTSTRAP_VERSION = "bootstrap"
+
+# Random Forest size.  ML_COMPACT=1 (small VPS instances) fits a smaller,
+# leaf-limited forest and keeps the cohort as float32 arrays only, without
+# the pandas frame — see scripts/bench_compact.py for the RMSE / latency /
+# memory trade-off of each setting.
+RF_TREES                  = 150
+ML_COMPACT                = os.getenv("ML_COMPACT", "0") == "1"
+COMPACT_RF_TREES          = int(os.getenv("COMPACT_RF_TREES") or 50)
+COMPACT_RF_MAX_LEAF_NODES = int(os.getenv("COMPACT_RF_MAX_LEAF_NODES") or 256)
+
+
+def rf_params(compact: bool = ML_COMPACT) -> dict:
+    """RandomForestRegressor size arguments for full or compact mode."""
+    if compact:
+        return {"n_estimators": COMPACT_RF_TREES, "max_leaf_nodes": COMPACT_RF_MAX_LEAF_NODES}
+    return {"n_estimators": RF_TREES, "max_leaf_nodes": None}
+
 # Data generation (inline, mirrors scripts/generate_mock_cohort.py)
 
 def _generate_data(n: int = 1_000, seed: int = 42) -> pd.DataFrame:
@@ -69,34 +106,107 @@ def _generate_data(n: int = 1_000, seed: int = 42) -> pd.DataFrame:
         "breakFreq": breakFreq,   "currentGrade": currentGrade,
     })
 
+# Global SHAP summary (pure, so it can run in a worker process)
+
+def global_shap_summary(rf: RandomForestRegressor, X: np.ndarray, model_version: str | None = None) -> dict:
+    """
+    Mean |SHAP| per feature plus a binned dependence curve (feature value
+    → mean SHAP) over the rows of X.
+    """
+    explainer = shap.TreeExplainer(rf)
+    sv        = np.asarray(explainer.shap_values(X)).reshape(X.shape)
+
+    features = []
+    for j, feat in enumerate(FEATURES):
+        col   = X[:, j]
+        edges = np.unique(np.quantile(col, np.linspace(0, 1, GLOBAL_DEPENDENCE_BINS + 1)))
+        bins  = np.clip(np.searchsorted(edges, col, side="right") - 1, 0, max(len(edges) - 2, 0))
+        count = np.bincount(bins, minlength=len(edges) - 1)
+        total = np.bincount(bins, weights=sv[:, j], minlength=len(edges) - 1)
+        features.append({
+            "feature_key":   feat,
+            "metric_name":   FEATURE_LABELS[feat],
+            "unit":          FEATURE_UNITS[feat],
+            "mean_abs_shap": round(float(np.abs(sv[:, j]).mean()), 3),
+            "mean_shap":     round(float(sv[:, j].mean()), 3),
+            "dependence": [
+                {
+                    "value_from": round(float(edges[b]), 2),
+                    "value_to":   round(float(edges[min(b + 1, len(edges) - 1)]), 2),
+                    "rows":       int(count[b]),
+                    "mean_shap":  round(float(total[b] / count[b]), 3),
+                }
+                for b in range(len(count)) if count[b]
+            ],
+        })
+    features.sort(key=lambda f: -f["mean_abs_shap"])
+
+    return {
+        "model":         "random_forest",
+        "model_version": model_version,
+        "rows":          len(X),
+        "base_value":    round(float(np.ravel(explainer.expected_value)[0]), 3),
+        "features":      features,
+    }
+
 # Engine
 
 class MLEngine:
-    def __init__(self):
+    def __init__(self, models_dir: Path = MODELS_DIR, compact: bool = ML_COMPACT):
+        self.models_dir = models_dir
+        self.compact    = compact
+        self.model_version: str               | None = None
         self.dt:       DecisionTreeRegressor  | None = None
-        self.knn:      NearestNeighbors       | None = None
+        # Peer index over the scaled cohort (rebuilt whenever the cohort changes)
+        self.knn:      NearestNeighbors | IVFIndex | None = None
         self.rf:       RandomForestRegressor  | None = None
         self.scaler:   StandardScaler         | None = None
+        # Cohort frame (None in compact mode, where only the arrays are kept)
         self.train_df: pd.DataFrame           | None = None
+        # Cohort FEATURES + [TARGET] as one matrix, row-aligned with knn
+        # (float32 in compact mode)
+        self._cohort_values: np.ndarray       | None = None
+        # The same columns, each sorted independently — shape (n_columns, n_rows)
+        self._sorted_columns: np.ndarray      | None = None
+        self._trees:   list                   | None = None
+        # Node values of every RF tree, padded to (n_trees, max_nodes)
+        self._leaf_values: np.ndarray         | None = None
+        self.explainer: shap.TreeExplainer    | None = None
+        self.global_importance: dict          | None = None
 
     # Lifecycle
     def ensure_ready(self):
-        MODELS_DIR.mkdir(exist_ok=True)
-        if self._models_exist():
-            log.info("Loading persisted models from %s", MODELS_DIR)
-            self._load()
+        self.models_dir.mkdir(exist_ok=True)
+        release = self.current_release()
+        if release is not None:
+            log.info("Loading model release %s", release)
+            self._load(self.models_dir / "releases" / release)
+            self.model_version = release
+        elif self._models_exist():
+            log.info("Loading persisted models from %s", self.models_dir)
+            self._load(self.models_dir)
+            self.model_version = BOOTSTRAP_VERSION
         else:
             log.info("No persisted models found — training now…")
             self._train_and_save()
-            log.info("Models trained and saved to %s", MODELS_DIR)
+            self.model_version = BOOTSTRAP_VERSION
+            log.info("Models trained and saved to %s", self.models_dir)
 
     def _models_exist(self) -> bool:
         return (
-            (MODELS_DIR / "dt.joblib").exists()  and
-            (MODELS_DIR / "knn.joblib").exists() and
-            (MODELS_DIR / "rf.joblib").exists()
+            (self.models_dir / "dt.joblib").exists()  and
+            (self.models_dir / "knn.joblib").exists() and
+            (self.models_dir / "rf.joblib").exists()
         )
 
+    def current_release(self) -> str | None:
+        """Version named by models/CURRENT (written by ml_training), if any."""
+        pointer = self.models_dir / "CURRENT"
+        if not pointer.exists():
+            return None
+        release = pointer.read_text().strip()
+        return release if (self.models_dir / "releases" / release).is_dir() else None
+
     def _get_data(self) -> pd.DataFrame:
         if CSV_PATH.exists():
             log.info("Loading cohort data from %s", CSV_PATH)
@@ -108,40 +218,101 @@ class MLEngine:
 
     # Training
     def _train_and_save(self):
-        df = self._get_data()
-        X  = df[FEATURES].values
-        y  = df[TARGET].values
-
-        self.scaler = StandardScaler()
-        X_scaled    = self.scaler.fit_transform(X)
-
-        self.dt = DecisionTreeRegressor(max_depth=3, random_state=42)
-        self.dt.fit(X, y)
+        from ml_training import fit_models
+        df     = self._get_data()
+        models = fit_models(df, compact=self.compact)
 
-        self.knn = NearestNeighbors(n_neighbors=5, metric="euclidean")
-        self.knn.fit(X_scaled)
-
-        self.rf = RandomForestRegressor(n_estimators=150, random_state=42, n_jobs=-1)
-        self.rf.fit(X, y)
-
-        self.train_df = df
+        self.dt, self.knn, self.rf, self.scaler = (
+            models["dt"], models["knn"], models["rf"], models["scaler"]
+        )
+        self._set_cohort(df, fitted=True)
+        self._index_forest()
 
-        joblib.dump(self.dt,                      MODELS_DIR / "dt.joblib")
-        joblib.dump((self.knn, self.scaler),       MODELS_DIR / "knn.joblib")
-        joblib.dump(self.rf,                       MODELS_DIR / "rf.joblib")
-        df.to_csv(MODELS_DIR / "train_data.csv",  index=False)
+        joblib.dump(self.dt,                      self.models_dir / "dt.joblib")
+        joblib.dump((self.knn, self.scaler),       self.models_dir / "knn.joblib")
+        joblib.dump(self.rf,                       self.models_dir / "rf.joblib")
+        df.to_csv(self.models_dir / "train_data.csv", index=False)
 
     # Loading
-    def _load(self):
-        self.dt                = joblib.load(MODELS_DIR / "dt.joblib")
-        self.knn, self.scaler  = joblib.load(MODELS_DIR / "knn.joblib")
-        self.rf                = joblib.load(MODELS_DIR / "rf.joblib")
-        self.train_df          = pd.read_csv(MODELS_DIR / "train_data.csv")
+    def _load(self, directory: Path):
+        self.dt                = joblib.load(directory / "dt.joblib")
+        self.knn, self.scaler  = joblib.load(directory / "knn.joblib")
+        self.rf                = joblib.load(directory / "rf.joblib")
+        self._set_cohort(pd.read_csv(directory / "train_data.csv"), fitted=True)
+        self._index_forest()
+
+    def reload_if_updated(self) -> "MLEngine | None":
+        """
+        Load the release named by models/CURRENT into a fresh engine when it
+        differs from the one being served.  Safe to run in a worker thread:
+        nothing on self changes until the caller hands the result to adopt().
+        """
+        release = self.current_release()
+        if release is None or release == self.model_version:
+            return None
+        fresh = MLEngine(self.models_dir, self.compact)
+        fresh._load(self.models_dir / "releases" / release)
+        fresh.model_version = release
+        return fresh
+
+    def adopt(self, other: "MLEngine") -> None:
+        """Swap in another engine's models.  Call from the event loop thread."""
+        for attr in _MODEL_ATTRS:
+            setattr(self, attr, getattr(other, attr))
+        log.info("Now serving model release %s", self.model_version)
+
+    def _set_cohort(self, df: pd.DataFrame, fitted: bool = False):
+        """
+        Make df the peer cohort.  fitted=True means the persisted KNN was fitted
+        on exactly these rows and can be reused when an exact index is wanted;
+        otherwise the peer index is rebuilt over df (see ml_neighbours).
+        """
+        values = df[FEATURES + [TARGET]].to_numpy(dtype=np.float32 if self.compact else float)
+        if not (fitted and self.knn is not None and resolve_kind(len(df)) == "exact"):
+            self.knn = build_peer_index(self._scale(values[:, :len(FEATURES)]))
+        self.train_df        = None if self.compact else df
+        self._cohort_values  = values
+        self._sorted_columns = np.sort(values, axis=0).T.copy()
+
+    def _index_forest(self):
+        """Gather every tree's node values into one matrix for vectorised lookup."""
+        trees = self._trees = [est.tree_ for est in self.rf.estimators_]
+        width = max(t.node_count for t in trees)
+        self._leaf_values = np.zeros((len(trees), width))
+        for i, t in enumerate(trees):
+            self._leaf_values[i, :t.node_count] = t.value[:, 0, 0]
+        # The explainer walks the same trees — build it once, reuse per request
+        self.explainer         = shap.TreeExplainer(self.rf)
+        self.global_importance = None
 
     # Helpers
     def _X(self, values: dict) -> np.ndarray:
         return np.array([[values[f] for f in FEATURES]])
 
+    def _scale(self, X: np.ndarray) -> np.ndarray:
+        """StandardScaler.transform() without its per-call validation overhead."""
+        return (X - self.scaler.mean_) / self.scaler.scale_
+
+    def _forest_predict(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Random Forest mean plus a quantile band across the individual trees.
+
+        rf.apply() returns every tree's leaf for every row in one call; the
+        per-tree predictions are then a single gather from _leaf_values, so
+        the interval costs no more than rf.predict() itself.  Small batches
+        skip rf.apply()'s joblib dispatch and walk the trees directly.
+        Returns (score, lower, upper) arrays, each clipped to 0–100.
+        """
+        if len(X) <= SMALL_BATCH_ROWS:
+            X32    = np.ascontiguousarray(X, dtype=np.float32)
+            leaves = np.stack([t.apply(X32) for t in self._trees], axis=1)
+        else:
+            leaves = self.rf.apply(X)                                 # (n_rows, n_trees)
+        per_tree = self._leaf_values[np.arange(leaves.shape[1]), leaves]
+        score    = per_tree.mean(axis=1)
+        lower, upper = np.quantile(per_tree, INTERVAL_QUANTILES, axis=1)
+        return np.clip(score, 0, 100), np.clip(lower, 0, 100), np.clip(upper, 0, 100)
+
     def _score_to_grade(self, score: float) -> str:
         s = round(score)
         if s >= 90: return "A+"
@@ -151,12 +322,8 @@ class MLEngine:
         if s >= 25: return "D"
         return "F"
 
-    def _bar(self, v: float, max_v: float, width: int = 12) -> str:
-        filled = round(abs(v) / max_v * width) if max_v else 0
-        return "█" * filled
-
     # Inference
-    def predict_strict(self, values: dict) -> tuple[float, str]:
+    def predict_strict(self, values: dict) -> StrictExplanation:
         """Decision Tree → tree path → IF/THEN rules."""
         X      = self._X(values)
         score  = float(np.clip(self.dt.predict(X)[0], 0, 100))
@@ -167,162 +334,124 @@ class MLEngine:
         node_ids       = node_indicator.indices[
             node_indicator.indptr[0]: node_indicator.indptr[1]
         ]
-
-        lines = ["DECISION PATH:\n"]
-        for step, node_id in enumerate(node_ids, 1):
-            if node_id == leaf_id:
-                break
-            feat  = FEATURES[tree.feature[node_id]]
-            label = FEATURE_LABELS[feat]
-            unit  = FEATURE_UNITS[feat]
-            thr   = tree.threshold[node_id]
-            val   = values[feat]
-            op    = "≤" if val <= thr else ">"
-            arrow = "→ lower range" if val <= thr else "→ higher range"
-            lines.append(
-                f"  [{step}] {label} = {val}{unit} {op} {thr:.1f}{unit}  {arrow}"
+        path = tuple(
+            PathStep(
+                feature=FEATURES[tree.feature[node_id]],
+                value=values[FEATURES[tree.feature[node_id]]],
+                threshold=float(tree.threshold[node_id]),
             )
-
-        grade  = self._score_to_grade(score)
-        trend  = (
-            "↑ ON TRACK — EXCELLENT TRAJECTORY" if score >= 70 else
-            "→ STABLE — ROOM TO IMPROVE"         if score >= 55 else
-            "↓ AT RISK — INTERVENTION REQUIRED"
+            for node_id in node_ids if node_id != leaf_id
+        )
+        return StrictExplanation(
+            score=score, grade=self._score_to_grade(score), path=path, tips=strict_tips(values),
         )
-        lines.append(f"\nPREDICTED SCORE:  {score:.0f} / 100  [{grade}]")
-        lines.append(f"TRAJECTORY:  {trend}\n")
-
-        tips = []
-        if values["studyHours"]    < 4:   tips.append(f"Study hours ({values['studyHours']}h) are below 4h — the highest-leverage change available.")
-        if values["attentionSpan"] < 40:  tips.append(f"Attention span ({values['attentionSpan']}min) is below 40min — try Pomodoro 45/15 splits.")
-        if values["focusRatio"]    < 60:  tips.append(f"Focus ratio ({values['focusRatio']}%) is below 60% — reduce distracting app usage.")
-        if values["sleepHours"]    < 7:   tips.append(f"Sleep ({values['sleepHours']}h) is below 7h — memory consolidation is impaired.")
-        if values["breakFreq"]     < 2:   tips.append(f"Only {values['breakFreq']} breaks/day — structured breaks reduce cognitive fatigue.")
-
-        if tips:
-            lines.append("IMPROVEMENT LEVERS:")
-            for t in tips: lines.append(f"  → {t}")
-        else:
-            lines.append("→ OPTIMAL PARAMETERS DETECTED. MAINTAIN CURRENT TRAJECTORY.")
-
-        return score, "\n".join(lines)
 
-    def predict_peer(self, values: dict) -> tuple[float, str]:
+    def predict_peer(self, values: dict) -> PeerExplanation:
         """KNN → top-5 neighbours → comparison with similar students."""
-        X        = self._X(values)
-        X_scaled = self.scaler.transform(X)
-
-        _, indices     = self.knn.kneighbors(X_scaled)
-        neighbours     = self.train_df.iloc[indices[0]]
-        peer_avg       = neighbours[FEATURES + [TARGET]].mean()
-        peer_grade_avg = float(peer_avg[TARGET])
-        my_score       = float(np.clip(self.rf.predict(X)[0], 0, 100))
-
-        lines = ["YOUR 5 CLOSEST PEERS (by study profile):\n"]
-        for feat in FEATURES:
-            label  = FEATURE_LABELS[feat]
-            unit   = FEATURE_UNITS[feat]
-            mine   = values[feat]
-            avg    = peer_avg[feat]
-            delta  = mine - avg
-            arrow  = f"↑ +{delta:.1f}" if delta > 0.1 else f"↓ {delta:.1f}" if delta < -0.1 else "≈"
-            lines.append(
-                f"  {label:<22} peer avg: {avg:.1f}{unit:<4}   you: {mine}{unit:<4}   {arrow}"
-            )
-
-        lines.append(f"\n  Peer avg grade:  {peer_grade_avg:.0f}/100")
-        lines.append(f"  Your prediction: {my_score:.0f}/100\n")
-
-        gaps = sorted(
-            [(f, peer_avg[f] - values[f]) for f in FEATURES if peer_avg[f] - values[f] > 0.5],
-            key=lambda x: -x[1],
+        X          = self._X(values)
+        _, indices = self.knn.kneighbors(self._scale(X))
+        peer_avg   = self._cohort_values[indices[0]].mean(axis=0, dtype=float)
+        score, lo, hi = self._forest_predict(X)
+        my_score      = float(score[0])
+
+        deltas = tuple(
+            PeerDelta(feature=f, value=values[f], peer_avg=float(avg))
+            for f, avg in zip(FEATURES, peer_avg)
+        )
+        return PeerExplanation(
+            score=my_score,
+            grade=self._score_to_grade(my_score),
+            lower=float(lo[0]),
+            upper=float(hi[0]),
+            peer_grade_avg=float(peer_avg[len(FEATURES)]),
+            deltas=deltas,
+            gaps=peer_gaps(deltas),
         )
-        if gaps:
-            lines.append("BIGGEST GAPS TO CLOSE:")
-            for feat, diff in gaps[:3]:
-                label = FEATURE_LABELS[feat]
-                unit  = FEATURE_UNITS[feat]
-                lines.append(f"  → {label}: +{diff:.1f}{unit} would align you with peer average")
-        else:
-            lines.append("→ You are already at or above your peer group's average on all metrics.")
-
-        return my_score, "\n".join(lines)
 
-    def predict_deep(self, values: dict) -> tuple[float, str, list[dict]]:
+    def predict_deep(self, values: dict) -> DeepExplanation:
         """Random Forest + SHAP → feature attribution breakdown."""
-        X     = self._X(values)
-        score = float(np.clip(self.rf.predict(X)[0], 0, 100))
-
-        explainer   = shap.TreeExplainer(self.rf)
-        shap_values = explainer.shap_values(X)[0]   # shape (n_features,)
-        shap_map    = dict(zip(FEATURES, shap_values))
-
-        sorted_shap  = sorted(shap_map.items(), key=lambda x: x[1])
-        worst        = sorted_shap[0]
-        best         = sorted_shap[-1]
-        max_abs      = max(abs(v) for v in shap_values) or 1.0
-
-        lines = ["SHAP FEATURE ATTRIBUTION — WHAT DRIVES YOUR SCORE:\n"]
-
-        lines.append(
-            f"  TOP POSITIVE FACTOR:  {FEATURE_LABELS[best[0]]}  "
-            f"( +{best[1]:.1f} pts )"
-        )
-        lines.append(
-            f"  TOP NEGATIVE FACTOR:  {FEATURE_LABELS[worst[0]]}  "
-            f"( {worst[1]:.1f} pts )\n"
+        X             = self._X(values)
+        score, lo, hi = self._forest_predict(X)
+        score         = float(score[0])
+
+        shap_values = self.explain_batch(X)[0]   # shape (n_features,)
+        return DeepExplanation(
+            score=score,
+            grade=self._score_to_grade(score),
+            lower=float(lo[0]),
+            upper=float(hi[0]),
+            shap=tuple(
+                ShapAttribution(feature=f, value=values[f], impact=float(sv))
+                for f, sv in zip(FEATURES, shap_values)
+            ),
         )
 
-        lines.append("  FULL BREAKDOWN:")
-        for feat, sv in sorted(shap_map.items(), key=lambda x: -x[1]):
-            label  = FEATURE_LABELS[feat]
-            unit   = FEATURE_UNITS[feat]
-            val    = values[feat]
-            sign   = "+" if sv >= 0 else ""
-            bar    = self._bar(sv, max_abs)
-            lines.append(
-                f"  {label:<22} {val}{unit:<5}  {sign}{sv:+.1f} pts  {bar}"
-            )
-
-        lines.append(f"\nPREDICTED SCORE:  {score:.0f} / 100  [{self._score_to_grade(score)}]\n")
-
-        if abs(worst[1]) > 2:
-            feat  = worst[0]
-            label = FEATURE_LABELS[feat]
-            unit  = FEATURE_UNITS[feat]
-            lines.append(
-                f"HIGHEST IMPACT ACTION:\n"
-                f"  → Improving {label.lower()} is currently costing you "
-                f"~{abs(worst[1]):.1f} pts. Address this first."
-            )
-
-        # Structured SHAP data — sorted by absolute impact descending
-        shap_structured = [
-            {
-                "feature_key":   feat,
-                "metric_name":   FEATURE_LABELS[feat],
-                "unit":          FEATURE_UNITS[feat],
-                "value":         values[feat],
-                "impact_score":  round(float(sv), 2),
-            }
-            for feat, sv in sorted(shap_map.items(), key=lambda x: -abs(x[1]))
+    # Cohort ranking
+    def cohort_percentiles(self, values: dict, score: float) -> dict:
+        """
+        Percentile (0–100) of each feature value, and of the predicted score
+        among the cohort's grades, by np.searchsorted on the sorted columns.
+        Ties count half, so matching the whole cohort lands on the 50th.
+        """
+        cols   = self._sorted_columns
+        n      = cols.shape[1]
+        # In the cohort's dtype, so a value equal to cohort rows ties with them
+        points = np.array([values[f] for f in FEATURES] + [score], dtype=cols.dtype)
+        pct    = [
+            (np.searchsorted(col, v, "left") + np.searchsorted(col, v, "right")) / 2 / n * 100
+            for col, v in zip(cols, points)
         ]
-
-        return score, "\n".join(lines), shap_structured
+        return {
+            "cohort_rows":     n,
+            "features":        {f: round(float(p), 1) for f, p in zip(FEATURES, pct)},
+            "predicted_score": round(float(pct[-1]), 1),
+        }
+
+    # Batch attribution
+    def explain_batch(self, X: np.ndarray) -> np.ndarray:
+        """SHAP values for an (n_rows, n_features) matrix in one explainer call."""
+        X = np.asarray(X, dtype=float).reshape(-1, len(FEATURES))
+        return np.asarray(self.explainer.shap_values(X)).reshape(X.shape)
+
+    def global_importance_sample(self) -> np.ndarray:
+        """Fixed-seed cohort sample the global SHAP summary is computed over."""
+        X = self._cohort_values[:, :len(FEATURES)]
+        if len(X) > GLOBAL_SHAP_ROWS:
+            X = X[np.random.default_rng(42).choice(len(X), GLOBAL_SHAP_ROWS, replace=False)]
+        return X.astype(float)
+
+    def compute_global_importance(self) -> dict:
+        """
+        In-process global SHAP summary (scripts / benchmarks).  The API runs
+        global_shap_summary() in the ml_training worker process instead,
+        because TreeSHAP holds the GIL for the whole computation.
+        """
+        self.global_importance = global_shap_summary(
+            self.rf, self.global_importance_sample(), self.model_version,
+        )
+        return self.global_importance
 
     async def load_cohort_from_db(self) -> None:
         """
-        Replace self.train_df with live data from the cohort_students table.
+        Replace the peer cohort with live data from the cohort_students table.
         Called from the FastAPI lifespan after ensure_ready().
         Falls back silently to the CSV-based DataFrame if the DB is unavailable.
         """
         from database.cohort import async_fetch_cohort_df
         df = await async_fetch_cohort_df()
         if df is not None and len(df) > 0:
-            self.train_df = df
+            # An approximate index over millions of rows takes seconds to build
+            await asyncio.to_thread(self._set_cohort, df)
+            self.global_importance = None
             log.info("Peer mode: using %d cohort rows from DB.", len(df))
         else:
-            log.info("Peer mode: using %d cohort rows from CSV fallback.", len(self.train_df) if self.train_df is not None else 0)
+            log.info("Peer mode: using %d cohort rows from CSV fallback.", len(self._cohort_values) if self._cohort_values is not None else 0)
+
+# Everything reload_if_updated() replaces when a new release is adopted
+_MODEL_ATTRS = (
+    "model_version", "dt", "knn", "rf", "scaler", "train_df", "_cohort_values",
+    "_sorted_columns", "_trees", "_leaf_values", "explainer", "global_importance",
+)
 
 # Singleton
 engine = MLEngine()
@@ -0,0 +1,265 @@
+"""
+Structured explanations returned by MLEngine.predict_* and their text form.
+
+Inference produces plain frozen dataclasses — the decision path, peer
+deltas, SHAP attributions and improvement tips as numbers.  The
+human-readable advice (bars, padding, headings) is produced only on demand
+by render_text(), which is memoised: explanations are immutable and
+hashable, so repeating a request renders once.
+
+  StrictExplanation  Decision Tree path + tips
+  PeerExplanation    per-feature comparison with the 5 nearest peers
+  DeepExplanation    Random Forest SHAP attribution per feature
+
+to_dict() gives the JSON form served by ?format=json.
+"""
+
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+
+FEATURE_LABELS = {
+    "studyHours":    "Daily study hours",
+    "attentionSpan": "Attention span",
+    "focusRatio":    "Focus ratio",
+    "sleepHours":    "Sleep hours",
+    "breakFreq":     "Breaks / day",
+}
+FEATURE_UNITS = {
+    "studyHours":    "h",
+    "attentionSpan": "min",
+    "focusRatio":    "%",
+    "sleepHours":    "h",
+    "breakFreq":     "",
+}
+
+# Strict mode: a tip is given for each feature below its floor
+TIP_FLOORS = {
+    "studyHours":    4,
+    "attentionSpan": 40,
+    "focusRatio":    60,
+    "sleepHours":    7,
+    "breakFreq":     2,
+}
+TIP_TEXT = {
+    "studyHours":    "Study hours ({v}h) are below 4h — the highest-leverage change available.",
+    "attentionSpan": "Attention span ({v}min) is below 40min — try Pomodoro 45/15 splits.",
+    "focusRatio":    "Focus ratio ({v}%) is below 60% — reduce distracting app usage.",
+    "sleepHours":    "Sleep ({v}h) is below 7h — memory consolidation is impaired.",
+    "breakFreq":     "Only {v} breaks/day — structured breaks reduce cognitive fatigue.",
+}
+
+# Peer mode: gaps to the peer average worth mentioning, and how many
+PEER_GAP_MIN  = 0.5
+PEER_GAPS_MAX = 3
+
+RENDER_CACHE_SIZE = 4096
+
+
+# Explanations
+
+@dataclass(frozen=True)
+class PathStep:
+    feature:   str
+    value:     float
+    threshold: float
+
+    @property
+    def lower(self) -> bool:
+        return self.value <= self.threshold
+
+
+@dataclass(frozen=True)
+class StrictExplanation:
+    score: float
+    grade: str
+    path:  tuple[PathStep, ...]
+    tips:  tuple[tuple[str, float], ...]   # (feature, value) below TIP_FLOORS
+
+    kind = "strict"
+
+
+@dataclass(frozen=True)
+class PeerDelta:
+    feature:  str
+    value:    float
+    peer_avg: float
+
+    @property
+    def delta(self) -> float:
+        return self.value - self.peer_avg
+
+
+@dataclass(frozen=True)
+class PeerExplanation:
+    score:          float
+    grade:          str
+    lower:          float
+    upper:          float
+    peer_grade_avg: float
+    deltas:         tuple[PeerDelta, ...]
+    gaps:           tuple[tuple[str, float], ...]   # (feature, peer_avg − value), largest first
+
+    kind = "peer"
+
+    @property
+    def interval(self) -> tuple[float, float]:
+        return self.lower, self.upper
+
+
+@dataclass(frozen=True)
+class ShapAttribution:
+    feature: str
+    value:   float
+    impact:  float                  # SHAP value in grade points
+
+
+@dataclass(frozen=True)
+class DeepExplanation:
+    score: float
+    grade: str
+    lower: float
+    upper: float
+    shap:  tuple[ShapAttribution, ...]   # in FEATURES order
+
+    kind = "deep"
+
+    @property
+    def interval(self) -> tuple[float, float]:
+        return self.lower, self.upper
+
+    def ranked(self) -> list[ShapAttribution]:
+        """Attributions by absolute impact, largest first."""
+        return sorted(self.shap, key=lambda a: -abs(a.impact))
+
+
+Explanation = StrictExplanation | PeerExplanation | DeepExplanation
+
+
+def strict_tips(values: dict) -> tuple[tuple[str, float], ...]:
+    return tuple((f, values[f]) for f, floor in TIP_FLOORS.items() if values[f] < floor)
+
+
+def peer_gaps(deltas: tuple[PeerDelta, ...]) -> tuple[tuple[str, float], ...]:
+    gaps = [(d.feature, -d.delta) for d in deltas if -d.delta > PEER_GAP_MIN]
+    return tuple(sorted(gaps, key=lambda g: -g[1]))
+
+
+def shap_features(expl: DeepExplanation) -> list[dict]:
+    """SHAP rows as served in PredictionResponse.shap_values."""
+    return [
+        {
+            "feature_key":  a.feature,
+            "metric_name":  FEATURE_LABELS[a.feature],
+            "unit":         FEATURE_UNITS[a.feature],
+            "value":        a.value,
+            "impact_score": round(float(a.impact), 2),
+        }
+        for a in expl.ranked()
+    ]
+
+
+def to_dict(expl: Explanation) -> dict:
+    return {"kind": expl.kind, **asdict(expl)}
+
+
+# Text rendering
+
+def _bar(v: float, max_v: float, width: int = 12) -> str:
+    filled = round(abs(v) / max_v * width) if max_v else 0
+    return "█" * filled
+
+
+def _render_strict(e: StrictExplanation) -> str:
+    lines = ["DECISION PATH:\n"]
+    for step, node in enumerate(e.path, 1):
+        label = FEATURE_LABELS[node.feature]
+        unit  = FEATURE_UNITS[node.feature]
+        op    = "≤" if node.lower else ">"
+        arrow = "→ lower range" if node.lower else "→ higher range"
+        lines.append(
+            f"  [{step}] {label} = {node.value}{unit} {op} {node.threshold:.1f}{unit}  {arrow}"
+        )
+
+    trend = (
+        "↑ ON TRACK — EXCELLENT TRAJECTORY" if e.score >= 70 else
+        "→ STABLE — ROOM TO IMPROVE"         if e.score >= 55 else
+        "↓ AT RISK — INTERVENTION REQUIRED"
+    )
+    lines.append(f"\nPREDICTED SCORE:  {e.score:.0f} / 100  [{e.grade}]")
+    lines.append(f"TRAJECTORY:  {trend}\n")
+
+    if e.tips:
+        lines.append("IMPROVEMENT LEVERS:")
+        for feat, value in e.tips:
+            lines.append(f"  → {TIP_TEXT[feat].format(v=value)}")
+    else:
+        lines.append("→ OPTIMAL PARAMETERS DETECTED. MAINTAIN CURRENT TRAJECTORY.")
+    return "\n".join(lines)
+
+
+def _render_peer(e: PeerExplanation) -> str:
+    lines = ["YOUR 5 CLOSEST PEERS (by study profile):\n"]
+    for d in e.deltas:
+        label = FEATURE_LABELS[d.feature]
+        unit  = FEATURE_UNITS[d.feature]
+        delta = d.delta
+        arrow = f"↑ +{delta:.1f}" if delta > 0.1 else f"↓ {delta:.1f}" if delta < -0.1 else "≈"
+        lines.append(
+            f"  {label:<22} peer avg: {d.peer_avg:.1f}{unit:<4}   you: {d.value}{unit:<4}   {arrow}"
+        )
+
+    lines.append(f"\n  Peer avg grade:  {e.peer_grade_avg:.0f}/100")
+    lines.append(f"  Your prediction: {e.score:.0f}/100  (likely {e.lower:.0f}–{e.upper:.0f})\n")
+
+    if e.gaps:
+        lines.append("BIGGEST GAPS TO CLOSE:")
+        for feat, diff in e.gaps[:PEER_GAPS_MAX]:
+            lines.append(
+                f"  → {FEATURE_LABELS[feat]}: +{diff:.1f}{FEATURE_UNITS[feat]} would align you with peer average"
+            )
+    else:
+        lines.append("→ You are already at or above your peer group's average on all metrics.")
+    return "\n".join(lines)
+
+
+def _render_deep(e: DeepExplanation) -> str:
+    ascending = sorted(e.shap, key=lambda a: a.impact)
+    worst, best = ascending[0], ascending[-1]
+    max_abs     = max(abs(a.impact) for a in e.shap) or 1.0
+
+    lines = ["SHAP FEATURE ATTRIBUTION — WHAT DRIVES YOUR SCORE:\n"]
+    lines.append(f"  TOP POSITIVE FACTOR:  {FEATURE_LABELS[best.feature]}  ( +{best.impact:.1f} pts )")
+    lines.append(f"  TOP NEGATIVE FACTOR:  {FEATURE_LABELS[worst.feature]}  ( {worst.impact:.1f} pts )\n")
+
+    lines.append("  FULL BREAKDOWN:")
+    for a in sorted(e.shap, key=lambda a: -a.impact):
+        label = FEATURE_LABELS[a.feature]
+        unit  = FEATURE_UNITS[a.feature]
+        sign  = "+" if a.impact >= 0 else ""
+        lines.append(
+            f"  {label:<22} {a.value}{unit:<5}  {sign}{a.impact:+.1f} pts  {_bar(a.impact, max_abs)}"
+        )
+
+    lines.append(f"\nPREDICTED SCORE:  {e.score:.0f} / 100  [{e.grade}]")
+    lines.append(f"LIKELY RANGE:     {e.lower:.0f}–{e.upper:.0f}\n")
+
+    if abs(worst.impact) > 2:
+        lines.append(
+            f"HIGHEST IMPACT ACTION:\n"
+            f"  → Improving {FEATURE_LABELS[worst.feature].lower()} is currently costing you "
+            f"~{abs(worst.impact):.1f} pts. Address this first."
+        )
+    return "\n".join(lines)
+
+
+_RENDERERS = {
+    StrictExplanation: _render_strict,
+    PeerExplanation:   _render_peer,
+    DeepExplanation:   _render_deep,
+}
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_text(expl: Explanation) -> str:
+    """Human-readable advice for an explanation (memoised)."""
+    return _RENDERERS[type(expl)](expl)
@@ -0,0 +1,223 @@
+"""
+Nearest-neighbour indexes for peer mode.
+
+Peer mode looks up the 5 cohort students closest to the caller in the
+standardised 5-D feature space.  Two interchangeable indexes answer that:
+
+  - exact  : sklearn NearestNeighbors (KD-tree / brute force)
+  - approx : IVFIndex — an inverted-file index over a k-means coarse
+             quantiser, written in NumPy.  A query scans only the rows of
+             the PEER_ANN_PROBES lists whose centroids are nearest to it, so
+             its cost depends on the list size, not the cohort size.
+
+Both expose kneighbors(X) → (distances, indices) like sklearn.  Which one
+is built is chosen by PEER_INDEX (exact | approx | auto); auto goes
+approximate from PEER_ANN_MIN_ROWS cohort rows up.  Every approximate build
+measures its recall@k against exact search on a sample of cohort queries.
+"""
+
+import logging
+import os
+import time
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+log = logging.getLogger(__name__)
+
+PEER_NEIGHBOURS   = 5
+PEER_INDEX        = (os.getenv("PEER_INDEX") or "auto").lower()
+PEER_ANN_MIN_ROWS = int(os.getenv("PEER_ANN_MIN_ROWS") or 200_000)
+PEER_ANN_PROBES   = int(os.getenv("PEER_ANN_PROBES") or 8)
+
+# k-means: training rows per list, Lloyd iterations; entries per distance block
+KMEANS_ROWS_PER_LIST = 32
+KMEANS_ITERATIONS    = 10
+BLOCK_ELEMENTS       = 4_194_304
+
+# Cohort rows used as queries when measuring recall of an approximate build
+RECALL_QUERIES = 100
+
+
+# Helpers
+
+def _sq_dists(A: np.ndarray, B_t2: np.ndarray, B_sq: np.ndarray) -> np.ndarray:
+    """
+    Squared distances from the rows of A to the rows of B (given as -2·Bᵀ and
+    |b|²), minus |a|² — constant along each row, so rankings are unchanged.
+    """
+    d  = A @ B_t2
+    d += B_sq
+    return d
+
+
+def _blocks(A: np.ndarray, B: np.ndarray):
+    """Yield (start, block of A) so each distance block stays ~BLOCK_ELEMENTS."""
+    step = max(1, BLOCK_ELEMENTS // max(len(B), 1))
+    for i in range(0, len(A), step):
+        yield i, A[i:i + step]
+
+
+def _nearest(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+    """Index of the nearest row of B for every row of A."""
+    B_t2, B_sq = -2 * B.T, (B * B).sum(1)
+    out        = np.empty(len(A), dtype=np.intp)
+    for i, block in _blocks(A, B):
+        out[i:i + len(block)] = _sq_dists(block, B_t2, B_sq).argmin(1)
+    return out
+
+
+def _top_k(d2: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k smallest entries of every row, nearest first."""
+    part = np.argpartition(d2, k - 1, axis=1)[:, :k] if k < d2.shape[1] else \
+        np.broadcast_to(np.arange(d2.shape[1]), d2.shape).copy()
+    order = np.take_along_axis(d2, part, 1).argsort(1, kind="stable")
+    return np.take_along_axis(part, order, 1)
+
+
+def exact_kneighbors(X: np.ndarray, queries: np.ndarray, k: int = PEER_NEIGHBOURS) -> np.ndarray:
+    """Brute-force k nearest rows of X for every query (ground truth for recall)."""
+    X, Q = np.asarray(X, dtype=float), np.asarray(queries, dtype=float)
+    X_t2, X_sq = -2 * X.T, (X * X).sum(1)
+    return np.concatenate([_top_k(_sq_dists(block, X_t2, X_sq), k) for _, block in _blocks(Q, X)])
+
+
+# Approximate index
+
+class IVFIndex:
+    """
+    Inverted-file index: k-means centroids plus the cohort rows grouped by
+    their nearest centroid, stored contiguously (rows of list l live in
+    points[offsets[l]:offsets[l + 1]]).
+    """
+
+    def __init__(self, n_neighbors: int = PEER_NEIGHBOURS, n_lists: int | None = None,
+                 n_probe: int = PEER_ANN_PROBES, seed: int = 42):
+        self.n_neighbors = n_neighbors
+        self.n_lists     = n_lists
+        self.n_probe     = n_probe
+        self.seed        = seed
+        self.centroids: np.ndarray | None = None
+        self.points:    np.ndarray | None = None   # rows sorted by list
+        self.point_sq:  np.ndarray | None = None   # |point|², same order
+        self.row_ids:   np.ndarray | None = None   # original row of each point
+        self.offsets:   np.ndarray | None = None
+        self.recall:    float      | None = None
+
+    @property
+    def n_samples_fit_(self) -> int:
+        return 0 if self.points is None else len(self.points)
+
+    def fit(self, X: np.ndarray) -> "IVFIndex":
+        X       = np.ascontiguousarray(X, dtype=np.float32)
+        n_lists = self.n_lists or int(np.clip(np.sqrt(len(X)), 1, 4096))
+        rng     = np.random.default_rng(self.seed)
+
+        # Lloyd's k-means on a sample
+        sample    = X[rng.choice(len(X), min(len(X), n_lists * KMEANS_ROWS_PER_LIST), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assign = _nearest(sample, centroids)
+            counts = np.bincount(assign, minlength=n_lists)
+            for j in range(X.shape[1]):
+                centroids[:, j] = np.bincount(assign, weights=sample[:, j], minlength=n_lists) \
+                    / np.maximum(counts, 1)
+            empty = counts == 0
+            if empty.any():   # reseed empty lists with random sample rows
+                centroids[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+
+        assign           = _nearest(X, centroids)
+        self.row_ids     = np.argsort(assign, kind="stable")
+        self.points      = X[self.row_ids]
+        self.point_sq    = (self.points * self.points).sum(1)
+        self.offsets     = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+        self.centroids   = centroids
+        self.n_lists     = n_lists
+        return self
+
+    def kneighbors(self, X: np.ndarray, n_neighbors: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        k = n_neighbors or self.n_neighbors
+        if k > len(self.points):
+            raise ValueError(f"Expected n_neighbors <= {len(self.points)}, got {k}")
+        Q = np.asarray(X, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+
+        probe    = min(self.n_probe, self.n_lists)
+        cent_sq  = (self.centroids * self.centroids).sum(1)
+        dist     = np.empty((len(Q), k))
+        idx      = np.empty((len(Q), k), dtype=np.intp)
+        for i, q in enumerate(Q):
+            near  = cent_sq - 2 * (self.centroids @ q)
+            lists = np.argpartition(near, probe - 1)[:probe] if probe < self.n_lists else np.argsort(near)
+            # Widen the probe until the lists hold at least k rows
+            wide = probe
+            while (self.offsets[lists + 1] - self.offsets[lists]).sum() < k:
+                wide += 1
+                lists = np.argsort(near)[:wide]
+            spans = [(self.offsets[l], self.offsets[l + 1]) for l in lists]
+            # |p - q|² - |q|², straight off the contiguous list slices
+            d2   = np.concatenate([self.point_sq[a:b] - 2 * (self.points[a:b] @ q) for a, b in spans])
+            cand = np.concatenate([np.arange(a, b) for a, b in spans])
+            top  = _top_k(d2[None, :], k)[0]
+            dist[i] = np.sqrt(np.maximum(d2[top] + q @ q, 0))
+            idx[i]  = self.row_ids[cand[top]]
+        return dist, idx
+
+
+# Construction
+
+def recall_at_k(index, X: np.ndarray, queries: np.ndarray, k: int = PEER_NEIGHBOURS) -> float:
+    """
+    Fraction of the exact k nearest neighbours the index also returns.  A
+    returned row counts when it is no farther than the exact k-th neighbour,
+    so ties between duplicate cohort rows are not scored as misses.
+    """
+    X, Q     = np.asarray(X, dtype=float), np.asarray(queries, dtype=float)
+    truth    = exact_kneighbors(X, Q, k)
+    kth      = np.sqrt(((X[truth[:, -1]] - Q) ** 2).sum(1))
+    found, _ = index.kneighbors(Q, n_neighbors=k)
+    return float((found <= kth[:, None] + 1e-4).mean())
+
+
+def resolve_kind(n_rows: int, kind: str = PEER_INDEX) -> str:
+    if kind == "auto":
+        return "approx" if n_rows >= PEER_ANN_MIN_ROWS else "exact"
+    if kind not in ("exact", "approx"):
+        raise ValueError(f"PEER_INDEX must be exact, approx or auto (got {kind!r})")
+    return kind
+
+
+def build_peer_index(X_scaled: np.ndarray, kind: str = PEER_INDEX):
+    """Exact or approximate index over the scaled cohort, per PEER_INDEX."""
+    kind    = resolve_kind(len(X_scaled), kind)
+    started = time.perf_counter()
+    if kind == "exact":
+        index = NearestNeighbors(n_neighbors=PEER_NEIGHBOURS, metric="euclidean").fit(X_scaled)
+        log.info("Peer index: exact over %d rows (%.2fs)", len(X_scaled), time.perf_counter() - started)
+        return index
+
+    index = IVFIndex().fit(X_scaled)
+    built = time.perf_counter() - started
+    rng   = np.random.default_rng(0)
+    # Nudge the queries off the indexed points so each one is a real lookup
+    queries      = X_scaled[rng.choice(len(X_scaled), min(RECALL_QUERIES, len(X_scaled)), replace=False)]
+    queries      = queries + rng.normal(0, 0.05, queries.shape)
+    index.recall = recall_at_k(index, X_scaled, queries)
+    log.info(
+        "Peer index: approximate over %d rows, %d lists, %d probes, recall@%d %.3f (%.2fs)",
+        len(X_scaled), index.n_lists, index.n_probe, PEER_NEIGHBOURS, index.recall, built,
+    )
+    return index
+
+
+def describe(index) -> dict:
+    """Summary of a peer index for status endpoints and benchmarks."""
+    if isinstance(index, IVFIndex):
+        return {
+            "kind":        "approx",
+            "rows":        index.n_samples_fit_,
+            "n_lists":     index.n_lists,
+            "n_probe":     index.n_probe,
+            "k":           index.n_neighbors,
+            "recall_at_k": None if index.recall is None else round(index.recall, 4),
+        }
+    return {"kind": "exact", "rows": int(getattr(index, "n_samples_fit_", 0))}
@@ -0,0 +1,241 @@
+"""
+Per-segment model sets (e.g. one per major) served from a bounded LRU.
+
+The global MLEngine is trained on the whole cohort.  When SEGMENT_BY names
+a student_profiles column (major | university_name | year_of_study), a user
+whose label has at least SEGMENT_MIN_ROWS matching cohort_students rows is
+scored by a model set trained on those rows alone — its DT, KNN peers, RF,
+SHAP and percentiles are all segment-specific.
+
+Segment model sets live next to the release they belong to:
+    models/releases/<version>/segments/<column>/<slug>/
+(models/segments/… for the bootstrap models), so publishing a new release
+retires them along with the old one.  A set missing on disk is trained in
+the ml_training worker process while the request falls back to the global
+model; a set on disk is loaded on first use (in a thread) into an LRU of at
+most SEGMENT_CACHE_SIZE sets, which caps the memory they take.  A segment
+whose training fails is not retried for SEGMENT_RETRY_COOLDOWN_MINUTES, so
+it cannot keep the shared worker busy; it is served the global model and
+listed under "failed" in status() meanwhile.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from database.cohort import SEGMENT_COLUMNS, sync_fetch_cohort_columns, sync_segment_counts
+from database.execute import fetch_one
+from ml_engine import BOOTSTRAP_VERSION, MLEngine, engine
+from ml_training import RETRAIN_N_JOBS, RetrainWorker, fit_and_evaluate, retrain_worker, write_model_set
+
+log = logging.getLogger(__name__)
+
+# '' disables segmentation
+SEGMENT_BY         = (os.getenv("SEGMENT_BY", "major") or "").strip().lower()
+SEGMENT_MIN_ROWS   = int(os.getenv("SEGMENT_MIN_ROWS") or 150)
+SEGMENT_CACHE_SIZE = int(os.getenv("SEGMENT_CACHE_SIZE") or 8)
+# User → segment label lookups are cached this long (0 = query every request)
+SEGMENT_LABEL_TTL  = float(os.getenv("SEGMENT_LABEL_TTL_SECONDS") or 300)
+LABEL_CACHE_SIZE   = 10_000
+# A segment whose training failed is not resubmitted before this has passed
+SEGMENT_RETRY_COOLDOWN_MINUTES = float(os.getenv("SEGMENT_RETRY_COOLDOWN_MINUTES") or 30)
+
+if SEGMENT_BY and SEGMENT_BY not in SEGMENT_COLUMNS:
+    raise ValueError(f"SEGMENT_BY must be one of {SEGMENT_COLUMNS} or empty (got {SEGMENT_BY!r})")
+
+
+# Helpers
+
+def segment_key(label: str | None) -> str | None:
+    """Normalised label — matches lower(trim(col)) on the database side."""
+    key = (label or "").strip().lower()
+    return key or None
+
+
+def _slug(key: str) -> str:
+    readable = re.sub(r"[^a-z0-9]+", "-", key).strip("-")[:40]
+    return f"{readable}-{hashlib.sha1(key.encode()).hexdigest()[:8]}"
+
+
+# Job (runs inside the ml_training worker process)
+
+def train_segment(column: str, key: str, directory: Path, n_jobs: int = RETRAIN_N_JOBS) -> dict:
+    """Fit a model set on one segment's cohort rows and write it to directory."""
+    df = sync_fetch_cohort_columns((column, key))
+    if len(df) < SEGMENT_MIN_ROWS:
+        return {"published": False, "reason": f"only {len(df)} rows for {column}={key!r}"}
+    models, train, metrics = fit_and_evaluate(df, n_jobs)
+    write_model_set(models, train, {"segment": {column: key}, **metrics}, directory)
+    return {"published": True, "segment": {column: key}, "metrics": metrics}
+
+
+# Registry (runs inside the API process)
+
+class SegmentModels:
+    """
+    Resolves a user's segment label to a model set — the segment's own when
+    it is large enough and available, the global engine otherwise.
+    """
+
+    def __init__(self, engine: MLEngine, worker: RetrainWorker, column: str = SEGMENT_BY,
+                 capacity: int = SEGMENT_CACHE_SIZE, min_rows: int = SEGMENT_MIN_ROWS):
+        self.engine   = engine
+        self.worker   = worker
+        self.column   = column
+        self.capacity = capacity
+        self.min_rows = min_rows
+        self._models:  OrderedDict[str, MLEngine] = OrderedDict()
+        self._counts:  dict[str, int] | None = None
+        self._version: str | None = None
+        self._loading: dict[str, asyncio.Task] = {}
+        self._training: set[str] = set()
+        self._failed:  dict[str, tuple[float, str]] = {}   # key → (failed at, reason)
+        self._tasks:   set[asyncio.Task] = set()
+        self._labels:  OrderedDict[str, tuple[float, str | None]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.column)
+
+    def _directory(self, key: str) -> Path:
+        version = self.engine.model_version
+        base    = self.engine.models_dir
+        if version != BOOTSTRAP_VERSION:
+            base = base / "releases" / version
+        return base / "segments" / self.column / _slug(key)
+
+    def _check_release(self) -> None:
+        """Segment sets belong to one global release — drop them when it changes."""
+        if self._version != self.engine.model_version:
+            self._models.clear()
+            self._failed.clear()
+            self._counts  = None
+            self._version = self.engine.model_version
+
+    async def resolve_user(self, user_id: str) -> tuple[MLEngine, str | None]:
+        """resolve() with the label from the user's student_profiles row."""
+        if not self.enabled:
+            return self.engine, None
+        try:
+            label = await self._label(user_id)
+        except Exception as exc:
+            log.warning("Segment label lookup failed (%s) — using the global model", exc)
+            return self.engine, None
+        return await self.resolve(label)
+
+    async def _label(self, user_id: str) -> str | None:
+        """The user's segment label, cached for SEGMENT_LABEL_TTL seconds."""
+        now    = time.monotonic()
+        cached = self._labels.get(user_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        row = await fetch_one(
+            f"SELECT {self.column} AS label FROM student_profiles WHERE user_id = %s",
+            (user_id,),
+        )
+        label = row["label"] if row else None
+        if SEGMENT_LABEL_TTL > 0:
+            self._labels[user_id] = (now + SEGMENT_LABEL_TTL, label)
+            self._labels.move_to_end(user_id)
+            while len(self._labels) > LABEL_CACHE_SIZE:
+                self._labels.popitem(last=False)
+        return label
+
+    async def resolve(self, label: str | None) -> tuple[MLEngine, str | None]:
+        """(model set, segment key) for a label; (global engine, None) on fallback."""
+        key = segment_key(label)
+        if not self.enabled or key is None:
+            return self.engine, None
+        self._check_release()
+
+        model = self._models.get(key)
+        if model is not None:
+            self._models.move_to_end(key)
+            return model, key
+
+        try:
+            if self._counts is None:
+                self._counts = await asyncio.to_thread(sync_segment_counts, self.column)
+            if self._counts.get(key, 0) < self.min_rows:
+                return self.engine, None
+
+            directory = self._directory(key)
+            if not (directory / "rf.joblib").exists():
+                self._train_later(key, directory)
+                return self.engine, None
+
+            version = self._version
+            model   = await self._load(key, directory)
+        except Exception as exc:
+            log.warning("Segment %s=%r unavailable (%s) — using the global model", self.column, key, exc)
+            return self.engine, None
+
+        if version != self.engine.model_version:   # release swapped while loading
+            return self.engine, None
+        self._models[key] = model
+        self._models.move_to_end(key)
+        while len(self._models) > self.capacity:
+            evicted, _ = self._models.popitem(last=False)
+            log.info("Segment cache full — evicted %s=%r", self.column, evicted)
+        return model, key
+
+    async def _load(self, key: str, directory: Path) -> MLEngine:
+        """Load once per key even when several requests miss at the same time."""
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(asyncio.to_thread(self._load_sync, directory))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await task
+
+    def _load_sync(self, directory: Path) -> MLEngine:
+        model = MLEngine(directory)
+        model._load(directory)
+        model.model_version = self.engine.model_version
+        log.info("Loaded segment model set from %s", directory)
+        return model
+
+    def _train_later(self, key: str, directory: Path) -> None:
+        if key in self._training:
+            return
+        failed = self._failed.get(key)
+        if failed and time.time() - failed[0] < SEGMENT_RETRY_COOLDOWN_MINUTES * 60:
+            return
+        self._training.add(key)
+        task = asyncio.create_task(self._train(key, directory))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _train(self, key: str, directory: Path) -> None:
+        try:
+            report = await self.worker.submit(train_segment, self.column, key, directory)
+            log.info("Segment training finished: %s", report)
+            if report.get("published"):
+                self._failed.pop(key, None)
+            else:
+                self._failed[key] = (time.time(), report.get("reason", "not published"))
+        except Exception as exc:
+            log.exception("Segment training failed for %s=%r", self.column, key)
+            self._failed[key] = (time.time(), str(exc))
+        finally:
+            self._training.discard(key)
+
+    def status(self) -> dict:
+        return {
+            "column":   self.column or None,
+            "min_rows": self.min_rows,
+            "capacity": self.capacity,
+            "loaded":   list(self._models),
+            "training": sorted(self._training),
+            "failed":   {key: {"failed_at": at, "reason": reason} for key, (at, reason) in self._failed.items()},
+            "retry_cooldown_minutes": SEGMENT_RETRY_COOLDOWN_MINUTES,
+        }
+
+
+# Singleton
+segment_models = SegmentModels(engine, retrain_worker)
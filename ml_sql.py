@@ -0,0 +1,159 @@
+"""
+Strict-mode Decision Tree compiled to SQL, for scoring inside Postgres.
+
+The strict-mode DecisionTreeRegressor is a handful of threshold tests, so it
+compiles to one nested CASE expression.  install_sql_scorer() turns the
+serving tree into:
+
+  strict_score(study_hours, attention_span, focus_ratio, sleep_hours, break_freq)
+      → 0–100 score, identical to MLEngine.predict_strict
+  strict_grade(score)          → letter grade (MLEngine._score_to_grade)
+  strict_model_version()       → release the two functions were compiled from
+  strict_model_hash()          → hash of the compiled SQL (what installs compare)
+  cohort_strict_scores (view)  → every cohort_students row with its score/grade
+
+so batch reports and at-risk queries score students without shipping rows
+to Python, e.g.
+    SELECT * FROM cohort_strict_scores WHERE strict_grade IN ('D', 'F');
+
+It runs at startup and after every hot-swapped release, and is a no-op when
+the database already holds the same compiled tree.  That is decided on a
+hash of the SQL, not the release label: every model trained at startup is
+labelled "bootstrap", whatever cohort it was fitted on.
+"""
+
+import hashlib
+import logging
+
+import psycopg
+from sklearn.tree import DecisionTreeRegressor
+
+from database.cohort import SEGMENT_COLUMNS
+from database.connection import get_conn
+from ml_engine import MLEngine, engine
+
+log = logging.getLogger(__name__)
+
+# SQL argument / cohort_students column for each of ml_engine.FEATURES
+SQL_COLUMNS = ["study_hours", "attention_span", "focus_ratio", "sleep_hours", "break_freq"]
+
+GRADE_SQL = """
+CREATE OR REPLACE FUNCTION strict_grade(score float8) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $fn$
+    SELECT CASE
+        WHEN round(score) >= 90 THEN 'A+'
+        WHEN round(score) >= 70 THEN 'A'
+        WHEN round(score) >= 55 THEN 'B'
+        WHEN round(score) >= 40 THEN 'C'
+        WHEN round(score) >= 25 THEN 'D'
+        ELSE 'F'
+    END
+$fn$;
+"""
+
+# Inputs are rounded to real first: sklearn compares float32 features
+# against float64 thresholds
+SCORE_SQL = """
+CREATE OR REPLACE FUNCTION strict_score({args}) RETURNS float8
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $fn$
+    SELECT GREATEST(0, LEAST(100,
+{case}
+    ))
+    FROM (SELECT {inputs}) f
+$fn$;
+"""
+
+VERSION_SQL = """
+CREATE OR REPLACE FUNCTION strict_model_version() RETURNS text
+LANGUAGE sql IMMUTABLE AS $fn$ SELECT {version} $fn$;
+"""
+
+HASH_SQL = """
+CREATE OR REPLACE FUNCTION strict_model_hash() RETURNS text
+LANGUAGE sql IMMUTABLE AS $fn$ SELECT '{digest}' $fn$;
+"""
+
+VIEW_SQL = f"""
+CREATE OR REPLACE VIEW cohort_strict_scores AS
+SELECT {", ".join(f"c.{col}" for col in ["id", *SQL_COLUMNS, "current_grade", *SEGMENT_COLUMNS])},
+       s.strict_score, strict_grade(s.strict_score) AS strict_grade
+FROM   cohort_students c
+CROSS  JOIN LATERAL (SELECT strict_score({", ".join(f"c.{col}" for col in SQL_COLUMNS)}) AS strict_score) s;
+"""
+
+
+# Compiler
+
+def compile_tree(dt: DecisionTreeRegressor, columns: list[str] = SQL_COLUMNS, indent: int = 8) -> str:
+    """Nested CASE expression equivalent to dt.predict over the given columns."""
+    tree = dt.tree_
+
+    def node(i: int, depth: int) -> str:
+        pad = " " * (indent + 4 * depth)
+        if tree.children_left[i] == tree.children_right[i]:   # leaf
+            return f"{pad}{float(tree.value[i][0][0])!r}"
+        return (
+            f"{pad}CASE WHEN {columns[tree.feature[i]]} <= {float(tree.threshold[i])!r} THEN\n"
+            f"{node(tree.children_left[i], depth + 1)}\n"
+            f"{pad}ELSE\n"
+            f"{node(tree.children_right[i], depth + 1)}\n"
+            f"{pad}END"
+        )
+
+    return node(0, 0)
+
+
+def _scorer_body(dt: DecisionTreeRegressor) -> str:
+    return (
+        GRADE_SQL
+        + SCORE_SQL.format(
+            args=", ".join(f"{col} float8" for col in SQL_COLUMNS),
+            inputs=", ".join(f"{col}::real::float8 AS {col}" for col in SQL_COLUMNS),
+            case=compile_tree(dt, [f"f.{col}" for col in SQL_COLUMNS]),
+        )
+        + VIEW_SQL
+    )
+
+
+def scorer_hash(dt: DecisionTreeRegressor) -> str:
+    """Identifies the compiled tree (and the SQL around it)."""
+    return hashlib.sha256(_scorer_body(dt).encode()).hexdigest()[:16]
+
+
+def scorer_sql(dt: DecisionTreeRegressor, version: str) -> str:
+    """Every statement install_sql_scorer runs, as one script."""
+    literal = "'" + version.replace("'", "''") + "'"
+    return (
+        _scorer_body(dt)
+        + VERSION_SQL.format(version=literal)
+        + HASH_SQL.format(digest=scorer_hash(dt))
+    )
+
+
+# Installation
+
+async def installed_hash() -> str | None:
+    async with await get_conn() as conn:
+        try:
+            row = await (await conn.execute("SELECT strict_model_hash() AS digest")).fetchone()
+        except psycopg.errors.UndefinedFunction:
+            return None
+    return row["digest"]
+
+
+async def install_sql_scorer(model: MLEngine = engine) -> bool:
+    """(Re)install the SQL scorer for model's release.  True if anything changed."""
+    if model.dt is None:
+        return False
+    try:
+        version = model.model_version
+        if await installed_hash() == scorer_hash(model.dt):
+            return False
+        async with await get_conn() as conn:
+            await conn.execute(scorer_sql(model.dt, version))
+            await conn.commit()
+    except Exception as exc:
+        log.warning("Could not install the SQL strict scorer (%s)", exc)
+        return False
+    log.info("Installed SQL strict scorer for model %s", version)
+    return True
@@ -0,0 +1,274 @@
+"""
+Background retraining pipeline for the ScholarVision models.
+
+A retraining job never runs on the request-serving process.  It runs in a
+spawned worker process and:
+  1. pulls the latest cohort_students rows through the columnar loader
+  2. holds out a test split and fits DT, KNN and RF in parallel
+  3. scores DT and RF on the holdout
+  4. writes the artifacts to models/releases/<version>/ and atomically
+     repoints models/CURRENT at it
+
+The API process only pays for loading a finished release: it loads it in a
+worker thread (MLEngine.reload_if_updated) and swaps it in on the event loop
+(MLEngine.adopt).
+
+Jobs are started on demand (POST /api/predictions/retrain or
+scripts/retrain.py) and, when RETRAIN_INTERVAL_HOURS is set, on a schedule.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+from ml_engine import FEATURES, ML_COMPACT, MODELS_DIR, TARGET, MLEngine, engine, rf_params
+
+log = logging.getLogger(__name__)
+
+HOLDOUT_FRACTION = 0.2
+MIN_TRAIN_ROWS   = 200
+KEEP_RELEASES    = 3
+
+# 0 = on demand only
+RETRAIN_INTERVAL_HOURS = float(os.getenv("RETRAIN_INTERVAL_HOURS") or 0)
+# Leave a core for the API process by default
+RETRAIN_N_JOBS         = int(os.getenv("RETRAIN_N_JOBS") or max(1, (os.cpu_count() or 2) - 1))
+# How often the API process checks models/CURRENT for releases published elsewhere
+RELEASE_POLL_SECONDS   = 30
+
+
+# Fitting
+
+def fit_models(df: pd.DataFrame, n_jobs: int = -1, compact: bool = ML_COMPACT) -> dict:
+    """
+    Fit scaler + KNN, Decision Tree and Random Forest concurrently.
+    sklearn releases the GIL while building trees, so threads are enough.
+    compact=True fits the smaller forest of ml_engine.rf_params.
+    """
+    X = df[FEATURES].values
+    y = df[TARGET].values
+
+    def _knn():
+        scaler = StandardScaler()
+        knn    = NearestNeighbors(n_neighbors=5, metric="euclidean")
+        knn.fit(scaler.fit_transform(X))
+        return knn, scaler
+
+    def _dt():
+        return DecisionTreeRegressor(max_depth=3, random_state=42).fit(X, y)
+
+    def _rf():
+        return RandomForestRegressor(**rf_params(compact), random_state=42, n_jobs=n_jobs).fit(X, y)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        knn_job, dt_job, rf_job = pool.submit(_knn), pool.submit(_dt), pool.submit(_rf)
+        knn, scaler = knn_job.result()
+        return {"dt": dt_job.result(), "knn": knn, "rf": rf_job.result(), "scaler": scaler}
+
+
+def evaluate(models: dict, holdout: pd.DataFrame) -> dict:
+    """RMSE / MAE / R² of the DT and RF on rows they were not fitted on."""
+    X = holdout[FEATURES].values
+    y = holdout[TARGET].values
+    report = {}
+    for name in ("dt", "rf"):
+        err = np.clip(models[name].predict(X), 0, 100) - y
+        report[name] = {
+            "rmse": round(float(np.sqrt(np.mean(err ** 2))), 3),
+            "mae":  round(float(np.mean(np.abs(err))), 3),
+            "r2":   round(float(1 - np.sum(err ** 2) / np.sum((y - y.mean()) ** 2)), 4),
+        }
+    return report
+
+
+def fit_and_evaluate(df: pd.DataFrame, n_jobs: int = -1,
+                     compact: bool = ML_COMPACT) -> tuple[dict, pd.DataFrame, dict]:
+    """Hold out a test split, fit on the rest, score.  Returns (models, train, metrics)."""
+    holdout = df.sample(frac=HOLDOUT_FRACTION, random_state=42)
+    train   = df.drop(holdout.index).reset_index(drop=True)
+    models  = fit_models(train, n_jobs=n_jobs, compact=compact)
+    metrics = {"rows": len(df), "train_rows": len(train), "holdout_rows": len(holdout),
+               "rf_params": rf_params(compact), **evaluate(models, holdout)}
+    return models, train, metrics
+
+
+# Publishing
+
+def write_model_set(models: dict, train_df: pd.DataFrame, metrics: dict, directory: Path) -> None:
+    """
+    Write the artifacts MLEngine._load() reads into a hidden staging
+    directory, then rename it to directory — never visible half-written.
+    """
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    staging = directory.parent / f".{directory.name}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    joblib.dump(models["dt"],                     staging / "dt.joblib")
+    joblib.dump((models["knn"], models["scaler"]), staging / "knn.joblib")
+    joblib.dump(models["rf"],                     staging / "rf.joblib")
+    train_df.to_csv(staging / "train_data.csv", index=False)
+    (staging / "metrics.json").write_text(json.dumps(metrics, indent=2))
+    staging.rename(directory)
+
+
+def publish(models: dict, train_df: pd.DataFrame, metrics: dict, models_dir: Path = MODELS_DIR) -> str:
+    """
+    Write a complete release next to the live ones, then flip models/CURRENT
+    with an atomic rename — a reader never sees a half-written release.
+    """
+    releases = models_dir / "releases"
+    releases.mkdir(parents=True, exist_ok=True)
+
+    version = datetime.now(timezone.utc).strftime("v%Y%m%dT%H%M%SZ")
+    while (releases / version).exists():
+        version += "_"
+    write_model_set(models, train_df, metrics, releases / version)
+
+    pointer = models_dir / "CURRENT.tmp"
+    pointer.write_text(version)
+    os.replace(pointer, models_dir / "CURRENT")
+
+    for old in sorted(p for p in releases.iterdir() if not p.name.startswith("."))[:-KEEP_RELEASES]:
+        shutil.rmtree(old, ignore_errors=True)
+    return version
+
+
+# Job (runs inside the worker process)
+
+def run_retraining(models_dir: Path = MODELS_DIR, n_jobs: int = RETRAIN_N_JOBS) -> dict:
+    """Pull → fit → evaluate → publish.  Returns a JSON-serialisable report."""
+    from database.cohort import sync_fetch_cohort_columns
+
+    started = time.perf_counter()
+    df      = sync_fetch_cohort_columns()
+    if len(df) < MIN_TRAIN_ROWS:
+        return {"published": False, "reason": f"only {len(df)} cohort rows (need {MIN_TRAIN_ROWS})"}
+
+    models, train, metrics = fit_and_evaluate(df, n_jobs)
+    version = publish(models, train, metrics, models_dir)
+
+    return {
+        "published": True,
+        "version":   version,
+        "seconds":   round(time.perf_counter() - started, 1),
+        "metrics":   metrics,
+    }
+
+
+def _lower_priority() -> None:
+    """Worker initializer — let the API process win any CPU contention."""
+    try:
+        os.nice(10)
+    except OSError:
+        pass
+
+
+# Scheduling (runs inside the API process)
+
+class RetrainWorker:
+    """
+    Owns the single spawned worker process, starts jobs on demand or on a
+    schedule, and hot-swaps each published release into the serving engine.
+    """
+
+    def __init__(self, engine: MLEngine):
+        self.engine      = engine
+        self.running     = False
+        self.last_report: dict | None = None
+        # Coroutine functions started after a new release has been adopted
+        self.on_reload: list[Callable[[], Awaitable]] = []
+        self._pool:  ProcessPoolExecutor | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def start(self) -> None:
+        self._spawn(self._watch_releases())
+        if RETRAIN_INTERVAL_HOURS > 0:
+            self._spawn(self._schedule(RETRAIN_INTERVAL_HOURS * 3600))
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority,
+            )
+        return self._pool
+
+    async def submit(self, fn, *args):
+        """
+        Run other GIL-heavy model work (e.g. the global SHAP summary) in the
+        same worker process.  Jobs queue behind any running retrain.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._ensure_pool(), fn, *args)
+
+    def trigger(self) -> bool:
+        """Start a retraining job.  Returns False if one is already running."""
+        if self.running:
+            return False
+        self.running = True
+        self._spawn(self._run())
+        return True
+
+    async def _run(self) -> None:
+        try:
+            self.last_report = await self.submit(run_retraining, self.engine.models_dir)
+            log.info("Retraining finished: %s", self.last_report)
+            await self.reload()
+        except Exception as exc:
+            log.exception("Retraining failed")
+            self.last_report = {"published": False, "error": str(exc)}
+        finally:
+            self.running = False
+
+    async def reload(self) -> None:
+        fresh = await asyncio.to_thread(self.engine.reload_if_updated)
+        if fresh is None:
+            return
+        self.engine.adopt(fresh)
+        for hook in self.on_reload:
+            self._spawn(hook())
+
+    async def _watch_releases(self) -> None:
+        while True:
+            await asyncio.sleep(RELEASE_POLL_SECONDS)
+            try:
+                await self.reload()
+            except Exception:
+                log.exception("Could not load new model release")
+
+    async def _schedule(self, interval_s: float) -> None:
+        while True:
+            await asyncio.sleep(interval_s)
+            self.trigger()
+
+
+# Singleton
+retrain_worker = RetrainWorker(engine)
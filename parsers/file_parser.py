@@ -13,12 +13,28 @@ Supported formats:
 from __future__ import annotations
 
 import io
+import os
 import re
 import csv
+import zipfile
 from dataclasses import dataclass, field
 from typing import Optional
 
 
+# Page-parallel PDF extraction: worker processes (0/1 = sequential) and the
+# smallest document worth splitting — below it, process start-up dominates
+PDF_PAGE_WORKERS       = int(os.getenv("PDF_PAGE_WORKERS") or 0)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES") or 16)
+
+# Bump whenever parse output changes — cached parse results (parse_cache) are keyed on it
+PARSER_VERSION = 1
+
+# raw_text kept per upload (uploaded_files.raw_text); XLSX stops building it there
+RAW_TEXT_MAX = 50_000
+# XLSX rows handed to _extract_grades_from_df at a time while streaming a sheet
+XLSX_CHUNK_ROWS = 5_000
+
+
 # Output types 
 
 @dataclass
@@ -53,6 +69,9 @@ class ParseResult:
 # e.g.  CS101, MATH 202, ENG-003
 COURSE_CODE_RE = re.compile(r'\b([A-Z]{2,6}[\s\-]?\d{3,4}[A-Z]?)\b')
 
+# Any digit (same \d as the patterns below)
+DIGIT_RE = re.compile(r'\d')
+
 # Grade letters: A+, A, B-, C+, etc.
 GRADE_LETTER_RE = re.compile(r'\b([A-F][+-]?)\b')
 
@@ -65,6 +84,17 @@ SCORE_FRAC_RE = re.compile(r'(\d+\.?\d*)\s*/\s*(\d+\.?\d*)')
 # GPA: 3.7/4.0 or 3.70 / 4
 GPA_RE = re.compile(r'\b(\d\.\d{1,2})\s*/\s*4\.?0?\b')
 
+# Anything float() accepts once stripped: 87, -1.5e3, 1_000, .5, nan, inf
+FLOAT_RE = re.compile(
+    r'[+-]?(?:(?:\d(?:_?\d)*(?:\.(?:\d(?:_?\d)*)?)?|\.\d(?:_?\d)*)(?:e[+-]?\d(?:_?\d)*)?'
+    r'|nan|inf(?:inity)?)',
+    re.IGNORECASE,
+)
+
+# Course names: text before the first ':', '-' or '|'
+NAME_SPLIT_RE = re.compile(r'[:\-|]')
+SPACES_RE     = re.compile(r'\s+')
+
 # Semester hints: "Semester 1", "Spring 2024", "2023-24 S2"
 SEMESTER_RE = re.compile(
     r'(?:semester\s*\d|spring|autumn|fall|summer|winter)\s*\d{0,4}',
@@ -84,43 +114,53 @@ def _extract_grade_from_line(line: str, row_idx: int = 0) -> Optional[ParsedGrad
     if len(line) < 3:
         return None
 
-    grade = ParsedGrade(source_row=row_idx)
-
-    # Course code
-    cc = COURSE_CODE_RE.search(line)
-    if cc:
-        grade.course_code = cc.group(1).strip()
-
-    # Percentage first (more specific than bare numbers)
-    pct = PERCENTAGE_RE.search(line)
-    if pct:
-        grade.percentage = float(pct.group(1))
-        grade.score      = grade.percentage
-        grade.max_score  = 100.0
-
-    # Score fraction: 42/50
-    if not grade.percentage:
-        frac = SCORE_FRAC_RE.search(line)
-        if frac:
-            s, m = float(frac.group(1)), float(frac.group(2))
-            if m <= 200:   # sanity: avoid matching years like 2023/2024
-                grade.score      = s
-                grade.max_score  = m
-                grade.percentage = _normalise_percentage(s, m)
+    code = percentage = score = max_score = None
+
+    # Codes, percentages and fractions all need a digit, so most prose
+    # lines only have to be searched for a grade letter
+    if DIGIT_RE.search(line):
+        # Course code
+        cc = COURSE_CODE_RE.search(line)
+        if cc:
+            code = cc.group(1).strip()
+
+        # Percentage first (more specific than bare numbers)
+        pct = PERCENTAGE_RE.search(line)
+        if pct:
+            percentage = score = float(pct.group(1))
+            max_score  = 100.0
+
+        # Score fraction: 42/50
+        if not percentage:
+            frac = SCORE_FRAC_RE.search(line)
+            if frac:
+                s, m = float(frac.group(1)), float(frac.group(2))
+                if m <= 200:   # sanity: avoid matching years like 2023/2024
+                    score      = s
+                    max_score  = m
+                    percentage = _normalise_percentage(s, m)
 
     # Grade letter
-    gl = GRADE_LETTER_RE.search(line)
-    if gl:
-        grade.grade_letter = gl.group(1)
+    gl     = GRADE_LETTER_RE.search(line)
+    letter = gl.group(1) if gl else None
 
     # At least one piece of useful data?
-    if not any([grade.percentage, grade.score, grade.grade_letter, grade.course_code]):
+    if not (percentage or score or letter or code):
         return None
 
+    grade = ParsedGrade(
+        course_code  = code,
+        grade_letter = letter,
+        score        = score,
+        max_score    = max_score,
+        percentage   = percentage,
+        source_row   = row_idx,
+    )
+
     # Heuristic: first "word-like" token before the code/grade is the course name
-    name_part = re.split(r'[:\-|]', line)[0].strip()
+    name_part = NAME_SPLIT_RE.split(line, 1)[0].strip()
     name_part  = COURSE_CODE_RE.sub('', name_part).strip()
-    name_part  = re.sub(r'\s+', ' ', name_part)
+    name_part  = SPACES_RE.sub(' ', name_part)
     if 3 <= len(name_part) <= 120:
         grade.course_name = name_part
 
@@ -165,67 +205,189 @@ def _parse_txt(content: bytes) -> ParseResult:
     return result
 
 
-def _parse_pdf(content: bytes) -> ParseResult:
-    try:
-        import pdfplumber
-    except ImportError:
-        return ParseResult(error="pdfplumber not installed")
+def _may_have_table(page) -> bool:
+    """
+    Cheap gate for page.extract_tables().  With the default "lines"
+    strategy every table cell is bounded by ruling edges, so a page needs
+    at least two horizontal and two vertical edges (lines, rect sides,
+    curve segments) before a table is possible.  Prose pages have none and
+    skip the table finder altogether — its output cannot change.
+    """
+    h = v = 0
+    for edge in page.edges:
+        if edge["orientation"] == "h":
+            h += 1
+        elif edge["orientation"] == "v":
+            v += 1
+        if h >= 2 and v >= 2:
+            return True
+    return False
 
-    result   = ParseResult()
-    all_text = []
+
+PdfPages = list[tuple[str, list[ParsedGrade], list[TextSnippet]]]
+
+
+def _pdf_page(page, page_num: int, pages: PdfPages) -> None:
+    """
+    Append the text, grades and snippets of one pdfplumber page to `pages`.
+    The entry goes in as soon as the text is out, so if the page fails
+    part-way its text and whatever was found before the error are kept,
+    as the sequential parser always did.
+    """
     grades   = []
     snippets = []
+    page_text = page.extract_text() or ""
+    pages.append((page_text, grades, snippets))
 
+    # Extract tables if present
+    tables = page.extract_tables() if _may_have_table(page) else []
+    for table in tables:
+        if not table:
+            continue
+        headers = [str(c).lower() for c in (table[0] or [])]
+        course_idx = _find_col(headers, ['course', 'module', 'subject', 'unit'])
+        grade_idx  = _find_col(headers, ['grade', 'mark', 'score', 'result', 'percentage'])
+        code_idx   = _find_col(headers, ['code', 'course code', 'module code'])
+        sem_idx    = _find_col(headers, ['semester', 'term', 'year'])
+
+        for row_i, row in enumerate(table[1:], start=1):
+            if not row:
+                continue
+            g = ParsedGrade(source_row=row_i)
+            if course_idx is not None and course_idx < len(row):
+                g.course_name = str(row[course_idx] or '').strip()
+            if code_idx is not None and code_idx < len(row):
+                g.course_code = str(row[code_idx] or '').strip()
+            if grade_idx is not None and grade_idx < len(row):
+                raw = str(row[grade_idx] or '').strip()
+                g   = _fill_grade_value(g, raw)
+            if sem_idx is not None and sem_idx < len(row):
+                g.semester = str(row[sem_idx] or '').strip()
+            if g.course_name or g.grade_letter or g.percentage:
+                grades.append(g)
+
+    # Line-by-line extraction as fallback
+    for i, line in enumerate(page_text.splitlines()):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if len(stripped) < 80 and stripped.isupper():
+            snippets.append(TextSnippet('heading', stripped, page_num))
+        elif len(stripped) > 30:
+            g = _extract_grade_from_line(stripped, i)
+            if g:
+                grades.append(g)
+            else:
+                snippets.append(TextSnippet('comment', stripped, page_num))
+
+
+def _pdf_pages(content: bytes, first: int = 0, last: Optional[int] = None) -> tuple[PdfPages, Optional[str]]:
+    """
+    Pages [first, last) of the document, in order.  On an error the pages
+    before it (and what was read of the failing one) are kept and the
+    message returned.
+    """
+    import pdfplumber
+
+    pages: PdfPages = []
     try:
         with pdfplumber.open(io.BytesIO(content)) as pdf:
-            for page_num, page in enumerate(pdf.pages, start=1):
-                page_text = page.extract_text() or ""
-                all_text.append(page_text)
+            for page_num, page in enumerate(pdf.pages[first:last], start=first + 1):
+                _pdf_page(page, page_num, pages)
+                page.close()   # drop the page's cached layout objects
+    except Exception as e:
+        return pages, str(e)
+    return pages, None
 
-                # Extract tables if present
-                for table in page.extract_tables():
-                    if not table:
-                        continue
-                    headers = [str(c).lower() for c in (table[0] or [])]
-                    course_idx = _find_col(headers, ['course', 'module', 'subject', 'unit'])
-                    grade_idx  = _find_col(headers, ['grade', 'mark', 'score', 'result', 'percentage'])
-                    code_idx   = _find_col(headers, ['code', 'course code', 'module code'])
-                    sem_idx    = _find_col(headers, ['semester', 'term', 'year'])
-
-                    for row_i, row in enumerate(table[1:], start=1):
-                        if not row:
-                            continue
-                        g = ParsedGrade(source_row=row_i)
-                        if course_idx is not None and course_idx < len(row):
-                            g.course_name = str(row[course_idx] or '').strip()
-                        if code_idx is not None and code_idx < len(row):
-                            g.course_code = str(row[code_idx] or '').strip()
-                        if grade_idx is not None and grade_idx < len(row):
-                            raw = str(row[grade_idx] or '').strip()
-                            g   = _fill_grade_value(g, raw)
-                        if sem_idx is not None and sem_idx < len(row):
-                            g.semester = str(row[sem_idx] or '').strip()
-                        if g.course_name or g.grade_letter or g.percentage:
-                            grades.append(g)
-
-                # Line-by-line extraction as fallback
-                for i, line in enumerate(page_text.splitlines()):
-                    stripped = line.strip()
-                    if not stripped:
-                        continue
-                    if len(stripped) < 80 and stripped.isupper():
-                        snippets.append(TextSnippet('heading', stripped, page_num))
-                    elif len(stripped) > 30:
-                        g = _extract_grade_from_line(stripped, i)
-                        if g:
-                            grades.append(g)
-                        else:
-                            snippets.append(TextSnippet('comment', stripped, page_num))
 
+def _pdf_pages_shared(shm_name: str, size: int, first: int, last: int) -> tuple[PdfPages, Optional[str]]:
+    """Worker: reopen the document from the parent's shared-memory copy."""
+    from multiprocessing.shared_memory import SharedMemory
+
+    shm = SharedMemory(name=shm_name, track=False)
+    try:
+        content = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+    return _pdf_pages(content, first, last)
+
+
+_pdf_executor = None   # (workers, ProcessPoolExecutor), created on first use
+
+
+def _pdf_pool(workers: int):
+    global _pdf_executor
+    if _pdf_executor is None or _pdf_executor[0] != workers:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        if _pdf_executor is not None:
+            _pdf_executor[1].shutdown(wait=False)
+        _pdf_executor = (workers, ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ))
+    return _pdf_executor[1]
+
+
+def _pdf_pages_parallel(content: bytes, page_count: int, workers: int) -> tuple[PdfPages, Optional[str]]:
+    """Fan contiguous page ranges out to the pool and merge them in page order."""
+    from multiprocessing.shared_memory import SharedMemory
+
+    step   = -(-page_count // min(workers, page_count))
+    ranges = [(first, min(first + step, page_count)) for first in range(0, page_count, step)]
+
+    shm = SharedMemory(create=True, size=len(content))
+    try:
+        shm.buf[:len(content)] = content
+        pool    = _pdf_pool(workers)
+        futures = [pool.submit(_pdf_pages_shared, shm.name, len(content), a, b) for a, b in ranges]
+        pages: PdfPages = []
+        error = None
+        for fut in futures:
+            chunk, chunk_error = fut.result()
+            if error is None:
+                pages.extend(chunk)
+                error = chunk_error   # later ranges come after the failing page — dropped
+    finally:
+        shm.close()
+        shm.unlink()
+    return pages, error
+
+
+def _parse_pdf(content: bytes, workers: Optional[int] = None) -> ParseResult:
+    """
+    Sequential by default.  With PDF_PAGE_WORKERS > 1 (or `workers`),
+    documents of at least PDF_PARALLEL_MIN_PAGES pages are split into page
+    ranges parsed in a process pool — results are identical either way.
+    """
+    try:
+        import pdfplumber
+    except ImportError:
+        return ParseResult(error="pdfplumber not installed")
+
+    result  = ParseResult()
+    workers = PDF_PAGE_WORKERS if workers is None else workers
+
+    pages, error = [], None
+    try:
+        if workers > 1:
+            with pdfplumber.open(io.BytesIO(content)) as pdf:
+                page_count = len(pdf.pages)
+            if page_count >= PDF_PARALLEL_MIN_PAGES:
+                pages, error = _pdf_pages_parallel(content, page_count, workers)
+            else:
+                pages, error = _pdf_pages(content)
+        else:
+            pages, error = _pdf_pages(content)
     except Exception as e:
-        result.error = str(e)
+        error = str(e)
 
-    result.raw_text = "\n\n".join(all_text)
+    grades   = [g for _, page_grades, _ in pages for g in page_grades]
+    snippets = [s for _, _, page_snippets in pages for s in page_snippets]
+
+    result.error    = error
+    result.raw_text = "\n\n".join(text for text, _, _ in pages)
     result.grades   = _dedup_grades(grades)
     result.snippets = snippets[:300]
     return result
@@ -308,11 +470,83 @@ def _parse_csv(content: bytes) -> ParseResult:
     return result
 
 
+def _xlsx_cell(value) -> str:
+    """Cell value as pandas' read_excel(dtype=str) would give it."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
 def _parse_xlsx(content: bytes) -> ParseResult:
+    """
+    Streams each sheet with openpyxl in read-only mode instead of loading it
+    into a DataFrame: the first non-empty row is the header, data rows are
+    passed to _extract_grades_from_df XLSX_CHUNK_ROWS at a time, and raw_text
+    stops growing at RAW_TEXT_MAX.  Legacy .xls (not a zip) goes via pandas.
+    """
     try:
         import pandas as pd
-    except ImportError:
-        return ParseResult(error="pandas not installed")
+        from openpyxl import load_workbook
+    except ImportError as e:
+        return ParseResult(error=f"{e.name} not installed")
+
+    if not zipfile.is_zipfile(io.BytesIO(content)):
+        return _parse_xls(content)
+
+    result = ParseResult()
+    text:   list[str] = []
+    grades: list[ParsedGrade] = []
+    size = 0
+
+    def add_text(line: str) -> None:
+        nonlocal size
+        if size < RAW_TEXT_MAX:
+            text.append(line)
+            size += len(line) + 1
+
+    def flush(columns, rows, index) -> None:
+        if rows:
+            grades.extend(_extract_grades_from_df(pd.DataFrame(rows, columns=columns, index=index)))
+            rows.clear()
+            index.clear()
+
+    try:
+        wb = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                add_text(f"--- Sheet: {ws.title} ---")
+                columns: list[str] = []
+                rows, index = [], []
+                for row_no, row in enumerate(ws.iter_rows(values_only=True), start=1):
+                    cells = [_xlsx_cell(v) for v in row]
+                    if not any(cells):
+                        continue
+                    if not columns:
+                        columns = cells
+                        add_text("\t".join(cells).rstrip("\t"))
+                        continue
+                    # Rows of a read-only sheet can be ragged; fit them to the header
+                    cells = cells[:len(columns)] + [''] * (len(columns) - len(cells))
+                    add_text("\t".join(cells).rstrip("\t"))
+                    rows.append(cells)
+                    index.append(row_no - 2)   # _extract_grades_from_df reports index + 2
+                    if len(rows) >= XLSX_CHUNK_ROWS:
+                        flush(columns, rows, index)
+                flush(columns, rows, index)
+                add_text("")
+        finally:
+            wb.close()
+        result.raw_text = "\n".join(text).rstrip("\n")[:RAW_TEXT_MAX]
+        result.grades   = grades
+    except Exception as e:
+        result.error = str(e)
+    return result
+
+
+def _parse_xls(content: bytes) -> ParseResult:
+    import pandas as pd
 
     result = ParseResult()
     try:
@@ -388,9 +622,75 @@ def _fill_grade_value(g: ParsedGrade, raw: str) -> ParsedGrade:
     return g
 
 
-def _extract_grades_from_df(df) -> list[ParsedGrade]:
+def _grade_values(values) -> dict:
+    """
+    _fill_grade_value over a whole column.  Each cell goes through the same
+    branches in the same order (letter, percentage, fraction, bare number),
+    but every branch is one pandas str.extract / str.fullmatch over the
+    cells still left.
+    Returns {field: (positions, values)} for the fields the cells write.
+    """
+    import numpy as np
     import pandas as pd
-    grades = []
+
+    raw  = pd.Series([str(v) for v in values], dtype=object).str.strip()
+    rest = np.flatnonzero((raw != '').to_numpy())
+    out: dict[str, tuple] = {}
+
+    def put(field_name, rows, vals) -> None:
+        if len(rows):
+            old = out.get(field_name)
+            out[field_name] = (rows, vals) if old is None else (
+                np.concatenate([old[0], rows]), list(old[1]) + list(vals),
+            )
+
+    # Grade letter — anchored, as GRADE_LETTER_RE.match
+    cells  = raw.iloc[rest]
+    letter = cells.str.extract('^' + GRADE_LETTER_RE.pattern, expand=False)
+    hit    = (letter.notna() & (cells.str.len() <= 3)).to_numpy()
+    put('grade_letter', rest[hit], letter.to_numpy()[hit].tolist())
+    rest   = rest[~hit]
+
+    # Percentage
+    pct  = raw.iloc[rest].str.extract(PERCENTAGE_RE.pattern, expand=False)
+    hit  = pct.notna().to_numpy()
+    vals = pct.to_numpy()[hit].astype(float).tolist()
+    put('percentage', rest[hit], vals)
+    put('score',      rest[hit], vals)
+    put('max_score',  rest[hit], [100.0] * len(vals))
+    rest = rest[~hit]
+
+    # Fraction — a match ends the cell even when the max is implausible
+    frac = raw.iloc[rest].str.extract(SCORE_FRAC_RE.pattern)
+    hit  = frac[0].notna().to_numpy()
+    s, m = frac.to_numpy()[hit].astype(float).T
+    ok   = m <= 200
+    rows = rest[hit][ok]
+    s, m = s[ok].tolist(), m[ok].tolist()
+    put('score',      rows, s)
+    put('max_score',  rows, m)
+    put('percentage', rows, [_normalise_percentage(a, b) for a, b in zip(s, m)])
+    rest = rest[~hit]
+
+    # Bare number
+    cells = raw.iloc[rest]
+    hit   = cells.str.fullmatch(FLOAT_RE.pattern, flags=FLOAT_RE.flags).to_numpy()
+    rows  = rest[hit]
+    nums  = cells.to_numpy()[hit].astype(float)
+    gpa   = nums <= 4.0
+    pct   = ~gpa & (nums <= 100)
+    big   = ~gpa & ~pct   # includes nan
+    put('percentage', rows[gpa], [round(v / 4.0 * 100, 2) for v in nums[gpa].tolist()])
+    put('percentage', rows[pct], nums[pct].tolist())
+    put('score',      rows[pct], nums[pct].tolist())
+    put('max_score',  rows[pct], [100.0] * int(pct.sum()))
+    put('score',      rows[big], nums[big].tolist())
+    return out
+
+
+def _extract_grades_from_df(df) -> list[ParsedGrade]:
+    import numpy as np
+
     headers_lower = [str(c).lower().strip() for c in df.columns]
 
     course_idx = _find_col(headers_lower, COURSE_KEYWORDS)
@@ -398,30 +698,50 @@ def _extract_grades_from_df(df) -> list[ParsedGrade]:
     code_idx   = _find_col(headers_lower, CODE_KEYWORDS)
     sem_idx    = _find_col(headers_lower, SEMESTER_KEYWORDS)
 
-    cols = list(df.columns)
-
-    for row_i, row in df.iterrows():
-        g = ParsedGrade(source_row=int(row_i) + 2)  # +2 accounts for header row
-
-        if course_idx is not None:
-            g.course_name = str(row.iloc[course_idx]).strip()
-        if code_idx is not None:
-            g.course_code = str(row.iloc[code_idx]).strip()
-        if grade_idx is not None:
-            g = _fill_grade_value(g, str(row.iloc[grade_idx]))
-        if sem_idx is not None:
-            g.semester = str(row.iloc[sem_idx]).strip()
-
-        # Fallback: if no column detected, scan all cells for grade-like values
-        if grade_idx is None:
-            for val in row.values:
-                g = _fill_grade_value(g, str(val))
-                if g.grade_letter or g.percentage:
-                    break
-
-        if g.course_name or g.grade_letter or g.percentage:
-            grades.append(g)
+    n = len(df)
+
+    def text(idx):
+        if idx is None:
+            return [None] * n
+        return [str(v).strip() for v in df.iloc[:, idx]]
+
+    values = {f: np.full(n, None, dtype=object) for f in ('grade_letter', 'percentage', 'score', 'max_score')}
+    if grade_idx is not None:
+        for f, (rows, vals) in _grade_values(df.iloc[:, grade_idx]).items():
+            values[f][rows] = vals
+    else:
+        # Fallback: no grade column, so scan each row's cells left to right up to
+        # the first one that gives a letter or a non-zero percentage
+        active = np.arange(n)
+        for col in range(df.shape[1]):
+            if not len(active):
+                break
+            found = _grade_values(df.iloc[active, col])
+            done  = np.zeros(len(active), dtype=bool)
+            for f, (rows, vals) in found.items():
+                values[f][active[rows]] = vals
+                if f == 'grade_letter':
+                    done[rows] = True
+                elif f == 'percentage':
+                    done[rows] |= np.array([bool(v) for v in vals], dtype=bool)
+            active = active[~done]
 
+    grades = []
+    for row_i, name, code, sem, letter, pct, score, max_score in zip(
+        df.index, text(course_idx), text(code_idx), text(sem_idx),
+        values['grade_letter'], values['percentage'], values['score'], values['max_score'],
+    ):
+        if name or letter or pct:
+            grades.append(ParsedGrade(
+                course_name  = name,
+                course_code  = code,
+                grade_letter = letter,
+                score        = score,
+                max_score    = max_score,
+                percentage   = pct,
+                semester     = sem,
+                source_row   = int(row_i) + 2,   # +2 accounts for header row
+            ))
     return grades
 
 
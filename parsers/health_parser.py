@@ -9,11 +9,18 @@ Expected top-level shape:
     "metrics": [ { type, data_class, value, unit, start_time, end_time,
                    source_device, metadata? } ]
   }
+
+HealthStreamParser consumes the document in chunks (e.g. straight off the
+request stream) and yields metrics as each entry completes, so imports run
+in constant memory whatever their size; parse_health_json() is the same
+parser over an in-memory document.
 """
 
 from __future__ import annotations
 
+import codecs
 import json
+import re
 from dataclasses import dataclass, field
 from typing import Optional
 
@@ -69,70 +76,217 @@ KNOWN_TYPES = {
 
 # Parser
 
-def parse_health_json(content: bytes) -> HealthParseResult:
-    """Parse Apple Health export JSON bytes into a HealthParseResult."""
-    try:
-        data = json.loads(content.decode("utf-8"))
-    except Exception as e:
-        return HealthParseResult(
-            source_user_id=None, sync_timestamp=None, client_version=None,
-            error=f"JSON decode error: {e}",
-        )
+# Largest single metric entry / top-level field buffered while streaming
+MAX_VALUE_BYTES = 1024 * 1024
+
+_WS = re.compile(r"[ \t\n\r]*")
+
+
+class HealthParseError(ValueError):
+    pass
+
+
+def _to_metric(m: object) -> Optional[HealthMetric]:
+    """One entry of the metrics array → HealthMetric, or None to skip it."""
+    if not isinstance(m, dict):
+        return None
+
+    raw_val = m.get("value")
+    if isinstance(raw_val, (int, float)):
+        value_num: Optional[float] = float(raw_val)
+        value_cat: Optional[str]   = None
+    elif raw_val is not None:
+        value_num = None
+        value_cat = str(raw_val)
+    else:
+        value_num = None
+        value_cat = None
+
+    meta             = m.get("metadata") or {}
+    was_user_entered = bool(meta.get("was_user_entered", False)) if isinstance(meta, dict) else False
+
+    start = m.get("start_time", "")
+    if not start:
+        return None  # skip malformed entries without a timestamp
+
+    return HealthMetric(
+        type             = str(m.get("type", "unknown")),
+        data_class       = str(m.get("data_class", "quantity")),
+        value_num        = value_num,
+        value_cat        = value_cat,
+        unit             = m.get("unit"),
+        start_time       = start,
+        end_time         = m.get("end_time"),
+        source_device    = m.get("source_device"),
+        was_user_entered = was_user_entered,
+    )
+
+
+class HealthStreamParser:
+    """
+    Incremental parser for the export document.
+
+    feed() takes raw bytes as they arrive and returns the metrics completed
+    so far; close() returns the rest and checks the document ended.  Only
+    the unparsed tail is buffered — each metrics entry is decoded on its own
+    (json.JSONDecoder.raw_decode) as soon as it is complete — so memory does
+    not grow with the size of the export.  The top-level fields may come
+    before or after the metrics array.
+    """
+
+    _MORE = object()
+
+    def __init__(self):
+        self.source_user_id: Optional[str] = None
+        self.sync_timestamp: Optional[str] = None
+        self.client_version: Optional[str] = None
+        self.metric_count = 0
+        self.counts: dict[str, int] = {}
+        self._utf8    = codecs.getincrementaldecoder("utf-8")()
+        self._json    = json.JSONDecoder()
+        self._buf     = ""
+        self._pos     = 0
+        self._state   = "start"
+        self._key: Optional[str] = None
+        self._final   = False
 
-    if not isinstance(data, dict):
+    def feed(self, chunk: bytes) -> list[HealthMetric]:
+        try:
+            self._buf += self._utf8.decode(chunk)
+        except UnicodeDecodeError as e:
+            raise HealthParseError(f"JSON decode error: {e}") from None
+        return self._parse()
+
+    def close(self) -> list[HealthMetric]:
+        try:
+            self._buf += self._utf8.decode(b"", final=True)
+        except UnicodeDecodeError as e:
+            raise HealthParseError(f"JSON decode error: {e}") from None
+        self._final = True
+        metrics = self._parse()
+        if self._state != "end":
+            raise HealthParseError("JSON decode error: unexpected end of document")
+        return metrics
+
+    def result(self, metrics: Optional[list[HealthMetric]] = None) -> HealthParseResult:
         return HealthParseResult(
-            source_user_id=None, sync_timestamp=None, client_version=None,
-            error="Expected a JSON object at the top level",
+            source_user_id = self.source_user_id,
+            sync_timestamp = self.sync_timestamp,
+            client_version = self.client_version,
+            metrics        = metrics or [],
         )
 
-    raw_metrics = data.get("metrics", [])
-    if not isinstance(raw_metrics, list):
+    # Internals
+    def _skip_ws(self) -> Optional[str]:
+        """Advance past whitespace; the next character, or None at end of buffer."""
+        self._pos = _WS.match(self._buf, self._pos).end()
+        return self._buf[self._pos] if self._pos < len(self._buf) else None
+
+    def _value(self):
+        """Decode the JSON value at the cursor, or _MORE if it is not complete yet."""
+        try:
+            value, end = self._json.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError as e:
+            if self._final:
+                raise HealthParseError(f"JSON decode error: {e}") from None
+            if len(self._buf) - self._pos > MAX_VALUE_BYTES:
+                raise HealthParseError(f"Entry larger than {MAX_VALUE_BYTES} bytes or malformed") from None
+            return self._MORE
+        if end == len(self._buf) and not self._final:
+            return self._MORE   # a number may continue in the next chunk
+        self._pos = end
+        return value
+
+    def _parse(self) -> list[HealthMetric]:
+        metrics: list[HealthMetric] = []
+        while (ch := self._skip_ws()) is not None:
+            state = self._state
+
+            if state == "start":
+                if ch != "{":
+                    raise HealthParseError("Expected a JSON object at the top level")
+                self._pos  += 1
+                self._state = "first_key"
+
+            elif state in ("first_key", "key"):
+                if ch == "}" and state == "first_key":
+                    self._pos  += 1
+                    self._state = "end"
+                    continue
+                if ch != '"':
+                    raise HealthParseError("JSON decode error: expected an object key")
+                key = self._value()
+                if key is self._MORE:
+                    break
+                self._key   = key
+                self._state = "colon"
+
+            elif state == "colon":
+                if ch != ":":
+                    raise HealthParseError("JSON decode error: expected ':' after an object key")
+                self._pos  += 1
+                self._state = "value"
+
+            elif state == "value":
+                if self._key == "metrics":
+                    if ch != "[":
+                        raise HealthParseError("'metrics' field must be a list")
+                    self._pos  += 1
+                    self._state = "first_entry"
+                    continue
+                value = self._value()
+                if value is self._MORE:
+                    break
+                if self._key == "user_id":
+                    self.source_user_id = value
+                elif self._key in ("sync_timestamp", "client_version"):
+                    setattr(self, self._key, value)
+                self._state = "after_value"
+
+            elif state == "after_value":
+                if ch not in ",}":
+                    raise HealthParseError("JSON decode error: expected ',' or '}'")
+                self._pos  += 1
+                self._state = "key" if ch == "," else "end"
+
+            elif state in ("first_entry", "entry"):
+                if ch == "]" and state == "first_entry":
+                    self._pos  += 1
+                    self._state = "after_value"
+                    continue
+                entry = self._value()
+                if entry is self._MORE:
+                    break
+                metric = _to_metric(entry)
+                if metric is not None:
+                    metrics.append(metric)
+                    self.metric_count += 1
+                    self.counts[metric.type] = self.counts.get(metric.type, 0) + 1
+                self._state = "after_entry"
+
+            elif state == "after_entry":
+                if ch not in ",]":
+                    raise HealthParseError("JSON decode error: expected ',' or ']'")
+                self._pos  += 1
+                self._state = "entry" if ch == "," else "after_value"
+
+            else:   # end
+                raise HealthParseError("JSON decode error: extra data after the document")
+
+        self._buf, self._pos = self._buf[self._pos:], 0
+        return metrics
+
+
+def parse_health_json(content: bytes) -> HealthParseResult:
+    """Parse Apple Health export JSON bytes into a HealthParseResult."""
+    parser = HealthStreamParser()
+    try:
+        metrics = parser.feed(content) + parser.close()
+    except HealthParseError as e:
         return HealthParseResult(
-            source_user_id=None, sync_timestamp=None, client_version=None,
-            error="'metrics' field must be a list",
+            source_user_id=None, sync_timestamp=None, client_version=None, error=str(e),
         )
-
-    metrics: list[HealthMetric] = []
-    for i, m in enumerate(raw_metrics):
-        if not isinstance(m, dict):
-            continue
-
-        raw_val = m.get("value")
-        if isinstance(raw_val, (int, float)):
-            value_num: Optional[float] = float(raw_val)
-            value_cat: Optional[str]   = None
-        elif raw_val is not None:
-            value_num = None
-            value_cat = str(raw_val)
-        else:
-            value_num = None
-            value_cat = None
-
-        meta             = m.get("metadata") or {}
-        was_user_entered = bool(meta.get("was_user_entered", False)) if isinstance(meta, dict) else False
-
-        start = m.get("start_time", "")
-        if not start:
-            continue  # skip malformed entries without a timestamp
-
-        metrics.append(HealthMetric(
-            type             = str(m.get("type", "unknown")),
-            data_class       = str(m.get("data_class", "quantity")),
-            value_num        = value_num,
-            value_cat        = value_cat,
-            unit             = m.get("unit"),
-            start_time       = start,
-            end_time         = m.get("end_time"),
-            source_device    = m.get("source_device"),
-            was_user_entered = was_user_entered,
-        ))
-
-    return HealthParseResult(
-        source_user_id = data.get("user_id"),
-        sync_timestamp = data.get("sync_timestamp"),
-        client_version = data.get("client_version"),
-        metrics        = metrics,
-    )
+    return parser.result(metrics)
 
 
 def summarise(result: HealthParseResult) -> dict:
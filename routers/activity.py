@@ -18,24 +18,45 @@ DELETE /api/activity/study-logs/{id}     – delete import + cascade
 GET    /api/activity/attention           – list attention entries
 POST   /api/activity/attention           – add attention entry
 DELETE /api/activity/attention/{id}      – delete entry
+
+JSON imports are idempotent per user: an Idempotency-Key header (or, without
+one, the SHA-256 of the body) is stored with the import under a unique
+index, and a repeat submission returns the original import — marked
+"duplicate": true — without parsing or inserting anything.
 """
 
 from __future__ import annotations
 
+import hashlib
+import logging
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 
+from database.connection import get_conn
 from database.execute import execute, execute_returning, fetch_all, fetch_one
 from parsers.app_usage_parser import parse_app_usage_json, summarise_app_usage
 from parsers.study_parser import parse_study_json
 from security import get_current_user
 
+log = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/activity", tags=["activity"])
 
 MAX_BODY_BYTES = 5 * 1024 * 1024  # 5 MB
 
+# Columns / indexes added after the original activity schema (see init_DB/db.sql).
+# Manual entries have no payload_hash and are never deduplicated.
+ENSURE_SQL = """
+ALTER TABLE app_usage_imports ADD COLUMN IF NOT EXISTS payload_hash CHAR(64);
+ALTER TABLE study_imports     ADD COLUMN IF NOT EXISTS payload_hash CHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_app_usage_imports_payload
+    ON app_usage_imports (session_id, payload_hash) WHERE payload_hash IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_study_imports_payload
+    ON study_imports (session_id, payload_hash) WHERE payload_hash IS NOT NULL;
+"""
+
 VALID_CATEGORIES = {"Productive", "Neutral", "Distracting"}
 
 class ManualStudyEntry(BaseModel):
@@ -57,7 +78,80 @@ class ManualAttentionEntry(BaseModel):
     date: str           # YYYY-MM-DD
     source: str = 'manual'    # 'manual' | 'timer'
 
+# Helpers
+
+async def ensure_activity_schema() -> None:
+    try:
+        await execute(ENSURE_SQL)
+    except Exception as exc:
+        log.warning("Could not ensure activity import idempotency keys (%s)", exc)
+
+
+def _payload_hash(request: Request, content: bytes) -> str:
+    """Idempotency-Key header if the client sent one, else the body's SHA-256."""
+    key = request.headers.get("idempotency-key")
+    if key:
+        return hashlib.sha256(f"idempotency-key:{key}".encode()).hexdigest()
+    return hashlib.sha256(content).hexdigest()
+
+
+async def _insert_import(insert_sql: str, params: tuple, entries_sql: str, entries: list[tuple]) -> dict | None:
+    """
+    Insert an import row and its entries in one transaction.  Returns None
+    when an import with the same payload hash already exists — including one
+    committed by a concurrent request while this one waited on the index.
+    """
+    async with await get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(insert_sql, params)
+            row = await cur.fetchone()
+            if row is None:
+                return None
+            await cur.executemany(entries_sql, [(row["import_id"], *e) for e in entries])
+        await conn.commit()
+    return row
+
+
 # App Usage
+
+APP_USAGE_IMPORT_SQL = """
+INSERT INTO app_usage_imports
+    (session_id, sync_timestamp, client_version, log_count, payload_hash)
+VALUES (%s, %s, %s, %s, %s)
+ON CONFLICT (session_id, payload_hash) WHERE payload_hash IS NOT NULL DO NOTHING
+RETURNING import_id, imported_at, log_count
+"""
+
+
+async def _app_usage_replay(session_id: str, payload_hash: str) -> dict | None:
+    row = await fetch_one(
+        """
+        SELECT import_id, imported_at, log_count
+        FROM   app_usage_imports
+        WHERE  session_id = %s AND payload_hash = %s
+        """,
+        (session_id, payload_hash),
+    )
+    if not row:
+        return None
+    totals = await fetch_all(
+        """
+        SELECT category, SUM(duration_mins) AS mins
+        FROM   app_usage_entries
+        WHERE  import_id = %s
+        GROUP  BY category
+        """,
+        (row["import_id"],),
+    )
+    return {
+        "import_id":   str(row["import_id"]),
+        "log_count":   row["log_count"],
+        "summary":     {t["category"]: int(t["mins"]) for t in totals},
+        "imported_at": str(row["imported_at"]),
+        "duplicate":   True,
+    }
+
+
 @router.post("/app-usage")
 async def import_app_usage(
     request:    Request,
@@ -67,38 +161,35 @@ async def import_app_usage(
     if len(content) > MAX_BODY_BYTES:
         raise HTTPException(413, "Payload exceeds 5 MB limit")
 
+    payload_hash = _payload_hash(request, content)
+    if (replay := await _app_usage_replay(session_id, payload_hash)) is not None:
+        return replay
+
     result = parse_app_usage_json(content)
     if result.error:
         raise HTTPException(422, f"Parse error: {result.error}")
     if not result.logs:
         raise HTTPException(422, "No valid log entries found in payload")
 
-    row = await execute_returning(
+    row = await _insert_import(
+        APP_USAGE_IMPORT_SQL,
+        (session_id, result.sync_timestamp, result.client_version, len(result.logs), payload_hash),
         """
-        INSERT INTO app_usage_imports
-            (session_id, sync_timestamp, client_version, log_count)
-        VALUES (%s, %s, %s, %s)
-        RETURNING import_id, imported_at, log_count
+        INSERT INTO app_usage_entries
+            (import_id, app_name, category, duration_mins, logged_date)
+        VALUES (%s, %s, %s, %s, %s)
         """,
-        (session_id, result.sync_timestamp, result.client_version, len(result.logs)),
+        [(e.app_name, e.category, e.duration_mins, e.logged_date) for e in result.logs],
     )
-    import_id = row["import_id"]
-
-    for e in result.logs:
-        await execute(
-            """
-            INSERT INTO app_usage_entries
-                (import_id, app_name, category, duration_mins, logged_date)
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (import_id, e.app_name, e.category, e.duration_mins, e.logged_date),
-        )
+    if row is None:
+        return await _app_usage_replay(session_id, payload_hash)
 
     return {
-        "import_id":   str(import_id),
+        "import_id":   str(row["import_id"]),
         "log_count":   len(result.logs),
         "summary":     summarise_app_usage(result),
         "imported_at": str(row["imported_at"]),
+        "duplicate":   False,
     }
 
 @router.get("/app-usage")
@@ -248,6 +339,38 @@ async def delete_app_usage_import(import_id: str, session_id: str = Depends(get_
     return {"deleted": import_id}
 
 # Study Logs
+
+STUDY_IMPORT_SQL = """
+INSERT INTO study_imports
+    (session_id, sync_timestamp, client_version, session_count, payload_hash)
+VALUES (%s, %s, %s, %s, %s)
+ON CONFLICT (session_id, payload_hash) WHERE payload_hash IS NOT NULL DO NOTHING
+RETURNING import_id, imported_at, session_count
+"""
+
+
+async def _study_replay(session_id: str, payload_hash: str) -> dict | None:
+    row = await fetch_one(
+        """
+        SELECT si.import_id, si.imported_at, si.session_count,
+               (SELECT COALESCE(SUM(se.duration_mins), 0)
+                FROM   study_entries se WHERE se.import_id = si.import_id) AS total_mins
+        FROM   study_imports si
+        WHERE  si.session_id = %s AND si.payload_hash = %s
+        """,
+        (session_id, payload_hash),
+    )
+    if not row:
+        return None
+    return {
+        "import_id":     str(row["import_id"]),
+        "session_count": row["session_count"],
+        "total_hours":   round(int(row["total_mins"]) / 60, 1),
+        "imported_at":   str(row["imported_at"]),
+        "duplicate":     True,
+    }
+
+
 @router.post("/study-logs")
 async def import_study_logs(
     request:    Request,
@@ -257,6 +380,10 @@ async def import_study_logs(
     if len(content) > MAX_BODY_BYTES:
         raise HTTPException(413, "Payload exceeds 5 MB limit")
 
+    payload_hash = _payload_hash(request, content)
+    if (replay := await _study_replay(session_id, payload_hash)) is not None:
+        return replay
+
     result = parse_study_json(content)
     if result.error:
         raise HTTPException(422, f"Parse error: {result.error}")
@@ -265,33 +392,28 @@ async def import_study_logs(
 
     total_mins = sum(s.duration_mins for s in result.sessions)
 
-    row = await execute_returning(
+    row = await _insert_import(
+        STUDY_IMPORT_SQL,
+        (session_id, result.sync_timestamp, result.client_version, len(result.sessions), payload_hash),
         """
-        INSERT INTO study_imports
-            (session_id, sync_timestamp, client_version, session_count)
-        VALUES (%s, %s, %s, %s)
-        RETURNING import_id, imported_at, session_count
+        INSERT INTO study_entries
+            (import_id, started_at, ended_at, duration_mins, subject_tag, breaks_taken, notes)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
         """,
-        (session_id, result.sync_timestamp, result.client_version, len(result.sessions)),
+        [
+            (s.started_at, s.ended_at, s.duration_mins, s.subject_tag, s.breaks_taken, s.notes)
+            for s in result.sessions
+        ],
     )
-    import_id = row["import_id"]
-
-    for s in result.sessions:
-        await execute(
-            """
-            INSERT INTO study_entries
-                (import_id, started_at, ended_at, duration_mins, subject_tag, breaks_taken, notes)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """,
-            (import_id, s.started_at, s.ended_at, s.duration_mins,
-             s.subject_tag, s.breaks_taken, s.notes),
-        )
+    if row is None:
+        return await _study_replay(session_id, payload_hash)
 
     return {
-        "import_id":     str(import_id),
+        "import_id":     str(row["import_id"]),
         "session_count": len(result.sessions),
         "total_hours":   round(total_mins / 60, 1),
         "imported_at":   str(row["imported_at"]),
+        "duplicate":     False,
     }
 
 @router.get("/study-logs")
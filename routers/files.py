@@ -1,22 +1,38 @@
 """
 File import router — upload, list, retrieve, delete academic files.
 
-POST   /api/files/upload      – upload one file, parse it, store to DB
+POST   /api/files/upload      – upload one file, store it and queue it for parsing
 GET    /api/files             – list files for authenticated user
+GET    /api/files/{file_id}/status – parse status (?wait=N long-polls up to N s)
 GET    /api/files/{file_id}   – full file record with parsed data
-DELETE /api/files/{file_id}   – delete file from disk + DB
+DELETE /api/files/{file_id}   – delete file record (+ its blob once unreferenced)
+
+Uploads are streamed to disk as they arrive, size-checked and SHA-256
+hashed on the way.  Files are stored by content hash (database/blob_store),
+so identical uploads share one copy on disk.
+
+The upload returns straight away with parse_status 'pending'.  The file is
+parsed in the background by database/parse_queue, or taken from its parse
+cache for known content, which fills parsed_grades / parsed_text_snippets
+and sets 'done' or 'failed'.
 """
 
 from __future__ import annotations
 
+import hashlib
+import time
 import uuid
 from pathlib import Path
 
 import aiofiles
-from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile, File
-
-from database.execute import execute, execute_returning, fetch_all, fetch_one
-from parsers.file_parser import parse_file
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from database.blob_store import add_blob, drop_blob_file, release_blob
+from database.connection import get_conn
+from database.execute import fetch_all, fetch_one
+from database.parse_queue import PARSE_POLL_SECONDS, TERMINAL_STATUSES, parse_queue
 from security import get_current_user
 
 router = APIRouter(prefix="/api/files", tags=["files"])
@@ -26,87 +42,232 @@ UPLOADS_DIR.mkdir(exist_ok=True)
 
 ALLOWED_TYPES = {"pdf", "doc", "docx", "xlsx", "xls", "csv", "txt", "png", "jpg", "jpeg"}
 MAX_FILE_BYTES = 20 * 1024 * 1024  # 20 MB
+UPLOAD_FORM_MAX_BYTES = 64 * 1024  # category / notes / multipart framing on top of the file
+STATUS_WAIT_MAX = 30                # seconds a status request may long-poll
+
+# The body is parsed by hand (see _receive_upload), so describe it for /docs
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {
+                "file":     {"type": "string", "format": "binary"},
+                "category": {"type": "string", "default": "Other"},
+                "notes":    {"type": "string", "default": ""},
+            },
+        }}},
+    },
+}
 
 
 # Upload
 
-@router.post("/upload")
+class _UploadForm:
+    """
+    Callbacks for python_multipart's streaming parser.  Data of the `file`
+    part is queued in `chunks` for the caller to write out after each
+    network chunk; the small text fields are kept in `fields`.
+    """
+
+    def __init__(self) -> None:
+        self.fields:   dict[str, str] = {}
+        self.filename: str | None     = None
+        self.ext       = ""
+        self.chunks:   list[bytes]    = []
+        self.size      = 0
+        self.form_size = 0
+        self._header_name  = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._name     = ""
+        self._in_file  = False
+        self._data     = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin":       self.on_part_begin,
+            "on_header_field":     self.on_header_field,
+            "on_header_value":     self.on_header_value,
+            "on_header_end":       self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data":        self.on_part_data,
+            "on_part_end":         self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._disposition = b""
+        self._in_file     = False
+        self._data        = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name  = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        if self._name != "file":
+            return
+        if self.filename is not None:
+            raise HTTPException(400, "Only one file per upload")
+        self.filename = options.get(b"filename", b"").decode("utf-8", "replace")
+        self.ext      = self.filename.rsplit(".", 1)[-1].lower()
+        if self.ext not in ALLOWED_TYPES:
+            raise HTTPException(415, f"File type '{self.ext}' not supported")
+        self._in_file = True
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self.size += end - start
+            if self.size > MAX_FILE_BYTES:
+                raise HTTPException(413, "File exceeds 20 MB limit")
+            self.chunks.append(data[start:end])
+        else:
+            self.form_size += end - start
+            if self.form_size > UPLOAD_FORM_MAX_BYTES:
+                raise HTTPException(413, "Form fields too large")
+            self._data += data[start:end]
+
+    def on_part_end(self) -> None:
+        if not self._in_file and self._name:
+            self.fields[self._name] = self._data.decode("utf-8", "replace")
+
+
+async def _receive_upload(request: Request, part: Path) -> tuple[_UploadForm, str]:
+    """
+    Parse the multipart body as it arrives from the client, streaming the
+    `file` part to the `part` file and hashing it on the way; returns the
+    form and the SHA-256 hex of the file.  MAX_FILE_BYTES is enforced per
+    network chunk, so an oversized upload is cut off as soon as it crosses
+    the limit rather than after the whole body has been spooled.
+    add_blob() later renames the complete file into the blob store, so the
+    parse queue never sees a partial file.
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    if b"boundary" not in params:
+        raise HTTPException(400, "Expected a multipart/form-data body")
+
+    form   = _UploadForm()
+    parser = MultipartParser(params[b"boundary"], form.callbacks())
+    digest = hashlib.sha256()
+    try:
+        async with aiofiles.open(part, "wb") as fh:
+            async for chunk in request.stream():
+                try:
+                    parser.write(chunk)
+                except MultipartParseError as exc:
+                    raise HTTPException(400, f"Malformed upload: {exc}")
+                for data in form.chunks:
+                    digest.update(data)
+                    await fh.write(data)
+                form.chunks.clear()
+        parser.finalize()
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    if form.filename is None:
+        part.unlink(missing_ok=True)
+        raise HTTPException(422, "No file in upload")
+    return form, digest.hexdigest()
+
+
+@router.post("/upload", openapi_extra=UPLOAD_OPENAPI)
 async def upload_file(
-    file:       UploadFile = File(...),
-    category:   str        = Form("Other"),
-    notes:      str        = Form(""),
-    session_id: str        = Depends(get_current_user),
+    request:    Request,
+    session_id: str = Depends(get_current_user),
 ):
-    content = await file.read()
-
-    if len(content) > MAX_FILE_BYTES:
+    """Multipart form: `file`, plus optional `category` and `notes`."""
+    # Refuse a declared oversized body before reading any of it
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_FILE_BYTES + UPLOAD_FORM_MAX_BYTES:
         raise HTTPException(413, "File exceeds 20 MB limit")
 
-    ext = (file.filename or "").rsplit(".", 1)[-1].lower()
-    if ext not in ALLOWED_TYPES:
-        raise HTTPException(415, f"File type '{ext}' not supported")
+    file_id = str(uuid.uuid4())
+    part    = UPLOADS_DIR / f".{file_id}.part"
 
-    file_id      = str(uuid.uuid4())
-    stored_name  = f"{file_id}.{ext}"
-    storage_path = str(UPLOADS_DIR / stored_name)
+    # Persist to disk as it arrives — never held in memory as a whole
+    form, content_hash = await _receive_upload(request, part)
+    category = form.fields.get("category", "Other")
+    notes    = form.fields.get("notes", "")
 
-    # Persist to disk
-    async with aiofiles.open(storage_path, "wb") as fh:
-        await fh.write(content)
+    # Blob reference + file record in one transaction — parsed later by the queue
+    created = False
+    try:
+        async with await get_conn() as conn:
+            async with conn.cursor() as cur:
+                path, created = await add_blob(cur, content_hash, part, form.size)
+                await cur.execute(
+                    """
+                    INSERT INTO uploaded_files
+                        (file_id, session_id, original_name, stored_name, file_type,
+                         file_size, content_hash, category, notes, storage_path, parse_status)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'pending')
+                    RETURNING file_id, original_name, file_type, file_size,
+                              category, parse_status, uploaded_at
+                    """,
+                    (
+                        file_id, session_id, form.filename, path.name, form.ext,
+                        form.size, content_hash, category, notes, str(path),
+                    ),
+                )
+                row = await cur.fetchone()
+            await conn.commit()
+    except BaseException:
+        # The blob this upload renamed in has no committed row to own it
+        if created:
+            await drop_blob_file(content_hash, path)
+        raise
+    finally:
+        part.unlink(missing_ok=True)
+    parse_queue.notify()
 
-    # Parse
-    parse_result = parse_file(ext, content)
-    parse_status = "failed" if parse_result.error else "done"
+    return {
+        "file":       row,
+        "status_url": f"/api/files/{file_id}/status",
+    }
 
-    # Insert file record
-    row = await execute_returning(
-        """
-        INSERT INTO uploaded_files
-            (file_id, session_id, original_name, stored_name, file_type,
-             file_size, category, notes, storage_path, parse_status, raw_text)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING file_id, original_name, file_type, file_size,
-                  category, parse_status, uploaded_at
-        """,
-        (
-            file_id, session_id, file.filename, stored_name, ext,
-            len(content), category, notes, storage_path,
-            parse_status, parse_result.raw_text[:50_000],
-        ),
-    )
 
-    # Insert parsed grades
-    for g in parse_result.grades:
-        await execute(
-            """
-            INSERT INTO parsed_grades
-                (file_id, course_name, course_code, grade_letter,
-                 score, max_score, percentage, semester, source_row)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (
-                file_id, g.course_name, g.course_code, g.grade_letter,
-                g.score, g.max_score, g.percentage, g.semester, g.source_row,
-            ),
-        )
+# Parse status
 
-    # Insert text snippets
-    for s in parse_result.snippets:
-        await execute(
+@router.get("/{file_id}/status")
+async def file_status(
+    file_id:    str,
+    wait:       float = Query(0, ge=0, le=STATUS_WAIT_MAX),
+    session_id: str   = Depends(get_current_user),
+):
+    """
+    Current parse status.  With ?wait=N the request is held until parsing
+    finishes or N seconds pass, whichever comes first.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        row = await fetch_one(
             """
-            INSERT INTO parsed_text_snippets
-                (file_id, snippet_type, content, page_number)
-            VALUES (%s, %s, %s, %s)
+            SELECT f.file_id, f.parse_status, f.parse_error, f.parse_attempts, f.parsed_at,
+                   (SELECT COUNT(*) FROM parsed_grades        g WHERE g.file_id = f.file_id) AS grades_count,
+                   (SELECT COUNT(*) FROM parsed_text_snippets s WHERE s.file_id = f.file_id) AS snippets_count
+            FROM   uploaded_files f
+            WHERE  f.file_id = %s AND f.session_id = %s
             """,
-            (file_id, s.snippet_type, s.content[:2000], s.page_number),
+            (file_id, session_id),
         )
-
-    return {
-        "file": row,
-        "grades_count":   len(parse_result.grades),
-        "snippets_count": len(parse_result.snippets),
-        "parse_error":    parse_result.error,
-    }
+        if not row:
+            raise HTTPException(404, "File not found")
+        remaining = deadline - time.monotonic()
+        if row["parse_status"] in TERMINAL_STATUSES or remaining <= 0:
+            return row
+        # Woken early when this instance finishes a job; re-checked at least every poll
+        await parse_queue.wait_for_change(min(remaining, PARSE_POLL_SECONDS))
 
 
 # List
@@ -160,14 +321,27 @@ async def delete_file(file_id: str, session_id: str = Depends(get_current_user))
     if not row:
         raise HTTPException(404, "File not found")
 
-    try:
-        Path(row["storage_path"]).unlink(missing_ok=True)
-    except Exception:
-        pass
-
-    await execute(
-        "DELETE FROM uploaded_files WHERE file_id = %s",
-        (file_id,),
-    )
+    async with await get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "DELETE FROM uploaded_files WHERE file_id = %s RETURNING content_hash, storage_path",
+                (file_id,),
+            )
+            deleted = await cur.fetchone()
+            # Blob-store file: drop our reference.  Older uploads own their file outright.
+            last_ref = (
+                deleted is not None and deleted["content_hash"] is not None
+                and await release_blob(cur, deleted["content_hash"], deleted["storage_path"])
+            )
+        await conn.commit()
+
+    # Files go only once the rows are gone for good
+    if deleted is not None and deleted["content_hash"] is None:
+        try:
+            Path(deleted["storage_path"]).unlink(missing_ok=True)
+        except Exception:
+            pass
+    elif last_ref:
+        await drop_blob_file(deleted["content_hash"], deleted["storage_path"])
 
     return {"deleted": file_id}
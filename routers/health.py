@@ -1,89 +1,301 @@
 """
 Apple Health import router.
 
-POST   /api/health/import          – import a Health JSON payload
+POST   /api/health/import          – import a Health JSON payload (streamed, up to
+                                     HEALTH_MAX_BODY_MB)
+POST   /api/health/import/apple-export – import the Health app's own export.zip /
+                                     export.xml (up to HEALTH_EXPORT_MAX_MB)
+GET    /api/health/sync-state      – last synced metric time (delta-sync high-water mark)
 GET    /api/health/imports         – list all imports for authenticated user
 GET    /api/health/imports/{id}    – import detail + metrics
 DELETE /api/health/imports/{id}    – delete import and its metrics
 GET    /api/health/metrics/summary – aggregated counts by type
+
+Imports are idempotent: a sample is stored once per (user, type, start_time,
+end_time, source_device), so clients can resend overlapping windows — or
+the whole history — and only new samples are written.  metric_count is the
+number of new samples an import stored; the rest are reported as duplicates.
 """
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import AsyncIterator
+
+import psycopg
 from fastapi import APIRouter, Depends, HTTPException, Request
 
-from database.execute import execute, execute_returning, fetch_all, fetch_one
-from parsers.health_parser import parse_health_json, summarise
+from database.connection import get_conn
+from database.execute import execute, fetch_all, fetch_one
+from parsers.apple_export_parser import AppleExportError, AppleExportParser, open_export
+from parsers.health_parser import HealthMetric, HealthParseError, HealthStreamParser
 from security import get_current_user
 
+log = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/health", tags=["health"])
 
-MAX_BODY_BYTES = 10 * 1024 * 1024  # 10 MB
+HEALTH_MAX_BODY_MB = int(os.getenv("HEALTH_MAX_BODY_MB") or 512)
+MAX_BODY_BYTES     = HEALTH_MAX_BODY_MB * 1024 * 1024
+
+HEALTH_EXPORT_MAX_MB = int(os.getenv("HEALTH_EXPORT_MAX_MB") or 4096)
+MAX_EXPORT_BYTES     = HEALTH_EXPORT_MAX_MB * 1024 * 1024
+
+# Columns / indexes added after the original health schema (see init_DB/db.sql).
+# A metric is the same sample — and stored once — per (user, type, start,
+# end, source); rows imported before the key existed are backfilled and
+# deduplicated the first time it is created.
+ENSURE_SQL = """
+ALTER TABLE health_metrics ADD COLUMN IF NOT EXISTS session_id VARCHAR(64);
+
+CREATE TABLE IF NOT EXISTS health_sync_state (
+    session_id          VARCHAR(64) PRIMARY KEY,
+    last_metric_time    TIMESTAMP,
+    last_sync_timestamp TIMESTAMP,
+    updated_at          TIMESTAMP   DEFAULT CURRENT_TIMESTAMP
+);
+
+DO $$
+BEGIN
+    IF to_regclass('uq_health_metrics_sample') IS NULL THEN
+        UPDATE health_metrics hm
+        SET    session_id = hi.session_id
+        FROM   health_imports hi
+        WHERE  hi.import_id = hm.import_id AND hm.session_id IS NULL;
+
+        DELETE FROM health_metrics hm
+        USING  health_metrics keep
+        WHERE  keep.session_id IS NOT DISTINCT FROM hm.session_id
+          AND  keep.type = hm.type
+          AND  keep.start_time = hm.start_time
+          AND  keep.end_time IS NOT DISTINCT FROM hm.end_time
+          AND  keep.source_device IS NOT DISTINCT FROM hm.source_device
+          AND  keep.metric_id < hm.metric_id;
+
+        CREATE UNIQUE INDEX uq_health_metrics_sample
+            ON health_metrics (session_id, type, start_time, end_time, source_device) NULLS NOT DISTINCT;
+
+        INSERT INTO health_sync_state (session_id, last_metric_time)
+        SELECT session_id, MAX(start_time) FROM health_metrics
+        WHERE  session_id IS NOT NULL
+        GROUP  BY session_id
+        ON CONFLICT (session_id) DO NOTHING;
+    END IF;
+END $$;
+"""
+
+# Metrics are COPYed into a per-transaction staging table, then moved over
+# in one statement that skips samples the user already has
+STAGING_SQL = """
+CREATE TEMP TABLE health_staging (
+    type             VARCHAR(100),
+    data_class       VARCHAR(50),
+    value_num        FLOAT,
+    value_cat        VARCHAR(100),
+    unit             VARCHAR(50),
+    start_time       TIMESTAMP,
+    end_time         TIMESTAMP,
+    source_device    VARCHAR(100),
+    was_user_entered BOOLEAN
+) ON COMMIT DROP
+"""
+
+COPY_STAGING_SQL = (
+    "COPY health_staging (type, data_class, value_num, value_cat, unit, "
+    "start_time, end_time, source_device, was_user_entered) FROM STDIN"
+)
+
+MERGE_STAGING_SQL = """
+INSERT INTO health_metrics (import_id, session_id, type, data_class, value_num, value_cat, unit,
+                            start_time, end_time, source_device, was_user_entered)
+SELECT %(import_id)s, %(session_id)s, type, data_class, value_num, value_cat, unit,
+       start_time, end_time, source_device, was_user_entered
+FROM   health_staging
+ON CONFLICT (session_id, type, start_time, end_time, source_device) DO NOTHING
+"""
+
+# High-water mark: clients resume from last_metric_time and send only newer samples
+SYNC_STATE_SQL = """
+INSERT INTO health_sync_state (session_id, last_metric_time, last_sync_timestamp)
+SELECT %(session_id)s, MAX(start_time), %(sync_timestamp)s::timestamp FROM health_staging
+ON CONFLICT (session_id) DO UPDATE
+SET    last_metric_time    = GREATEST(health_sync_state.last_metric_time,    EXCLUDED.last_metric_time),
+       last_sync_timestamp = GREATEST(health_sync_state.last_sync_timestamp, EXCLUDED.last_sync_timestamp),
+       updated_at          = CURRENT_TIMESTAMP
+"""
+
+
+async def ensure_health_schema() -> None:
+    try:
+        await execute(ENSURE_SQL)
+    except Exception as exc:
+        log.warning("Could not ensure health_metrics dedup key (%s)", exc)
 
 # Import
 
+def _metric_row(m: HealthMetric) -> tuple:
+    return (
+        m.type, m.data_class,
+        m.value_num, m.value_cat,
+        m.unit,
+        m.start_time, m.end_time,
+        m.source_device,
+        m.was_user_entered,
+    )
+
+
+async def _store_import(session_id: str, batches: AsyncIterator[list[HealthMetric]], parser) -> dict:
+    """
+    Store every batch of metrics under one new health_imports row, in one
+    transaction.  `parser` supplies the header fields and counters once the
+    batches are exhausted.  Samples the user already has are skipped, so
+    re-sending an overlapping window only stores what is new.  Any parse
+    error rolls the whole import back.
+    """
+    async with await get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "INSERT INTO health_imports (session_id) VALUES (%s) RETURNING import_id, imported_at",
+                (session_id,),
+            )
+            row       = await cur.fetchone()
+            import_id = row["import_id"]
+
+            await cur.execute(STAGING_SQL)
+            try:
+                async with cur.copy(COPY_STAGING_SQL) as copy:
+                    async for batch in batches:
+                        for m in batch:
+                            await copy.write_row(_metric_row(m))
+            except (HealthParseError, AppleExportError) as e:
+                raise HTTPException(422, f"Parse error: {e}") from e
+            except psycopg.DataError as e:
+                raise HTTPException(422, f"Invalid metric value: {e}") from e
+
+            if not parser.metric_count:
+                raise HTTPException(422, "No valid metrics found in payload")
+
+            params = {
+                "import_id":      import_id,
+                "session_id":     session_id,
+                "sync_timestamp": parser.sync_timestamp,
+            }
+            try:
+                await cur.execute(MERGE_STAGING_SQL, params)
+                stored = cur.rowcount
+                await cur.execute(SYNC_STATE_SQL, params)
+            except psycopg.DataError as e:
+                raise HTTPException(422, f"Invalid metric value: {e}") from e
+
+            # Top-level fields may follow the metrics array, so they are set last
+            await cur.execute(
+                """
+                UPDATE health_imports
+                SET    source_user_id = %s, sync_timestamp = %s, client_version = %s, metric_count = %s
+                WHERE  import_id = %s
+                """,
+                (
+                    parser.source_user_id,
+                    parser.sync_timestamp,
+                    parser.client_version,
+                    stored,
+                    import_id,
+                ),
+            )
+        await conn.commit()
+
+    return {
+        "import_id":      str(import_id),
+        "metric_count":   stored,
+        "duplicates":     parser.metric_count - stored,
+        "sync_timestamp": parser.sync_timestamp,
+        "summary":        parser.counts,
+        "imported_at":    str(row["imported_at"]),
+    }
+
+
+async def _json_batches(request: Request, parser: HealthStreamParser) -> AsyncIterator[list[HealthMetric]]:
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_BODY_BYTES:
+            raise HTTPException(413, f"Payload exceeds {HEALTH_MAX_BODY_MB} MB limit")
+        yield parser.feed(chunk)
+    yield parser.close()
+
+
+async def _export_batches(parser: AppleExportParser) -> AsyncIterator[list[HealthMetric]]:
+    # iterparse is CPU-bound: each batch is parsed off the event loop
+    batches = parser.batches()
+    while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+        yield batch
+
+
 @router.post("/import")
 async def import_health(
     request:    Request,
     session_id: str = Depends(get_current_user),
 ):
-    content = await request.body()
+    """
+    The body is parsed as it streams in and each completed metric is COPYed
+    straight into health_metrics — memory stays flat however large the export.
+    """
+    if int(request.headers.get("content-length") or 0) > MAX_BODY_BYTES:
+        raise HTTPException(413, f"Payload exceeds {HEALTH_MAX_BODY_MB} MB limit")
 
-    if len(content) > MAX_BODY_BYTES:
-        raise HTTPException(413, "Payload exceeds 10 MB limit")
+    parser = HealthStreamParser()
+    return await _store_import(session_id, _json_batches(request, parser), parser)
 
-    result = parse_health_json(content)
 
-    if result.error:
-        raise HTTPException(422, f"Parse error: {result.error}")
+@router.post("/import/apple-export")
+async def import_apple_export(
+    request:    Request,
+    session_id: str = Depends(get_current_user),
+):
+    """
+    Body: the export.zip written by the Health app (or its export.xml).
+    The upload is spooled to a temp file — a zip's directory sits at its end
+    — then export.xml is decompressed and iterparsed as a stream, batches of
+    metrics going through the same COPY pipeline as the JSON import.
+    """
+    if int(request.headers.get("content-length") or 0) > MAX_EXPORT_BYTES:
+        raise HTTPException(413, f"Payload exceeds {HEALTH_EXPORT_MAX_MB} MB limit")
 
-    if not result.metrics:
-        raise HTTPException(422, "No valid metrics found in payload")
+    with tempfile.NamedTemporaryFile(prefix="health-export-") as spool:
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > MAX_EXPORT_BYTES:
+                raise HTTPException(413, f"Payload exceeds {HEALTH_EXPORT_MAX_MB} MB limit")
+            spool.write(chunk)
+        spool.flush()
 
-    row = await execute_returning(
-        """
-        INSERT INTO health_imports
-            (session_id, source_user_id, sync_timestamp, client_version, metric_count)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING import_id, imported_at, metric_count
-        """,
-        (
-            session_id,
-            result.source_user_id,
-            result.sync_timestamp,
-            result.client_version,
-            len(result.metrics),
-        ),
-    )
+        try:
+            source = open_export(Path(spool.name))
+        except (AppleExportError, zipfile.BadZipFile) as e:
+            raise HTTPException(422, f"Parse error: {e}") from e
+        with source:
+            parser = AppleExportParser(source)
+            return await _store_import(session_id, _export_batches(parser), parser)
 
-    import_id = row["import_id"]
-
-    for m in result.metrics:
-        await execute(
-            """
-            INSERT INTO health_metrics
-                (import_id, type, data_class, value_num, value_cat, unit,
-                 start_time, end_time, source_device, was_user_entered)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (
-                import_id,
-                m.type, m.data_class,
-                m.value_num, m.value_cat,
-                m.unit,
-                m.start_time, m.end_time,
-                m.source_device,
-                m.was_user_entered,
-            ),
-        )
+# Sync state
 
-    return {
-        "import_id":      str(import_id),
-        "metric_count":   len(result.metrics),
-        "sync_timestamp": result.sync_timestamp,
-        "summary":        summarise(result),
-        "imported_at":    str(row["imported_at"]),
-    }
+@router.get("/sync-state")
+async def sync_state(session_id: str = Depends(get_current_user)):
+    """
+    High-water mark for delta sync: send only samples starting after
+    last_metric_time.  Overlap is harmless — duplicates are skipped.
+    """
+    row = await fetch_one(
+        "SELECT last_metric_time, last_sync_timestamp, updated_at FROM health_sync_state WHERE session_id = %s",
+        (session_id,),
+    )
+    return row or {"last_metric_time": None, "last_sync_timestamp": None, "updated_at": None}
 
 # List imports
 
@@ -143,6 +355,16 @@ async def delete_import(import_id: str, session_id: str = Depends(get_current_us
     await execute(
         "DELETE FROM health_imports WHERE import_id = %s", (import_id,)
     )
+    # Let the client resend whatever that import held
+    await execute(
+        """
+        UPDATE health_sync_state
+        SET    last_metric_time = (SELECT MAX(start_time) FROM health_metrics WHERE session_id = %s),
+               updated_at       = CURRENT_TIMESTAMP
+        WHERE  session_id = %s
+        """,
+        (session_id, session_id),
+    )
     return {"deleted": import_id}
 
 # Aggregated summary
@@ -1,14 +1,19 @@
 """
 Peer cohort router.
 
-GET /api/peers   – return anonymised rows from cohort_students
-                   for the Peers tab 3-D visualisation.
+GET /api/peers              – return anonymised rows from cohort_students
+                              for the Peers tab 3-D visualisation.
+GET /api/peers/percentiles  – where a set of metrics (and a score) ranks
+                              within the cohort the ML engine serves — the
+                              user's segment cohort when one is in use.
 """
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from database.execute import fetch_all
+from ml_engine import engine
+from ml_segments import segment_models
 from security import get_current_user
 
 router = APIRouter(prefix="/api/peers", tags=["peers"])
@@ -40,3 +45,37 @@ async def list_peers(
         (limit,),
     )
     return {"peers": rows}
+
+
+@router.get("/percentiles")
+async def peer_percentiles(
+    studyHours:    float = Query(..., ge=0, le=16),
+    attentionSpan: float = Query(..., ge=5, le=120),
+    focusRatio:    float = Query(..., ge=0, le=100),
+    sleepHours:    float = Query(..., ge=3, le=12),
+    breakFreq:     float = Query(..., ge=0, le=10),
+    score:         float | None = Query(default=None, ge=0, le=100),
+    user_id: str = Depends(get_current_user),
+):
+    """
+    Percentile of each metric, and of *score*, within the in-memory cohort.
+    Without a score the Random Forest prediction for the metrics is ranked.
+    """
+    if engine.rf is None:
+        raise HTTPException(503, detail="ML models not ready — please retry in a moment.")
+    model, segment = await segment_models.resolve_user(user_id)
+
+    values = {
+        "studyHours":    studyHours,
+        "attentionSpan": attentionSpan,
+        "focusRatio":    focusRatio,
+        "sleepHours":    sleepHours,
+        "breakFreq":     breakFreq,
+    }
+    if score is None:
+        score = float(model._forest_predict(model._X(values))[0][0])
+    return {
+        "score":   round(score, 1),
+        "segment": f"{segment_models.column}={segment}" if segment else None,
+        **model.cohort_percentiles(values, score),
+    }
@@ -1,25 +1,61 @@
 """
-POST /api/predictions/analyze
+POST /api/predictions/analyze?format=text|json
+GET  /api/predictions/global-importance
+GET  /api/predictions/metrics   – prediction log queue / flush counters and
+                                  feature drift vs the training data (PSI/KS)
+POST /api/predictions/retrain   – start a background retraining job
+GET  /api/predictions/retrain   – retraining status + served model version
+                                  and peer index (exact/approx, recall@5)
+
+metrics and retrain are operator endpoints (ADMIN_USER_IDS, see security).
 
 Runs ML inference on the user's current study metrics and returns a
-predicted score plus a human-readable text explanation.
+predicted score plus a human-readable text explanation.  Forest-based
+modes (peer, deep) also return an interval spanning the individual trees'
+predictions, so callers can tell a confident score from a borderline one.
+Every mode returns the user's cohort percentile on each metric and on the
+predicted score (binary search over sorted cohort columns, no DB query).
+
+Every served prediction is queued for ml_predictions / xai_explanations and
+written in batches in the background (database/prediction_log), so the
+request never waits on those inserts.
+
+Users whose profile segment (SEGMENT_BY, e.g. major) has enough cohort rows
+are scored by that segment's own model set; model_segment names it.
+
+format=text (default) returns the advice as text_advice; format=json returns
+the structured explanation instead (path nodes, peer deltas, SHAP, tips —
+see ml_explain) and skips rendering the text altogether.
 
 analysis_mode:
   'strict' → Decision Tree path → IF/THEN rule advice
   'peer'   → KNN → comparison with 5 nearest cohort neighbours
+             (approximate index for very large cohorts, see ml_neighbours)
   'deep'   → Random Forest + SHAP → feature attribution breakdown
+
+global-importance returns the cohort-wide mean |SHAP| and per-feature
+dependence curves, computed once after the models load and then cached.
 """
 
+import asyncio
 from enum import Enum
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
 
-from ml_engine import engine
-from security import get_current_user
+from database.prediction_log import PredictionRecord, prediction_log
+from ml_drift import drift_monitor
+from ml_engine import INTERVAL_COVERAGE, engine, global_shap_summary
+from ml_explain import DeepExplanation, render_text, shap_features, to_dict
+from ml_neighbours import describe
+from ml_segments import segment_models
+from ml_training import retrain_worker
+from security import get_admin_user, get_current_user
 
 router = APIRouter(prefix="/api/predictions", tags=["predictions"])
 
+_global_importance_lock = asyncio.Lock()
+
 
 # Schema
 
@@ -29,6 +65,11 @@ class AnalysisMode(str, Enum):
     deep   = "deep"
 
 
+class AdviceFormat(str, Enum):
+    text = "text"
+    json = "json"
+
+
 class PredictionRequest(BaseModel):
     studyHours:    float = Field(..., ge=0,   le=16,  description="Daily study hours")
     attentionSpan: float = Field(..., ge=5,   le=120, description="Avg attention span (minutes)")
@@ -46,20 +87,41 @@ class ShapFeature(BaseModel):
     impact_score: float
 
 
+class ScoreInterval(BaseModel):
+    lower:    float
+    upper:    float
+    coverage: float   # nominal share of trees inside [lower, upper]
+
+
+class CohortPercentiles(BaseModel):
+    cohort_rows:     int
+    features:        dict[str, float]   # feature_key → percentile (0–100)
+    predicted_score: float              # percentile of the score among cohort grades
+
+
 class PredictionResponse(BaseModel):
     predicted_score: float
     predicted_grade: str
     analysis_mode:   str
-    text_advice:     str
+    text_advice:     str | None = None    # format=text
+    explanation:     dict       | None = None   # format=json
     shap_values:     list[ShapFeature] | None = None
+    score_interval:  ScoreInterval     | None = None
+    cohort_percentiles: CohortPercentiles | None = None
+    model_segment:   str | None = None   # e.g. "major=computer science"; None = global model
 
 
 # Endpoint 
 
 @router.post("/analyze", response_model=PredictionResponse)
-async def analyze(req: PredictionRequest, _: str = Depends(get_current_user)):
+async def analyze(
+    req:     PredictionRequest,
+    fmt:     AdviceFormat = Query(AdviceFormat.text, alias="format"),
+    user_id: str          = Depends(get_current_user),
+):
     if engine.dt is None:
         raise HTTPException(503, detail="ML models not ready — please retry in a moment.")
+    model, segment = await segment_models.resolve_user(user_id)
 
     values = {
         "studyHours":    req.studyHours,
@@ -69,22 +131,96 @@ async def analyze(req: PredictionRequest, _: str = Depends(get_current_user)):
         "breakFreq":     req.breakFreq,
     }
 
-    shap_data = None
     try:
         if req.analysis_mode == AnalysisMode.strict:
-            score, advice = engine.predict_strict(values)
+            expl = model.predict_strict(values)
         elif req.analysis_mode == AnalysisMode.peer:
-            score, advice = engine.predict_peer(values)
+            expl = model.predict_peer(values)
         else:
-            score, advice, shap_data = engine.predict_deep(values)
+            expl = model.predict_deep(values)
+        percentiles = model.cohort_percentiles(values, expl.score)
     except Exception as exc:
         raise HTTPException(500, detail=f"Inference error: {exc}") from exc
 
-    grade = engine._score_to_grade(score)
+    score     = expl.score
+    grade     = expl.grade
+    interval  = getattr(expl, "interval", None)
+    shap_data = shap_features(expl) if isinstance(expl, DeepExplanation) else None
+    drift_monitor.observe(values)
+    prediction_log.record(PredictionRecord(
+        user_id=user_id,
+        analysis_mode=req.analysis_mode.value,
+        model_version=model.model_version,
+        predicted_score=round(score, 2),
+        predicted_label=grade,
+        shap=[(f["feature_key"], f["impact_score"]) for f in shap_data or []],
+    ))
     return PredictionResponse(
         predicted_score=round(score, 1),
         predicted_grade=grade,
         analysis_mode=req.analysis_mode.value,
-        text_advice=advice,
+        text_advice=render_text(expl) if fmt == AdviceFormat.text else None,
+        explanation=to_dict(expl) if fmt == AdviceFormat.json else None,
         shap_values=shap_data,
+        score_interval=ScoreInterval(
+            lower=round(interval[0], 1),
+            upper=round(interval[1], 1),
+            coverage=INTERVAL_COVERAGE,
+        ) if interval else None,
+        cohort_percentiles=percentiles,
+        model_segment=f"{segment_models.column}={segment}" if segment else None,
     )
+
+
+async def warm_global_importance() -> dict | None:
+    """
+    Fill the global SHAP cache once per model release.  Runs in the
+    ml_training worker process: TreeSHAP holds the GIL, so a thread here
+    would stall every other request for the seconds it takes.
+    """
+    async with _global_importance_lock:
+        if engine.global_importance is None and engine.rf is not None:
+            version = engine.model_version
+            summary = await retrain_worker.submit(
+                global_shap_summary, engine.rf, engine.global_importance_sample(), version,
+            )
+            if engine.model_version == version:   # not swapped out meanwhile
+                engine.global_importance = summary
+    return engine.global_importance
+
+
+@router.get("/global-importance")
+async def global_importance(_: str = Depends(get_current_user)):
+    if engine.rf is None:
+        raise HTTPException(503, detail="ML models not ready — please retry in a moment.")
+    try:
+        return await warm_global_importance()
+    except Exception as exc:
+        raise HTTPException(500, detail=f"Inference error: {exc}") from exc
+
+
+@router.get("/metrics")
+async def prediction_metrics(_: str = Depends(get_admin_user)):
+    return {
+        "prediction_log": prediction_log.stats(),
+        "drift":          drift_monitor.report(),
+    }
+
+
+# Retraining
+
+@router.post("/retrain", status_code=202)
+async def retrain(_: str = Depends(get_admin_user)):
+    started = retrain_worker.trigger()
+    return {"started": started, "running": True, "model_version": engine.model_version}
+
+
+@router.get("/retrain")
+async def retrain_status(_: str = Depends(get_admin_user)):
+    return {
+        "running":       retrain_worker.running,
+        "model_version": engine.model_version,
+        "last_report":   retrain_worker.last_report,
+        "peer_index":    describe(engine.knn) if engine.knn is not None else None,
+        "segments":      segment_models.status(),
+    }
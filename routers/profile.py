@@ -10,9 +10,11 @@ as null; the frontend substitutes its own defaults in those cases.
 """
 from __future__ import annotations
 
+import psycopg
 from fastapi import APIRouter, Depends
 
 from database.execute import fetch_one
+from ml_batch import BASELINE_DEFAULTS
 from ml_engine import engine
 from security import get_current_user
 
@@ -239,7 +241,28 @@ async def get_overview(session_id: str = Depends(get_current_user)):
     )
     top_app_today = top_app_row["app_name"] if top_app_row else None
 
-    # Baseline metrics for grade prediction
+    # Grade precomputed by the nightly batch job; live prediction until it has run
+    try:
+        scored_row = await fetch_one(
+            "SELECT predicted_grade FROM user_predicted_grades WHERE session_id = %s",
+            (session_id,),
+        )
+    except psycopg.errors.UndefinedTable:
+        scored_row = None
+    if scored_row:
+        predicted_grade = scored_row["predicted_grade"]
+    else:
+        predicted_grade = await _live_predicted_grade(session_id, avg_attention)
+
+    return {
+        "studyHoursToday":       study_hours_today,
+        "avgAttentionSpan":      avg_attention,
+        "topAppToday":           top_app_today,
+        "currentPredictedGrade": predicted_grade,
+    }
+
+async def _live_predicted_grade(session_id: str, avg_attention: float | None) -> str | None:
+    """Baseline metrics → live Decision Tree grade (same inputs as ml_batch)."""
     focus_row = await fetch_one(
         """
         SELECT ROUND(
@@ -254,7 +277,7 @@ async def get_overview(session_id: str = Depends(get_current_user)):
     focus_ratio = (
         float(focus_row["focus_ratio"])
         if focus_row and focus_row["focus_ratio"] is not None
-        else 70.0
+        else BASELINE_DEFAULTS["focusRatio"]
     )
 
     break_row = await fetch_one(
@@ -269,7 +292,7 @@ async def get_overview(session_id: str = Depends(get_current_user)):
     break_freq = (
         float(break_row["avg_breaks"])
         if break_row and break_row["avg_breaks"] is not None
-        else 2.0
+        else BASELINE_DEFAULTS["breakFreq"]
     )
 
     study_row = await fetch_one(
@@ -288,7 +311,7 @@ async def get_overview(session_id: str = Depends(get_current_user)):
     study_hours_bl = (
         float(study_row["avg_daily_hours"])
         if study_row and study_row["avg_daily_hours"] is not None
-        else 5.0
+        else BASELINE_DEFAULTS["studyHours"]
     )
 
     sleep_row = await fetch_one(
@@ -305,7 +328,7 @@ async def get_overview(session_id: str = Depends(get_current_user)):
     sleep_hours = (
         float(sleep_row["avg_sleep"])
         if sleep_row and sleep_row["avg_sleep"] is not None
-        else 7.0
+        else BASELINE_DEFAULTS["sleepHours"]
     )
 
     # Run 'strict' Decision Tree prediction
@@ -313,20 +336,13 @@ async def get_overview(session_id: str = Depends(get_current_user)):
     if engine.dt is not None:
         values = {
             "studyHours":    study_hours_bl,
-            "attentionSpan": avg_attention if avg_attention is not None else 40.0,
+            "attentionSpan": avg_attention if avg_attention is not None else BASELINE_DEFAULTS["attentionSpan"],
             "focusRatio":    focus_ratio,
             "sleepHours":    sleep_hours,
             "breakFreq":     break_freq,
         }
         try:
-            score, _ = engine.predict_strict(values)
-            predicted_grade = engine._score_to_grade(score)
+            predicted_grade = engine.predict_strict(values).grade
         except Exception:
             predicted_grade = None
-
-    return {
-        "studyHoursToday":       study_hours_today,
-        "avgAttentionSpan":      avg_attention,
-        "topAppToday":           top_app_today,
-        "currentPredictedGrade": predicted_grade,
-    }
+    return predicted_grade
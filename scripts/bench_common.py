@@ -0,0 +1,21 @@
+"""
+Helpers shared by the benchmark scripts: where results go and which
+commit they were measured on.  Kept free of heavy imports so any
+benchmark can use it without pulling in the ML stack.
+"""
+
+import subprocess
+from pathlib import Path
+
+ROOT        = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "bench_results"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
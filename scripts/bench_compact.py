@@ -0,0 +1,167 @@
+"""
+Random Forest / cohort footprint benchmark for ML_COMPACT.
+
+Fits one forest per configuration (tree count × max_leaf_nodes) on the same
+generated cohort and reports, side by side:
+  - holdout RMSE of the forest (and of the strict-mode Decision Tree, as a
+    floor the forest should stay under)
+  - p50 / p99 latency of MLEngine._forest_predict and predict_deep on one row
+  - memory: forest node arrays, rf.joblib size, cohort arrays (float64 +
+    DataFrame vs float32 arrays only)
+
+Pick the smallest configuration whose RMSE is acceptable and set
+COMPACT_RF_TREES / COMPACT_RF_MAX_LEAF_NODES (with ML_COMPACT=1) to it.
+
+Usage (from the scholar_vision/ project root):
+    python scripts/bench_compact.py                    # 20k-row cohort
+    python scripts/bench_compact.py --rows 100000 --iterations 100
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+# Make project root importable
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ml_engine import (
+    COMPACT_RF_MAX_LEAF_NODES, COMPACT_RF_TREES, FEATURES, RF_TREES, TARGET, MLEngine,
+)
+from ml_training import HOLDOUT_FRACTION
+from scripts.bench_common import RESULTS_DIR, _git_commit
+from scripts.bench_ml_engine import _cohort_bytes, _percentiles
+from scripts.generate_mock_cohort import generate
+
+# (name, n_estimators, max_leaf_nodes, compact cohort)
+CONFIGS = [
+    ("full",        RF_TREES,         None,                      False),
+    ("trees-50",    50,               None,                      False),
+    ("leaves-1024", RF_TREES,         1024,                      False),
+    ("compact",     COMPACT_RF_TREES, COMPACT_RF_MAX_LEAF_NODES, True),
+    ("leaves-64",   COMPACT_RF_TREES, 64,                        True),
+    ("tiny",        25,               64,                        True),
+]
+
+
+# Measurement helpers
+
+def _rmse(pred: np.ndarray, y: np.ndarray) -> float:
+    return round(float(np.sqrt(np.mean((np.clip(pred, 0, 100) - y) ** 2))), 3)
+
+
+def _forest_mb(rf: RandomForestRegressor) -> float:
+    """Node and value arrays of every tree."""
+    total = 0
+    for est in rf.estimators_:
+        state  = est.tree_.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return round(total / 2**20, 2)
+
+
+def _latency(fn, rows: np.ndarray) -> dict:
+    fn(rows[0])   # warm-up
+    samples = []
+    for row in rows:
+        t = time.perf_counter_ns()
+        fn(row)
+        samples.append(time.perf_counter_ns() - t)
+    return _percentiles(samples)
+
+
+# Benchmark
+
+def bench_config(name: str, trees: int, leaves: int | None, compact: bool,
+                 train, holdout, queries: np.ndarray) -> dict:
+    print(f"── {name}: {trees} trees, max_leaf_nodes={leaves}, compact={compact}")
+    X, y = train[FEATURES].values, train[TARGET].values
+
+    t  = time.perf_counter()
+    rf = RandomForestRegressor(n_estimators=trees, max_leaf_nodes=leaves, random_state=42, n_jobs=-1).fit(X, y)
+    fit_s = time.perf_counter() - t
+
+    engine        = MLEngine(compact=compact)
+    engine.rf     = rf
+    engine.scaler = StandardScaler().fit(X)
+    engine._set_cohort(train)
+    engine._index_forest()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        joblib.dump(rf, Path(tmp) / "rf.joblib")
+        artifact_mb = round((Path(tmp) / "rf.joblib").stat().st_size / 2**20, 2)
+
+    result = {
+        "config":         name,
+        "n_estimators":   trees,
+        "max_leaf_nodes": leaves,
+        "compact_cohort": compact,
+        "fit_s":          round(fit_s, 2),
+        "rf_rmse":        _rmse(rf.predict(holdout[FEATURES].values), holdout[TARGET].values),
+        "latency": {
+            "forest_predict": _latency(lambda r: engine._forest_predict(r[None, :]), queries),
+            "predict_deep":   _latency(lambda r: engine.predict_deep(dict(zip(FEATURES, r))), queries),
+        },
+        "memory": {
+            "forest_mb":       _forest_mb(rf),
+            "rf_artifact_mb":  artifact_mb,
+            "cohort_mb":       round(_cohort_bytes(engine) / 2**20, 2),
+        },
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="RMSE vs latency vs memory per forest configuration.")
+    parser.add_argument("--rows", type=int, default=20_000, help="Generated cohort size.")
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="Single-row calls per configuration for the latency percentiles.")
+    parser.add_argument("--out", type=Path, default=None,
+                        help="Output JSON (default: bench_results/compact-<commit>.json).")
+    args = parser.parse_args()
+
+    df      = generate(n=args.rows)
+    holdout = df.sample(frac=HOLDOUT_FRACTION, random_state=42)
+    train   = df.drop(holdout.index).reset_index(drop=True)
+    rng     = np.random.default_rng(0)
+    queries = train[FEATURES].values[rng.integers(0, len(train), args.iterations)]
+
+    dt = DecisionTreeRegressor(max_depth=3, random_state=42).fit(train[FEATURES].values, train[TARGET].values)
+
+    report = {
+        "meta": {
+            "commit":       _git_commit(),
+            "created_at":   datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "cohort_rows":  args.rows,
+            "holdout_rows": len(holdout),
+            "dt_rmse":      _rmse(dt.predict(holdout[FEATURES].values), holdout[TARGET].values),
+        },
+        "results": [bench_config(*cfg, train, holdout, queries) for cfg in CONFIGS],
+    }
+
+    print(f"\n{'config':<12} {'trees':>5} {'leaves':>6} {'rmse':>7} {'forest p50 ms':>14} {'deep p50 ms':>12} {'forest MB':>10} {'cohort MB':>10}")
+    for r in report["results"]:
+        print(
+            f"{r['config']:<12} {r['n_estimators']:>5} {str(r['max_leaf_nodes'] or '-'):>6} {r['rf_rmse']:>7} "
+            f"{r['latency']['forest_predict']['p50_ms']:>14} {r['latency']['predict_deep']['p50_ms']:>12} "
+            f"{r['memory']['forest_mb']:>10} {r['memory']['cohort_mb']:>10}"
+        )
+
+    out = args.out or RESULTS_DIR / f"compact-{report['meta']['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nSaved → {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+Benchmark for parsers/file_parser.
+
+Generates transcript-like PDFs (headings, grade lines, comments and, on
+every TABLE_EVERY-th page, a ruled grade table) of 1, 20 and 200 pages and
+times _parse_pdf sequentially and page-parallel with --workers processes.
+The parallel pool is warmed up first so spawn cost is reported separately.
+The sequential parse is also timed with the table-detection gate
+(_may_have_table) forced open, i.e. extract_tables() on every page.
+Every variant is checked against the sequential one (text, grades,
+snippets) — a mismatch aborts the run.
+
+CSV grade extraction (_extract_grades_from_df) is timed on registrar-style
+exports of --csv-rows rows, with and without a recognisable grade column
+(the second takes the cell-scanning fallback), against the row-by-row
+iterrows() implementation it replaced; results must be identical.
+
+Line-based extraction (_extract_grade_from_line, used for TXT, PDF and
+DOCX text) is timed over --lines transcript lines against the previous
+implementation, again with identical results required.
+
+Usage (from the scholar_vision/ project root):
+    python scripts/bench_file_parser.py                       # 1, 20, 200 pages
+    python scripts/bench_file_parser.py --pages 50 --workers 8 --repeat 3
+    python scripts/bench_file_parser.py --pages 1 --csv-rows 100000
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import sys
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Make project root importable
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from parsers import file_parser
+from parsers.file_parser import (
+    ParsedGrade, _extract_grade_from_line, _extract_grades_from_df, _fill_grade_value, _find_col, _parse_pdf,
+)
+from scripts.bench_common import RESULTS_DIR, _git_commit
+
+TABLE_EVERY = 4
+COURSES = [
+    ("CS101",   "Introduction to Programming"),
+    ("MATH202", "Linear Algebra"),
+    ("PHY110",  "Classical Mechanics"),
+    ("ENG210",  "Academic Writing"),
+    ("STAT301", "Statistical Inference"),
+    ("BIO150",  "Cell Biology"),
+]
+GRADES = ["A", "A-", "B+", "B", "C+", "C"]
+# Grade cells as registrars export them: letters, percentages, fractions, GPA, raw marks
+GRADE_CELLS = GRADES + ["87%", "72.5 %", "42/50", "3.7", "68", "140", "Pass", "", "0%"]
+
+
+# Document generation
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_lines(page_no: int) -> list[str]:
+    lines = [
+        f"ACADEMIC TRANSCRIPT - PAGE {page_no}",
+        f"Semester {1 + page_no % 2}, Academic Year 2023/24 - record reference {page_no:05d}",
+    ]
+    for i in range(20):
+        code, name = COURSES[(page_no + i) % len(COURSES)]
+        if i % 3 == 0:
+            lines.append(f"{code} {name} {60 + (page_no * 7 + i) % 40}% {GRADES[(page_no + i) % len(GRADES)]}")
+        else:
+            lines.append(f"Feedback: the submission for {name.lower()} showed steady progress this term.")
+    return lines
+
+
+def _page_stream(page_no: int) -> bytes:
+    ops = ["BT /F1 10 Tf 14 TL 50 800 Td"]
+    for line in _page_lines(page_no):
+        ops.append(f"({_escape(line)}) Tj T*")
+    ops.append("ET")
+
+    if page_no % TABLE_EVERY == 0:
+        # Ruled 3-column table: Course | Code | Grade
+        top, row_h, cols = 460, 18, [50, 260, 360, 450]
+        rows = [("Course", "Code", "Grade")] + [
+            (name, code, GRADES[(page_no + r) % len(GRADES)])
+            for r, (code, name) in enumerate(COURSES)
+        ]
+        bottom = top - row_h * len(rows)
+        for r in range(len(rows) + 1):
+            ops.append(f"{cols[0]} {top - r * row_h} m {cols[-1]} {top - r * row_h} l S")
+        for x in cols:
+            ops.append(f"{x} {top} m {x} {bottom} l S")
+        for r, row in enumerate(rows):
+            for c, cell in enumerate(row):
+                ops.append(f"BT /F1 9 Tf {cols[c] + 4} {top - (r + 1) * row_h + 5} Td ({_escape(cell)}) Tj ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def make_pdf(pages: int) -> bytes:
+    """A minimal, valid multi-page PDF (Helvetica text + drawn table rules)."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,   # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page_no in range(1, pages + 1):
+        stream = _page_stream(page_no)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), pages,
+    )
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def make_csv(rows: int, grade_column: bool = True) -> bytes:
+    """Registrar export; without grade_column the grade sits under 'Outcome'."""
+    header = ["Student", "Course", "Code", "Semester", "Grade" if grade_column else "Outcome"]
+    lines  = [",".join(header)]
+    for i in range(rows):
+        code, name = COURSES[i % len(COURSES)]
+        lines.append(",".join([
+            f"S{i // 8:06d}", name, code, f"Semester {1 + i % 2}",
+            GRADE_CELLS[(i * 7) % len(GRADE_CELLS)],
+        ]))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _reference_grades(df) -> list[ParsedGrade]:
+    """The row-by-row extraction that _extract_grades_from_df replaced."""
+    grades = []
+    headers_lower = [str(c).lower().strip() for c in df.columns]
+    course_idx = _find_col(headers_lower, file_parser.COURSE_KEYWORDS)
+    grade_idx  = _find_col(headers_lower, file_parser.GRADE_KEYWORDS)
+    code_idx   = _find_col(headers_lower, file_parser.CODE_KEYWORDS)
+    sem_idx    = _find_col(headers_lower, file_parser.SEMESTER_KEYWORDS)
+    for row_i, row in df.iterrows():
+        g = ParsedGrade(source_row=int(row_i) + 2)
+        if course_idx is not None:
+            g.course_name = str(row.iloc[course_idx]).strip()
+        if code_idx is not None:
+            g.course_code = str(row.iloc[code_idx]).strip()
+        if grade_idx is not None:
+            g = _fill_grade_value(g, str(row.iloc[grade_idx]))
+        if sem_idx is not None:
+            g.semester = str(row.iloc[sem_idx]).strip()
+        if grade_idx is None:
+            for val in row.values:
+                g = _fill_grade_value(g, str(val))
+                if g.grade_letter or g.percentage:
+                    break
+        if g.course_name or g.grade_letter or g.percentage:
+            grades.append(g)
+    return grades
+
+
+def _reference_line(line: str, row_idx: int = 0):
+    """The _extract_grade_from_line that ran every regex on every line."""
+    line = line.strip()
+    if len(line) < 3:
+        return None
+    grade = ParsedGrade(source_row=row_idx)
+    cc = file_parser.COURSE_CODE_RE.search(line)
+    if cc:
+        grade.course_code = cc.group(1).strip()
+    pct = file_parser.PERCENTAGE_RE.search(line)
+    if pct:
+        grade.percentage = float(pct.group(1))
+        grade.score      = grade.percentage
+        grade.max_score  = 100.0
+    if not grade.percentage:
+        frac = file_parser.SCORE_FRAC_RE.search(line)
+        if frac:
+            s, m = float(frac.group(1)), float(frac.group(2))
+            if m <= 200:
+                grade.score      = s
+                grade.max_score  = m
+                grade.percentage = file_parser._normalise_percentage(s, m)
+    gl = file_parser.GRADE_LETTER_RE.search(line)
+    if gl:
+        grade.grade_letter = gl.group(1)
+    if not any([grade.percentage, grade.score, grade.grade_letter, grade.course_code]):
+        return None
+    name_part = re.split(r'[:\-|]', line)[0].strip()
+    name_part = file_parser.COURSE_CODE_RE.sub('', name_part).strip()
+    name_part = re.sub(r'\s+', ' ', name_part)
+    if 3 <= len(name_part) <= 120:
+        grade.course_name = name_part
+    sem = file_parser.SEMESTER_RE.search(line)
+    if sem:
+        grade.semester = sem.group(0).strip()
+    return grade
+
+
+# Benchmark
+
+def _best_of(fn, repeat: int) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t)
+    return round(best * 1000, 1), result
+
+
+def _signature(result) -> tuple:
+    return (
+        result.error,
+        result.raw_text,
+        [asdict(g) for g in result.grades],
+        [asdict(s) for s in result.snippets],
+    )
+
+
+def _ungated(content: bytes):
+    gate = file_parser._may_have_table
+    file_parser._may_have_table = lambda page: True
+    try:
+        return _parse_pdf(content, workers=0)
+    finally:
+        file_parser._may_have_table = gate
+
+
+def bench_pdf(pages: int, workers: int, repeat: int) -> dict:
+    content = make_pdf(pages)
+    print(f"── {pages} page(s), {len(content) / 1024:.0f} KB")
+
+    seq_ms, seq = _best_of(lambda: _parse_pdf(content, workers=0), repeat)
+    ungated_ms, ungated = _best_of(lambda: _ungated(content), repeat)
+    par_ms, par = _best_of(lambda: _parse_pdf(content, workers=workers), repeat)
+    if _signature(seq) != _signature(par):
+        raise SystemExit(f"Parallel result differs from sequential on {pages} pages")
+    if _signature(seq) != _signature(ungated):
+        raise SystemExit(f"Table gate changed the result on {pages} pages")
+
+    split = workers > 1 and pages >= file_parser.PDF_PARALLEL_MIN_PAGES
+    result = {
+        "pages":         pages,
+        "bytes":         len(content),
+        "grades":        len(seq.grades),
+        "snippets":      len(seq.snippets),
+        "table_pages":   pages // TABLE_EVERY,
+        "sequential_ms": seq_ms,
+        "ungated_ms":    ungated_ms,   # extract_tables() on every page
+        "gate_speedup":  round(ungated_ms / seq_ms, 2) if seq_ms else None,
+        "parallel_ms":   par_ms,
+        "split":         split,   # False → below PDF_PARALLEL_MIN_PAGES, ran sequentially
+        "speedup":       round(seq_ms / par_ms, 2) if par_ms else None,
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+def bench_csv(rows: int, grade_column: bool, repeat: int) -> dict:
+    import pandas as pd
+
+    content = make_csv(rows, grade_column)
+    df      = pd.read_csv(io.BytesIO(content), dtype=str).fillna('')
+    layout  = "grade column" if grade_column else "cell scan"
+    print(f"── {rows} CSV rows ({layout}), {len(content) / 1024:.0f} KB")
+
+    ref_ms, ref = _best_of(lambda: _reference_grades(df), repeat)
+    vec_ms, vec = _best_of(lambda: _extract_grades_from_df(df), repeat)
+    if [asdict(g) for g in ref] != [asdict(g) for g in vec]:
+        raise SystemExit(f"Vectorised grades differ from iterrows() on {rows} rows ({layout})")
+
+    result = {
+        "rows":          rows,
+        "layout":        layout,
+        "grades":        len(vec),
+        "iterrows_ms":   ref_ms,
+        "vectorised_ms": vec_ms,
+        "speedup":       round(ref_ms / vec_ms, 2) if vec_ms else None,
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+def bench_lines(count: int, repeat: int) -> dict:
+    lines, page_no = [], 0
+    while len(lines) < count:
+        page_no += 1
+        lines.extend(_page_lines(page_no))
+    lines = lines[:count]
+    print(f"── {count} text lines")
+
+    def run(fn):
+        return [fn(line, i) for i, line in enumerate(lines)]
+
+    ref_ms, ref = _best_of(lambda: run(_reference_line), repeat)
+    new_ms, new = _best_of(lambda: run(_extract_grade_from_line), repeat)
+    if [g and asdict(g) for g in ref] != [g and asdict(g) for g in new]:
+        raise SystemExit(f"Line extraction differs from the reference on {count} lines")
+
+    result = {
+        "lines":        count,
+        "grades":       sum(g is not None for g in new),
+        "reference_ms": ref_ms,
+        "current_ms":   new_ms,
+        "us_per_line":  round(new_ms * 1000 / count, 2),
+        "speedup":      round(ref_ms / new_ms, 2) if new_ms else None,
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PDF extraction and CSV grade extraction timings.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 20, 200])
+    parser.add_argument("--csv-rows", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--lines", type=int, default=100_000, help="Text lines for line-based extraction.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="Page-parallel worker processes (default: CPU count).")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N timing per case.")
+    parser.add_argument("--out", type=Path, default=None,
+                        help="Output JSON (default: bench_results/file_parser-<commit>.json).")
+    args = parser.parse_args()
+    workers = max(2, args.workers)
+
+    # Spawning the pool (and importing pdfplumber in each worker) is a one-off
+    t = time.perf_counter()
+    _parse_pdf(make_pdf(file_parser.PDF_PARALLEL_MIN_PAGES), workers=workers)
+    warmup_ms = round((time.perf_counter() - t) * 1000, 1)
+
+    report = {
+        "meta": {
+            "commit":         _git_commit(),
+            "created_at":     datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python":         platform.python_version(),
+            "cpus":           os.cpu_count(),
+            "workers":        workers,
+            "min_pages":      file_parser.PDF_PARALLEL_MIN_PAGES,
+            "pool_warmup_ms": warmup_ms,
+        },
+        "pdf": [bench_pdf(n, workers, args.repeat) for n in args.pages],
+        "csv": [bench_csv(n, graded, args.repeat) for n in args.csv_rows for graded in (True, False)],
+        "lines": bench_lines(args.lines, args.repeat),
+    }
+
+    print(f"\n{'pages':>6} {'ungated ms':>11} {'sequential ms':>14} {'gate x':>7} {'parallel ms':>12} {'speedup':>8}")
+    for r in report["pdf"]:
+        print(
+            f"{r['pages']:>6} {r['ungated_ms']:>11} {r['sequential_ms']:>14} {r['gate_speedup']:>7} "
+            f"{r['parallel_ms']:>12} {r['speedup']:>8}"
+        )
+    print(f"\n{'rows':>7} {'layout':>13} {'iterrows ms':>12} {'vectorised ms':>14} {'speedup':>8}")
+    for r in report["csv"]:
+        print(f"{r['rows']:>7} {r['layout']:>13} {r['iterrows_ms']:>12} {r['vectorised_ms']:>14} {r['speedup']:>8}")
+    r = report["lines"]
+    print(f"\n{r['lines']} lines: {r['reference_ms']} ms → {r['current_ms']} ms ({r['speedup']}x)")
+
+    out = args.out or RESULTS_DIR / f"file_parser-{report['meta']['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nSaved → {out}")
+
+
+if __name__ == "__main__":
+    main()
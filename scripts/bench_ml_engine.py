@@ -0,0 +1,270 @@
+"""
+Offline microbenchmarks for ml_engine.
+
+For each cohort size (rows generated by scripts/generate_mock_cohort.generate)
+the script publishes a model release to a temporary models directory, then
+measures:
+  - cold load time of MLEngine.ensure_ready()
+  - p50 / p99 latency of predict_strict, predict_peer and predict_deep
+  - batch throughput of the underlying vectorised calls
+  - memory footprint (process RSS growth on load, cohort frame, artifacts)
+  - exact vs approximate peer index: build time, single-query latency and
+    recall@5 against exact search
+
+Results are written as JSON so two commits can be compared directly.
+
+Usage (from the scholar_vision/ project root):
+    python scripts/bench_ml_engine.py                        # 1k, 100k, 1M rows
+    python scripts/bench_ml_engine.py --sizes 1000 --iterations 50
+    python scripts/bench_ml_engine.py --compare bench_results/ml_engine-abc1234.json
+
+Decision Tree and Random Forest are fitted on at most --fit-rows rows (a
+full-depth forest on 1M rows needs tens of GB); KNN and the peer cohort
+always use every generated row.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+# Make project root importable
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ml_engine import FEATURES, MLEngine
+from ml_neighbours import IVFIndex, recall_at_k
+from ml_training import fit_models, publish
+from scripts.bench_common import RESULTS_DIR, _git_commit
+from scripts.generate_mock_cohort import generate
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+# Measurement helpers
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux), falling back to peak RSS."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentiles(samples_ns: list[int]) -> dict:
+    ms = np.asarray(samples_ns) / 1e6
+    return {
+        "p50_ms":  round(float(np.percentile(ms, 50)), 3),
+        "p99_ms":  round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def _throughput(fn, X: np.ndarray, repeat: int = 3) -> float:
+    """Best-of-N rows per second for fn(X)."""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - t)
+    return round(len(X) / best, 1)
+
+
+def _cohort_bytes(engine: MLEngine) -> int:
+    """Cohort arrays plus the pandas frame when one is kept (not in compact mode)."""
+    total = engine._cohort_values.nbytes + engine._sorted_columns.nbytes
+    if engine.train_df is not None:
+        total += int(engine.train_df.memory_usage(deep=True).sum())
+    return total
+
+
+def _dir_mb(path: Path) -> float:
+    return round(sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) / 2**20, 2)
+
+
+# Benchmark
+
+def bench_peer_index(X_scaled: np.ndarray, queries: np.ndarray) -> dict:
+    """Exact and approximate peer index over the same scaled cohort."""
+    report = {}
+    for kind, make in (
+        ("exact",  lambda: NearestNeighbors(n_neighbors=5, metric="euclidean")),
+        ("approx", IVFIndex),
+    ):
+        t     = time.perf_counter()
+        index = make().fit(X_scaled)
+        build = time.perf_counter() - t
+        samples = []
+        for q in queries:
+            t = time.perf_counter_ns()
+            index.kneighbors(q[None, :])
+            samples.append(time.perf_counter_ns() - t)
+        report[kind] = {"build_s": round(build, 3), **_percentiles(samples)}
+        if kind == "approx":
+            report[kind]["recall_at_5"] = round(recall_at_k(index, X_scaled, queries), 4)
+    return report
+
+
+def _publish_release(df, fit_rows: int, models_dir: Path) -> None:
+    fit_df = df.sample(fit_rows, random_state=0) if len(df) > fit_rows else df
+    models = fit_models(fit_df)
+    # Peer mode indexes the whole cohort, not just the fitted sample
+    models["scaler"] = StandardScaler()
+    models["knn"]    = NearestNeighbors(n_neighbors=5, metric="euclidean")
+    models["knn"].fit(models["scaler"].fit_transform(df[FEATURES].values))
+    publish(models, df, {"benchmark": True}, models_dir)
+
+
+def bench_size(n: int, fit_rows: int, iterations: int, batch: int) -> dict:
+    print(f"── cohort {n:,} rows")
+    df = generate(n=n)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        models_dir = Path(tmp)
+        t = time.perf_counter()
+        _publish_release(df, fit_rows, models_dir)
+        fit_s = time.perf_counter() - t
+        del df
+        gc.collect()
+
+        rss_before = _rss_mb()
+        engine     = MLEngine(models_dir)
+        t = time.perf_counter()
+        engine.ensure_ready()
+        cold_load_s = time.perf_counter() - t
+        rss_after   = _rss_mb()
+        artifact_mb = _dir_mb(models_dir)
+
+    cohort = engine._cohort_values[:, :len(FEATURES)].astype(float)
+    rng    = np.random.default_rng(0)
+    rows   = cohort[rng.integers(0, len(cohort), iterations)]
+    # Nudge the queries off the training points so KNN does real work
+    rows   = rows + rng.normal(0, 0.05, rows.shape)
+
+    latency = {}
+    for name, fn in (
+        ("predict_strict", engine.predict_strict),
+        ("predict_peer",   engine.predict_peer),
+        ("predict_deep",   engine.predict_deep),
+    ):
+        fn(dict(zip(FEATURES, rows[0])))   # warm-up
+        samples = []
+        for row in rows:
+            values = dict(zip(FEATURES, row))
+            t = time.perf_counter_ns()
+            fn(values)
+            samples.append(time.perf_counter_ns() - t)
+        latency[name] = _percentiles(samples)
+
+    X = cohort[rng.integers(0, len(cohort), batch)]
+    throughput = {
+        "dt_predict_rows_per_s":     _throughput(engine.dt.predict, X),
+        "forest_predict_rows_per_s": _throughput(engine._forest_predict, X),
+        "knn_rows_per_s":            _throughput(
+            lambda A: engine.knn.kneighbors(engine.scaler.transform(A)), X[:1_000],
+        ),
+        "explain_batch_rows_per_s":  _throughput(engine.explain_batch, X[:50], repeat=1),
+    }
+    peer_index = bench_peer_index(engine._scale(cohort), engine._scale(rows))
+
+    result = {
+        "cohort_rows":  n,
+        "fit_rows":     min(n, fit_rows),
+        "fit_s":        round(fit_s, 2),
+        "cold_load_s":  round(cold_load_s, 3),
+        "latency":      latency,
+        "throughput":   throughput,
+        "peer_index":   peer_index,
+        "memory": {
+            "load_rss_mb":  round(rss_after - rss_before, 1),
+            "cohort_mb":    round(_cohort_bytes(engine) / 2**20, 2),
+            "artifacts_mb": artifact_mb,
+        },
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+# Comparison
+
+def _flatten(d: dict, prefix: str = "") -> dict:
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            out.update(_flatten(v, key))
+        elif isinstance(v, (int, float)):
+            out[key] = v
+    return out
+
+
+def compare(old: dict, new: dict) -> None:
+    """Print relative change of every numeric metric, matched by cohort size."""
+    old_by_n = {r["cohort_rows"]: _flatten(r) for r in old["results"]}
+    print(f"\n{old['meta']['commit']} → {new['meta']['commit']}")
+    for r in new["results"]:
+        before = old_by_n.get(r["cohort_rows"])
+        if before is None:
+            continue
+        print(f"── cohort {r['cohort_rows']:,} rows")
+        for key, value in _flatten(r).items():
+            if key in before and before[key] and key not in ("cohort_rows", "fit_rows"):
+                change = (value - before[key]) / before[key] * 100
+                print(f"  {key:<45} {before[key]:>12} → {value:>12}  ({change:+.1f}%)")
+
+
+# Main
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ml_engine inference.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--fit-rows", type=int, default=10_000,
+                        help="Cap on rows the DT/RF are fitted on (default: %(default)s).")
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="Single-row calls per mode for the latency percentiles.")
+    parser.add_argument("--batch", type=int, default=10_000,
+                        help="Rows per batch for the throughput figures.")
+    parser.add_argument("--out", type=Path, default=None,
+                        help="Output JSON (default: bench_results/ml_engine-<commit>.json).")
+    parser.add_argument("--compare", type=Path, default=None,
+                        help="Earlier results JSON to diff against.")
+    args = parser.parse_args()
+
+    import sklearn
+    report = {
+        "meta": {
+            "commit":     _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python":     platform.python_version(),
+            "numpy":      np.__version__,
+            "sklearn":    sklearn.__version__,
+            "machine":    platform.machine(),
+            "cpus":       os.cpu_count(),
+        },
+        "results": [
+            bench_size(n, args.fit_rows, args.iterations, args.batch) for n in args.sizes
+        ],
+    }
+
+    out = args.out or RESULTS_DIR / f"ml_engine-{report['meta']['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nSaved → {out}")
+
+    if args.compare:
+        compare(json.loads(args.compare.read_text()), report)
+
+
+if __name__ == "__main__":
+    main()
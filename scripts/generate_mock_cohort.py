@@ -137,6 +137,29 @@ def generate(n: int = 1_000, seed: int = 42) -> pd.DataFrame:
     df = df.sample(frac=1, random_state=seed).reset_index(drop=True)
     return df
 
+# Segment labels (student_profiles columns) — uneven so that with the default
+# SEGMENT_MIN_ROWS some majors get their own models and others fall back.
+MAJORS = {
+    "Computer Science":       0.30,
+    "Business":               0.25,
+    "Biology":                0.20,
+    "Psychology":             0.15,
+    "Mechanical Engineering": 0.10,
+}
+UNIVERSITIES   = ["University of Westbridge", "Eastfield Institute of Technology"]
+YEARS_OF_STUDY = ["1st Year", "2nd Year", "3rd Year", "4th Year"]
+
+
+def assign_segments(df: pd.DataFrame, seed: int = 42) -> pd.DataFrame:
+    """Add random major / university_name / year_of_study labels to a cohort."""
+    rng = np.random.default_rng(seed + 1)
+    n   = len(df)
+    return df.assign(
+        major=rng.choice(list(MAJORS), n, p=list(MAJORS.values())),
+        university_name=rng.choice(UNIVERSITIES, n),
+        year_of_study=rng.choice(YEARS_OF_STUDY, n),
+    )
+
 if __name__ == "__main__":
     out = Path(__file__).parent.parent / "mock_cohort_data.csv"
     df = generate()
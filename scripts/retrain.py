@@ -0,0 +1,54 @@
+"""
+Retrain the ML models on the latest cohort_students rows and publish a
+new release for the running API to pick up (it polls models/CURRENT).
+
+Usage (from the scholar_vision/ project root):
+    python scripts/retrain.py              # retrain + publish
+    python scripts/retrain.py --n-jobs 2   # cap Random Forest parallelism
+
+Suitable for cron; the API can also run the same job itself via
+POST /api/predictions/retrain or RETRAIN_INTERVAL_HOURS.
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# Make project root importable 
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Load .env before importing project modules 
+def _load_env(path: Path) -> None:
+    if not path.exists():
+        return
+    for raw in path.read_text().splitlines():
+        line = raw.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, _, val = line.partition("=")
+        os.environ.setdefault(key.strip(), val.strip())
+
+_load_env(ROOT / ".env")
+
+# Project imports (after env is set) 
+from ml_training import RETRAIN_N_JOBS, run_retraining
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Retrain and publish the ML models.")
+    parser.add_argument("--n-jobs", type=int, default=RETRAIN_N_JOBS,
+                        help="Random Forest parallelism (default: %(default)s).")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)   # models/ is resolved relative to the project root
+    report = run_retraining(n_jobs=args.n_jobs)
+    print(json.dumps(report, indent=2))
+    if not report.get("published"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
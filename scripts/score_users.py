@@ -0,0 +1,54 @@
+"""
+Score every user with the serving models and refresh user_predicted_grades,
+which the Overview dashboard reads instead of predicting on each load.
+
+Usage (from the scholar_vision/ project root):
+    python scripts/score_users.py                   # all users, one worker per CPU
+    python scripts/score_users.py --workers 2 --chunk-rows 5000
+
+Meant to run nightly from cron, e.g.
+    30 2 * * *  cd /srv/scholar_vision && python scripts/score_users.py
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# Make project root importable 
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Load .env before importing project modules 
+def _load_env(path: Path) -> None:
+    if not path.exists():
+        return
+    for raw in path.read_text().splitlines():
+        line = raw.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, _, val = line.partition("=")
+        os.environ.setdefault(key.strip(), val.strip())
+
+_load_env(ROOT / ".env")
+
+# Project imports (after env is set) 
+from ml_batch import BATCH_CHUNK_ROWS, BATCH_WORKERS, run_batch_scoring
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch-score every user's predicted grade.")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS,
+                        help="Scoring processes (default: %(default)s).")
+    parser.add_argument("--chunk-rows", type=int, default=BATCH_CHUNK_ROWS,
+                        help="Users per chunk (default: %(default)s).")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)   # models/ is resolved relative to the project root
+    report = run_batch_scoring(workers=args.workers, chunk_rows=args.chunk_rows)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
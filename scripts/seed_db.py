@@ -36,7 +36,7 @@ _load_env(ROOT / ".env")
 
 # Project imports (after env is set) 
 from database.cohort import sync_create_table, sync_count, sync_bulk_insert, sync_truncate
-from scripts.generate_mock_cohort import generate
+from scripts.generate_mock_cohort import assign_segments, generate
 
 CSV_PATH = ROOT / "mock_cohort_data.csv"
 
@@ -83,7 +83,7 @@ def main() -> None:
 
     # Always regenerate — never reuse a stale CSV
     print("  Generating holistic-tiered synthetic cohort (n=1,000)…")
-    df = generate(n=1_000)
+    df = assign_segments(generate(n=1_000))
     df.to_csv(CSV_PATH, index=False)
     print(f"  Saved to {CSV_PATH.name}.")
 
@@ -202,12 +202,12 @@ def seed(conn: psycopg.Connection) -> str:
         conn.execute(
             """
             INSERT INTO health_metrics
-                (import_id, type, data_class, value_num, value_cat,
+                (import_id, session_id, type, data_class, value_num, value_cat,
                  unit, start_time, end_time, source_device, was_user_entered)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """,
             (
-                health_import_id,
+                health_import_id, session_id,
                 m["type"], m["data_class"], m["value_num"], m["value_cat"],
                 m["unit"], m["start_time"], m["end_time"],
                 m["source_device"], False,
@@ -473,7 +473,7 @@ def _clean(conn: psycopg.Connection) -> None:
         return
     uid = str(row["user_id"])
     for table in ("app_usage_imports", "study_imports",
-                  "health_imports", "uploaded_files"):
+                  "health_imports", "health_sync_state", "uploaded_files"):
         conn.execute(f"DELETE FROM {table} WHERE session_id = %s", (uid,))
     conn.execute("DELETE FROM users WHERE email = %s", (DEMO_EMAIL,))
     conn.commit()
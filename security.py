@@ -5,6 +5,9 @@ All routers import `get_current_user` from here to protect endpoints.
 The dependency extracts the JWT from the Authorization: Bearer header,
 validates it, and returns the user's UUID string — used as `session_id`
 in all database queries.
+
+Operator endpoints (retraining, internal metrics) use `get_admin_user`,
+which additionally requires the user to be listed in ADMIN_USER_IDS.
 """
 
 from __future__ import annotations
@@ -20,6 +23,8 @@ from jose import JWTError, jwt
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "sv-change-this-to-a-long-random-secret-in-production")
 ALGORITHM  = "HS256"
 TOKEN_EXPIRE_DAYS = 30
+# Comma-separated user UUIDs allowed on operator endpoints; empty = nobody
+ADMIN_USER_IDS = {u.strip() for u in os.getenv("ADMIN_USER_IDS", "").split(",") if u.strip()}
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -59,3 +64,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+
+async def get_admin_user(user_id: str = Depends(get_current_user)) -> str:
+    """FastAPI dependency — like get_current_user, but only for ADMIN_USER_IDS."""
+    if user_id not in ADMIN_USER_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Operator access required",
+        )
+    return user_id